@@ -1,14 +1,21 @@
 class EmeraldElectronicsApp {
     constructor() {
         this.apiBase = '';
+        this.etagCache = new Map();
+        this.etagCacheSize = 100;
         this.currentEditingProduct = null;
         this.currentEditingCustomer = null;
         this.productModal = null;
         this.customerModal = null;
-        this.allProducts = [];
-        this.allCustomers = [];
-        this.filteredProducts = [];
-        this.filteredCustomers = [];
+        this.pageSize = 50;
+        this.products = [];
+        this.customers = [];
+        this.productsCursor = null;
+        this.customersCursor = null;
+        this.searchTimer = null;
+        this.reloadTimers = {};
+        this.lastEventId = '';
+        this.eventRetryDelay = 1000;
         this.init();
     }
 
@@ -17,6 +24,83 @@ class EmeraldElectronicsApp {
         this.setupModals();
         this.loadProducts();
         this.loadCustomers();
+        this.listenForChanges();
+    }
+
+    // Live updates: apply changes pushed by /api/events to the loaded rows
+    listenForChanges() {
+        if (!window.EventSource) {
+            return;
+        }
+        const query = this.lastEventId ? `?last_event_id=${encodeURIComponent(this.lastEventId)}` : '';
+        const events = new EventSource(`${this.apiBase}/api/events${query}`);
+        const track = (e) => {
+            if (e.lastEventId) {
+                this.lastEventId = e.lastEventId;
+            }
+        };
+        events.addEventListener('open', () => { this.eventRetryDelay = 1000; });
+        events.addEventListener('ready', track);
+        events.addEventListener('change', (e) => {
+            track(e);
+            this.applyChange(JSON.parse(e.data));
+        });
+        events.addEventListener('resync', (e) => {
+            track(e);
+            this.scheduleReload(JSON.parse(e.data).collection);
+        });
+        // The browser retries a dropped connection itself, but gives up after an
+        // error response such as a 503, so reconnect with backoff from the last event
+        events.addEventListener('error', () => {
+            if (events.readyState !== EventSource.CLOSED) {
+                return;
+            }
+            const delay = this.eventRetryDelay;
+            this.eventRetryDelay = Math.min(delay * 2, 60000);
+            setTimeout(() => {
+                if (!this.lastEventId) {
+                    // Nothing to resume from, so catch up on whatever was missed
+                    this.scheduleReload('products');
+                    this.scheduleReload('customers');
+                }
+                this.listenForChanges();
+            }, delay);
+        });
+    }
+
+    applyChange(change) {
+        const products = change.collection === 'products';
+        const rows = products ? this.products : this.customers;
+        const index = rows.findIndex(row => row.id === change.id);
+        if (change.op === 'insert') {
+            // Where a new row belongs depends on the search and sort, so fetch the page again
+            this.scheduleReload(change.collection);
+            return;
+        }
+        if (index === -1) {
+            return;
+        }
+        if (change.op === 'delete') {
+            rows.splice(index, 1);
+        } else if (change.record) {
+            rows[index] = change.record;
+        }
+        if (products) {
+            this.renderProducts(this.products);
+        } else {
+            this.renderCustomers(this.customers);
+        }
+    }
+
+    scheduleReload(collection) {
+        clearTimeout(this.reloadTimers[collection]);
+        this.reloadTimers[collection] = setTimeout(() => {
+            if (collection === 'products') {
+                this.loadProducts();
+            } else {
+                this.loadCustomers();
+            }
+        }, 250);
     }
 
     setupModals() {
@@ -91,34 +175,81 @@ class EmeraldElectronicsApp {
     // API methods
     async apiRequest(endpoint, options = {}) {
         try {
+            // Revalidate GETs we have seen before; a 304 reuses the parsed copy
+            const method = (options.method || 'GET').toUpperCase();
+            const cached = method === 'GET' ? this.etagCache.get(endpoint) : undefined;
             const response = await fetch(`${this.apiBase}${endpoint}`, {
+                ...options,
                 headers: {
                     'Content-Type': 'application/json',
+                    ...(cached ? { 'If-None-Match': cached.etag } : {}),
                     ...options.headers
-                },
-                ...options
+                }
             });
-          
-if (!response.ok) {
+
+            if (response.status === 304 && cached) {
+                return cached.data;
+            }
+
+            if (!response.ok) {
                 const error = await response.json();
                 throw new Error(error.error || 'Request failed');
             }
 
-            return await response.json();
+            const data = await response.json();
+            const etag = response.headers.get('ETag');
+            if (method === 'GET' && etag) {
+                this.rememberResponse(endpoint, etag, data);
+            }
+            return data;
         } catch (error) {
             console.error('API request failed:', error);
             throw error;
         }
     }
 
+    // Keep the most recent ETagged responses, dropping the oldest first
+    rememberResponse(endpoint, etag, data) {
+        this.etagCache.delete(endpoint);
+        this.etagCache.set(endpoint, { etag, data });
+        if (this.etagCache.size > this.etagCacheSize) {
+            this.etagCache.delete(this.etagCache.keys().next().value);
+        }
+    }
+
+    // Pagination helpers
+    pageUrl(endpoint, query, sortBy, cursor) {
+        const params = new URLSearchParams({ q: query, sort: sortBy, limit: this.pageSize });
+        if (cursor) {
+            params.set('cursor', cursor);
+        }
+        return `${endpoint}?${params}`;
+    }
+
+    debounce(callback) {
+        clearTimeout(this.searchTimer);
+        this.searchTimer = setTimeout(callback, 250);
+    }
+
+    updateLoadMore(buttonId, page, loaded) {
+        const button = document.getElementById(buttonId);
+        button.style.display = page.next_cursor ? 'inline-block' : 'none';
+        button.textContent = `Load more (${loaded} of ${page.total})`;
+    }
+
     // Product methods
-    async loadProducts() {
+    async loadProducts(append = false) {
         this.showLoading('productsLoading');
         try {
-            const products = await this.apiRequest('/api/products');
-            this.allProducts = products;
-            this.filteredProducts = products;
-            this.renderProducts(products);
+            const query = document.getElementById('productSearch').value;
+            const sortBy = document.getElementById('productSort').value;
+            const cursor = append ? this.productsCursor : null;
+            const page = await this.apiRequest(this.pageUrl('/api/products/search', query, sortBy, cursor));
+
+            this.products = append ? this.products.concat(page.items) : page.items;
+            this.productsCursor = page.next_cursor;
+            this.renderProducts(this.products);
+            this.updateLoadMore('productsLoadMore', page, this.products.length);
         } catch (error) {
             this.showAlert('productsAlert', `Failed to load products: ${error.message}`);
         } finally {
@@ -126,26 +257,16 @@ if (!response.ok) {
         }
     }
 
+    loadMoreProducts() {
+        this.loadProducts(true);
+    }
+
     searchProducts() {
-        const query = document.getElementById('productSearch').value.toLowerCase();
-        this.filteredProducts = this.allProducts.filter(product => 
-            product.name.toLowerCase().includes(query)
-        );
-        this.sortProducts();
+        this.debounce(() => this.loadProducts());
     }
 
     sortProducts() {
-        const sortBy = document.getElementById('productSort').value;
-        this.filteredProducts.sort((a, b) => {
-            if (sortBy === 'price') {
-                return a.price - b.price;
-            } else if (sortBy === 'stock') {
-                return a.stock - b.stock;
-            } else {
-                return a.name.localeCompare(b.name);
-            }
-        });
-        this.renderProducts(this.filteredProducts);
+        this.loadProducts();
     }
 
     renderProducts(products) {
@@ -243,13 +364,18 @@ if (!response.ok) {
     }
 
     // Customer methods
-    async loadCustomers() {
+    async loadCustomers(append = false) {
         this.showLoading('customersLoading');
         try {
-            const customers = await this.apiRequest('/api/customers');
-            this.allCustomers = customers;
-            this.filteredCustomers = customers;
-            this.renderCustomers(customers);
+            const query = document.getElementById('customerSearch').value;
+            const sortBy = document.getElementById('customerSort').value;
+            const cursor = append ? this.customersCursor : null;
+            const page = await this.apiRequest(this.pageUrl('/api/customers/search', query, sortBy, cursor));
+
+            this.customers = append ? this.customers.concat(page.items) : page.items;
+            this.customersCursor = page.next_cursor;
+            this.renderCustomers(this.customers);
+            this.updateLoadMore('customersLoadMore', page, this.customers.length);
         } catch (error) {
             this.showAlert('customersAlert', `Failed to load customers: ${error.message}`);
         } finally {
@@ -257,27 +383,16 @@ if (!response.ok) {
         }
     }
 
-searchCustomers() {
-        const query = document.getElementById('customerSearch').value.toLowerCase();
-        this.filteredCustomers = this.allCustomers.filter(customer => 
-            customer.name.toLowerCase().includes(query) || 
-            customer.email.toLowerCase().includes(query)
-        );
-        this.sortCustomers();
+    loadMoreCustomers() {
+        this.loadCustomers(true);
+    }
+
+    searchCustomers() {
+        this.debounce(() => this.loadCustomers());
     }
 
     sortCustomers() {
-        const sortBy = document.getElementById('customerSort').value;
-        this.filteredCustomers.sort((a, b) => {
-            if (sortBy === 'email') {
-                return a.email.localeCompare(b.email);
-            } else if (sortBy === 'phone') {
-                return a.phone.localeCompare(b.phone);
-            } else {
-                return a.name.localeCompare(b.name);
-            }
-        });
-        this.renderCustomers(this.filteredCustomers);
+        this.loadCustomers();
     }
 
     renderCustomers(customers) {
@@ -404,3 +519,15 @@ function sortCustomers() {
         window.app.sortCustomers();
     }
 }
+
+function loadMoreProducts() {
+    if (window.app) {
+        window.app.loadMoreProducts();
+    }
+}
+
+function loadMoreCustomers() {
+    if (window.app) {
+        window.app.loadMoreCustomers();
+    }
+}
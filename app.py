@@ -1,8 +1,20 @@
 import os
+import json
+import base64
+import hashlib
 import logging
-from flask import Flask, jsonify, request, render_template
+import threading
+from functools import wraps
+from flask import Flask, Response, jsonify, make_response, request, render_template, stream_with_context
 from flask_cors import CORS
-from data_manager import DataManager
+from data_manager import BatchRejected, DataManager
+from sqlite_data_manager import SQLiteDataManager
+from reports import STOCK_BANDS, customer_report, inventory_report, stock_band_report
+from response_cache import ResponseCache
+from changes import net_changes
+from importer import IMPORT_FORMATS, import_records
+from validation import (ValidationError, validate_batch, validate_customer_updates, validate_new_customer,
+                        validate_new_product, validate_product_updates)
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -14,8 +26,271 @@ app.secret_key = os.environ.get("SESSION_SECRET", "emerald-electronics-secret-ke
 # Enable CORS for API access
 CORS(app)
 
-# Initialize data manager
-data_manager = DataManager()
+# Initialize data manager (STORAGE_BACKEND=sqlite switches to the SQLite store)
+if os.environ.get("STORAGE_BACKEND", "json") == "sqlite":
+    data_manager = SQLiteDataManager(os.environ.get("SQLITE_DATABASE", "emerald.db"))
+    data_manager.migrate_from_json()
+else:
+    data_manager = DataManager(cache=True, group_commit_ms=float(os.environ.get("GROUP_COMMIT_MS", "0")),
+                               shard_size=int(os.environ.get("SHARD_SIZE", "0")),
+                               snapshot=os.environ.get("SNAPSHOT") == "1")
+
+# Pagination helpers
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(sort_by, position):
+    """Encode a keyset position as an opaque URL-safe cursor"""
+    if position is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps([sort_by] + list(position)).encode()).decode()
+
+# Sorts whose keys are numbers; every other sort key is a string
+NUMERIC_SORTS = ('id', 'price', 'stock')
+
+def decode_cursor(cursor, sort_by):
+    """Decode a cursor into a keyset position, checking it matches the sort"""
+    data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not (isinstance(data, list) and len(data) == 3 and data[0] == sort_by
+            and type(data[2]) is int and is_sort_key(data[1], sort_by)):
+        raise ValueError('Cursor does not match this listing')
+    return data[1:]
+
+def is_sort_key(value, sort_by):
+    """Check a cursor's sort key has the type the sort compares"""
+    if sort_by in NUMERIC_SORTS:
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    return isinstance(value, str)
+
+def get_page_args(sort_by):
+    """Return (limit, after) when the request asks for a page, otherwise None"""
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        return None
+    limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError('Limit out of range')
+    cursor = request.args.get('cursor')
+    return limit, decode_cursor(cursor, sort_by) if cursor else None
+
+def page_response(page, sort_by):
+    """Serialize one page with its total count and the cursor for the next page"""
+    return jsonify({
+        'items': page['items'],
+        'total': page['total'],
+        'next_cursor': encode_cursor(sort_by, page['next'])
+    })
+
+def invalid_page_response():
+    """Error response for a bad limit or cursor"""
+    return jsonify({'error': f'Invalid pagination: limit must be 1-{MAX_PAGE_SIZE} and cursor must come from a previous page'}), 400
+
+# Report helpers
+def get_report_window():
+    """Return (limit, offset) for the rows of a report; limit None means all rows"""
+    limit = request.args.get('limit')
+    limit = int(limit) if limit is not None else None
+    offset = int(request.args.get('offset', 0))
+    if (limit is not None and not 1 <= limit <= MAX_PAGE_SIZE) or offset < 0:
+        raise ValueError('Report window out of range')
+    return limit, offset
+
+def invalid_report_response():
+    """Error response for bad report parameters"""
+    return jsonify({'error': f'Invalid report parameters: limit must be 1-{MAX_PAGE_SIZE}, offset must not be negative and stock must be all, {", ".join(STOCK_BANDS)}'}), 400
+
+# Streaming helpers
+STREAM_CHUNK_SIZE = 65536
+
+def get_stream_format():
+    """Return 'ndjson' or 'json' when the client asked for a streamed body, else None"""
+    if request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson':
+        return 'ndjson'
+    if request.args.get('stream', '').lower() in ('1', 'true'):
+        return 'ndjson' if request.args.get('format') == 'ndjson' else 'json'
+    return None
+
+def stream_records(records, stream_format):
+    """Yield a JSON array or NDJSON body in chunks, one record at a time"""
+    ndjson = stream_format == 'ndjson'
+    buffer = [] if ndjson else ['[']
+    size, first = 0, True
+    for record in records:
+        if ndjson:
+            piece = json.dumps(record) + '\n'
+        else:
+            piece = json.dumps(record) if first else ',' + json.dumps(record)
+        first = False
+        buffer.append(piece)
+        size += len(piece)
+        if size >= STREAM_CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if not ndjson:
+        buffer.append(']')
+    if buffer:
+        yield ''.join(buffer)
+
+def stream_response(records, stream_format):
+    """Build a streamed response from an iterator of records"""
+    mimetype = 'application/x-ndjson' if stream_format == 'ndjson' else 'application/json'
+    return Response(stream_with_context(stream_records(records, stream_format)), mimetype=mimetype)
+
+# Batch helpers
+def run_batch(kind, validate_new, validate_updates, apply_batch):
+    """Validate and apply a batch request, answering with one result per operation"""
+    try:
+        operations, errors = validate_batch(request.get_json(silent=True), validate_new, validate_updates)
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    if errors:
+        return jsonify({'applied': False, 'errors': [dict(error, status=400) for error in errors]}), 400
+    
+    try:
+        results = apply_batch(operations)
+    except BatchRejected as e:
+        errors = [{'index': index, 'status': 404, 'error': f'{kind.capitalize()} not found'} for index in e.missing]
+        return jsonify({'applied': False, 'errors': errors}), 404
+    
+    statuses = {'create': 201, 'update': 200, 'delete': 200}
+    return jsonify({'applied': True, 'results': [
+        {'status': statuses[operation['op']], kind: result} if result is not True
+        else {'status': 200, 'message': f'{kind.capitalize()} deleted successfully'}
+        for operation, result in zip(operations, results)
+    ]})
+
+# Import helpers
+def run_import(collection):
+    """Stream a CSV or NDJSON request body into a collection and summarise the result"""
+    fmt = request.args.get('format') or {'text/csv': 'csv', 'application/x-ndjson': 'ndjson'}.get(request.mimetype)
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({'error': 'Send the rows as text/csv or application/x-ndjson, or set format=csv|ndjson'}), 400
+    
+    # Parse the body as it arrives rather than reading it all first
+    return jsonify(import_records(data_manager, collection, request.stream, fmt))
+
+# Change feed helpers
+EVENT_COLLECTIONS = ('products', 'customers')
+# Seconds between keep-alive comments on an idle event stream
+EVENT_KEEPALIVE_SECONDS = 15
+# Event streams open at once (EVENT_STREAMS) outside ASGI mode, where each holds a server thread
+event_streams = threading.BoundedSemaphore(int(os.environ.get("EVENT_STREAMS", "16")))
+
+def parse_event_id(event_id):
+    """Parse an event id such as 'products:12,customers:7' into versions per collection"""
+    versions = dict(part.split(':') for part in event_id.split(','))
+    if set(versions) != set(EVENT_COLLECTIONS):
+        raise ValueError('Event id must name every collection')
+    return {name: int(version) for name, version in versions.items()}
+
+def format_event(event, data, versions=None):
+    """Format one server-sent event, with an id to resume from when versions are given"""
+    lines = [f'event: {event}', f'data: {json.dumps(data)}']
+    if versions is not None:
+        lines.append('id: ' + ','.join(f'{name}:{versions[name]}' for name in EVENT_COLLECTIONS))
+    return '\n'.join(lines) + '\n\n'
+
+def current_versions():
+    """Return the current version of each collection an event stream follows"""
+    return {name: data_manager.changes_since(name, 0)[0] for name in EVENT_COLLECTIONS}
+
+def pending_events(versions):
+    """Return the change events past the given versions, and move the versions on past them
+    
+    Changes committed together share a version, so only the last event of
+    each version carries an id: a client that reconnects mid-commit gets the
+    whole commit again rather than losing the rest of it. A client the
+    change log no longer reaches is sent a ``resync`` event instead.
+    """
+    events = []
+    for name in EVENT_COLLECTIONS:
+        current, changes = data_manager.changes_since(name, versions[name])
+        if changes is None:
+            versions[name] = current
+            events.append(format_event('resync', {'collection': name, 'version': current}, versions))
+            continue
+        for index, change in enumerate(changes):
+            last = index + 1 == len(changes) or changes[index + 1]['version'] != change['version']
+            if last:
+                versions[name] = change['version']
+            events.append(format_event('change', change, versions if last else None))
+    return events
+
+def stream_events(versions, disconnected):
+    """Yield change events past the given versions, waiting for more between writes
+    
+    The stream ends once the ``disconnected`` event is set.
+    """
+    if versions is None:
+        versions = current_versions()
+        yield format_event('ready', versions, versions)
+    while not disconnected.is_set():
+        yield from pending_events(versions)
+        if not data_manager.wait_for_change(versions, EVENT_KEEPALIVE_SECONDS, disconnected):
+            yield ': keep-alive\n\n'
+
+# Delta sync helpers
+def run_changes(collection):
+    """Answer with the net changes to a collection since the client's version"""
+    try:
+        since = int(request.args['since'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'since must be a version returned by an earlier sync'}), 400
+    
+    version, changes = data_manager.changes_since(collection, since)
+    if changes is None:
+        # 410 Gone: the change log no longer reaches back to this version
+        return jsonify({'error': 'Changes since this version are no longer available; reload in full',
+                        'resync': True, 'version': version}), 410
+    return jsonify(dict(net_changes(changes), since=since, version=version, resync=False))
+
+# HTTP caching helpers
+# Serialized bodies of memoized GETs (RESPONSE_CACHE_SIZE entries, 0 disables)
+response_cache = ResponseCache(int(os.environ.get("RESPONSE_CACHE_SIZE", "256")),
+                               int(os.environ.get("RESPONSE_CACHE_MAX_BODY", str(1 << 20))))
+
+def make_etag(versions):
+    """Build a strong ETag from the request and the versions of the collections it reads"""
+    key = json.dumps([request.full_path, get_stream_format(), versions])
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def versioned(*collections, memoize=False):
+    """Tag GET responses with an ETag and answer a matching If-None-Match with 304
+    
+    With ``memoize`` the serialized body is also kept in ``response_cache``,
+    keyed by path and normalized query parameters, and served again until a
+    collection version changes. The versions are read before the view runs,
+    so a write racing with it can only leave a tag or cache entry out of
+    date, which just costs a recomputation.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                versions = [data_manager.get_version(name) for name in collections]
+                etag = make_etag(versions)
+            except Exception as e:
+                logging.error(f"Error reading collection versions: {str(e)}")
+                return view(*args, **kwargs)
+            
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                key = (request.path, tuple(sorted(request.args.items(multi=True))), get_stream_format())
+                body = response_cache.get(key, versions) if memoize else None
+                if body is not None:
+                    response = Response(body, mimetype='application/json')
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    if memoize and not response.is_streamed:
+                        response_cache.put(key, versions, response.get_data())
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            response.vary.add('Accept')
+            return response
+        return wrapper
+    return decorator
 
 # Routes for serving the frontend
 @app.route('/')
@@ -35,9 +310,23 @@ def reports():
 
 # API Routes for Products
 @app.route('/api/products', methods=['GET'])
+@versioned('products')
 def get_products():
-    """Get all products"""
+    """Get all products, one page of them (limit/cursor) or a streamed export"""
     try:
+        sort_by = request.args.get('sort', 'id')
+        try:
+            page_args = get_page_args(sort_by)
+        except ValueError:
+            return invalid_page_response()
+        if page_args:
+            page = data_manager.page_products('', sort_by, *page_args)
+            return page_response(page, sort_by)
+        
+        stream_format = get_stream_format()
+        if stream_format:
+            return stream_response(data_manager.iter_products(), stream_format)
+        
         products = data_manager.get_all_products()
         return jsonify(products)
     except Exception as e:
@@ -45,10 +334,11 @@ def get_products():
         return jsonify({'error': 'Failed to retrieve products'}), 500
 
 @app.route('/api/products/<int:product_id>', methods=['GET'])
+@versioned('products')
 def get_product(product_id):
     """Get a specific product by ID"""
     try:
-         product = data_manager.get_product(product_id)
+        product = data_manager.get_product(product_id)
         if product:
             return jsonify(product)
         return jsonify({'error': 'Product not found'}), 404
@@ -60,27 +350,10 @@ def get_product(product_id):
 def create_product():
     """Create a new product"""
     try:
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['name', 'price', 'stock']
-        if not all(field in data for field in required_fields):
-            return jsonify({'error': 'Missing required fields: name, price, stock'}), 400
-        
-        # Validate data types
         try:
-            data['price'] = float(data['price'])
-            data['stock'] = int(data['stock'])
-        except ValueError:
-            return jsonify({'error': 'Invalid data types: price must be a number, stock must be an integer'}), 400
-        
-        # Validate values
-        if data['price'] < 0:
-            return jsonify({'error': 'Price cannot be negative'}), 400
-        if data['stock'] < 0:
-            return jsonify({'error': 'Stock cannot be negative'}), 400
-        if not data['name'].strip():
-            return jsonify({'error': 'Product name cannot be empty'}), 400
+            data = validate_new_product(request.get_json())
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
         
         product = data_manager.create_product(data['name'], data['price'], data['stock'])
         return jsonify(product), 201
@@ -92,27 +365,11 @@ def create_product():
 def update_product(product_id):
     """Update an existing product"""
     try:
-        data = request.get_json()
-        
         # Validate data if provided
-        if 'price' in data:
-            try:
-                data['price'] = float(data['price'])
-                if data['price'] < 0:
-                    return jsonify({'error': 'Price cannot be negative'}), 400
-            except ValueError:
-                return jsonify({'error': 'Invalid price format'}), 400
-        
-        if 'stock' in data:
-            try:
-                data['stock'] = int(data['stock'])
-                if data['stock'] < 0:
-                    return jsonify({'error': 'Stock cannot be negative'}), 400
-            except ValueError:
-                return jsonify({'error': 'Invalid stock format'}), 400
-        
-        if 'name' in data and not data['name'].strip():
-            return jsonify({'error': 'Product name cannot be empty'}), 400
+        try:
+            data = validate_product_updates(request.get_json())
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
         
         product = data_manager.update_product(product_id, data)
         if product:
@@ -133,11 +390,54 @@ def delete_product(product_id):
         logging.error(f"Error deleting product {product_id}: {str(e)}")
         return jsonify({'error': 'Failed to delete product'}), 500
 
+@app.route('/api/products/batch', methods=['POST'])
+def batch_products():
+    """Apply many product creates, updates and deletes at once, all or nothing"""
+    try:
+        return run_batch('product', validate_new_product, validate_product_updates,
+                         data_manager.apply_product_batch)
+    except Exception as e:
+        logging.error(f"Error applying product batch: {str(e)}")
+        return jsonify({'error': 'Failed to apply product batch'}), 500
+
+@app.route('/api/products/import', methods=['POST'])
+def import_products():
+    """Create products from a streamed CSV or NDJSON upload"""
+    try:
+        return run_import('products')
+    except Exception as e:
+        logging.error(f"Error importing products: {str(e)}")
+        return jsonify({'error': 'Failed to import products'}), 500
+
+@app.route('/api/products/changes', methods=['GET'])
+@versioned('products')
+def get_product_changes():
+    """Get the products inserted, updated and deleted since a version"""
+    try:
+        return run_changes('products')
+    except Exception as e:
+        logging.error(f"Error getting product changes: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve product changes'}), 500
+
 # API Routes for Customers
 @app.route('/api/customers', methods=['GET'])
+@versioned('customers')
 def get_customers():
-    """Get all customers"""
+    """Get all customers, one page of them (limit/cursor) or a streamed export"""
     try:
+        sort_by = request.args.get('sort', 'id')
+        try:
+            page_args = get_page_args(sort_by)
+        except ValueError:
+            return invalid_page_response()
+        if page_args:
+            page = data_manager.page_customers('', sort_by, *page_args)
+            return page_response(page, sort_by)
+        
+        stream_format = get_stream_format()
+        if stream_format:
+            return stream_response(data_manager.iter_customers(), stream_format)
+        
         customers = data_manager.get_all_customers()
         return jsonify(customers)
     except Exception as e:
@@ -145,6 +445,7 @@ def get_customers():
         return jsonify({'error': 'Failed to retrieve customers'}), 500
 
 @app.route('/api/customers/<int:customer_id>', methods=['GET'])
+@versioned('customers')
 def get_customer(customer_id):
     """Get a specific customer by ID"""
     try:
@@ -160,20 +461,10 @@ def get_customer(customer_id):
 def create_customer():
     """Create a new customer"""
     try:
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['name', 'email', 'phone']
-        if not all(field in data for field in required_fields):
-            return jsonify({'error': 'Missing required fields: name, email, phone'}), 400
-        
-        # Validate values
-        if not data['name'].strip():
-            return jsonify({'error': 'Customer name cannot be empty'}), 400
-        if not data['email'].strip() or '@' not in data['email']:
-            return jsonify({'error': 'Invalid email format'}), 400
-        if not data['phone'].strip():
-            return jsonify({'error': 'Phone number cannot be empty'}), 400
+        try:
+            data = validate_new_customer(request.get_json())
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
         
         customer = data_manager.create_customer(data['name'], data['email'], data['phone'])
         return jsonify(customer), 201
@@ -185,15 +476,11 @@ def create_customer():
 def update_customer(customer_id):
     """Update an existing customer"""
     try:
-        data = request.get_json()
-        
         # Validate data if provided
-        if 'name' in data and not data['name'].strip():
-            return jsonify({'error': 'Customer name cannot be empty'}), 400
-        if 'email' in data and (not data['email'].strip() or '@' not in data['email']):
-            return jsonify({'error': 'Invalid email format'}), 400
-        if 'phone' in data and not data['phone'].strip():
-            return jsonify({'error': 'Phone number cannot be empty'}), 400
+        try:
+            data = validate_customer_updates(request.get_json())
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
         
         customer = data_manager.update_customer(customer_id, data)
         if customer:
@@ -203,8 +490,8 @@ def update_customer(customer_id):
         logging.error(f"Error updating customer {customer_id}: {str(e)}")
         return jsonify({'error': 'Failed to update customer'}), 500
 
-app.route('/api/customers/<int:customer_id>', methods=['DELETE'])
-def d@elete_customer(customer_id):
+@app.route('/api/customers/<int:customer_id>', methods=['DELETE'])
+def delete_customer(customer_id):
     """Delete a customer"""
     try:
         if data_manager.delete_customer(customer_id):
@@ -213,36 +500,44 @@ def d@elete_customer(customer_id):
     except Exception as e:
         logging.error(f"Error deleting customer {customer_id}: {str(e)}")
         return jsonify({'error': 'Failed to delete customer'}), 500
-                        
+
+@app.route('/api/customers/batch', methods=['POST'])
+def batch_customers():
+    """Apply many customer creates, updates and deletes at once, all or nothing"""
+    try:
+        return run_batch('customer', validate_new_customer, validate_customer_updates,
+                         data_manager.apply_customer_batch)
+    except Exception as e:
+        logging.error(f"Error applying customer batch: {str(e)}")
+        return jsonify({'error': 'Failed to apply customer batch'}), 500
+
+@app.route('/api/customers/import', methods=['POST'])
+def import_customers():
+    """Create customers from a streamed CSV or NDJSON upload"""
+    try:
+        return run_import('customers')
+    except Exception as e:
+        logging.error(f"Error importing customers: {str(e)}")
+        return jsonify({'error': 'Failed to import customers'}), 500
+
+@app.route('/api/customers/changes', methods=['GET'])
+@versioned('customers')
+def get_customer_changes():
+    """Get the customers inserted, updated and deleted since a version"""
+    try:
+        return run_changes('customers')
+    except Exception as e:
+        logging.error(f"Error getting customer changes: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve customer changes'}), 500
+
 # API Routes for Statistics and Reports
 @app.route('/api/stats/summary', methods=['GET'])
+@versioned('products', 'customers', memoize=True)
 def get_summary_stats():
     """Get summary statistics"""
     try:
-        products = data_manager.get_all_products()
-        customers = data_manager.get_all_customers()
-        
-        # Calculate statistics
-        total_products = len(products)
-        total_customers = len(customers)
-        low_stock_items = len([p for p in products if p['stock'] <= 5])
-        total_inventory_value = sum(p['price'] * p['stock'] for p in products)
-        
-        # Find most expensive and cheapest products
-        most_expensive = max(products, key=lambda x: x['price']) if products else None
-        cheapest = min(products, key=lambda x: x['price']) if products else None
-        
-        stats = {
-            'total_products': total_products,
-            'total_customers': total_customers,
-            'low_stock_items': low_stock_items,
-            'total_inventory_value': round(total_inventory_value, 2),
-            'most_expensive_product': most_expensive,
-            'cheapest_product': cheapest,
-            'average_price': round(sum(p['price'] for p in products) / len(products), 2) if products else 0,
-            'recent_products': products[-5:] if len(products) >= 5 else products,
-            'recent_customers': customers[-5:] if len(customers) >= 5 else customers
-        }
+        # Aggregates are maintained by the data manager as records change
+        stats = data_manager.get_summary_stats()
         
         return jsonify(stats)
     except Exception as e:
@@ -250,56 +545,131 @@ def get_summary_stats():
         return jsonify({'error': 'Failed to retrieve statistics'}), 500
 
 @app.route('/api/products/search', methods=['GET'])
+@versioned('products', memoize=True)
 def search_products():
     """Search products by name"""
     try:
-        query = request.args.get('q', '').lower()
+        query = request.args.get('q', '')
         sort_by = request.args.get('sort', 'name')
+        try:
+            page_args = get_page_args(sort_by)
+        except ValueError:
+            return invalid_page_response()
+        if page_args:
+            page = data_manager.page_products(query, sort_by, *page_args)
+            return page_response(page, sort_by)
         
-        products = data_manager.get_all_products()
-        
-        # Filter by search query
-        if query:
-            products = [p for p in products if query in p['name'].lower()]
-        
-        # Sort products
-        if sort_by == 'price':
-            products.sort(key=lambda x: x['price'])
-        elif sort_by == 'stock':
-            products.sort(key=lambda x: x['stock'])
-        else:  # name
-            products.sort(key=lambda x: x['name'].lower())
-        
+        products = data_manager.search_products(query, sort_by)
         return jsonify(products)
     except Exception as e:
         logging.error(f"Error searching products: {str(e)}")
         return jsonify({'error': 'Failed to search products'}), 500
 
 @app.route('/api/customers/search', methods=['GET'])
+@versioned('customers', memoize=True)
 def search_customers():
     """Search customers by name or email"""
     try:
-        query = request.args.get('q', '').lower()
+        query = request.args.get('q', '')
         sort_by = request.args.get('sort', 'name')
+        try:
+            page_args = get_page_args(sort_by)
+        except ValueError:
+            return invalid_page_response()
+        if page_args:
+            page = data_manager.page_customers(query, sort_by, *page_args)
+            return page_response(page, sort_by)
         
-        customers = data_manager.get_all_customers()
-        
-        # Filter by search query
-        if query:
-            customers = [c for c in customers if query in c['name'].lower() or query in c['email'].lower()]
-        
-        # Sort customers
-        if sort_by == 'email':
-            customers.sort(key=lambda x: x['email'].lower())
-        elif sort_by == 'phone':
-            customers.sort(key=lambda x: x['phone'])
-        else:  # name
-            customers.sort(key=lambda x: x['name'].lower())
-        
+        customers = data_manager.search_customers(query, sort_by)
         return jsonify(customers)
     except Exception as e:
         logging.error(f"Error searching customers: {str(e)}")
         return jsonify({'error': 'Failed to search customers'}), 500
 
+@app.route('/api/reports/inventory', methods=['GET'])
+@versioned('products', memoize=True)
+def get_inventory_report():
+    """Get the inventory report: one stock band, sorted, with its totals"""
+    try:
+        stock_band = request.args.get('stock', 'all')
+        sort_by = request.args.get('sort', 'name')
+        try:
+            if stock_band != 'all' and stock_band not in STOCK_BANDS:
+                raise ValueError('Unknown stock band')
+            limit, offset = get_report_window()
+        except ValueError:
+            return invalid_report_response()
+        
+        return jsonify(inventory_report(data_manager, stock_band, sort_by, limit, offset))
+    except Exception as e:
+        logging.error(f"Error building inventory report: {str(e)}")
+        return jsonify({'error': 'Failed to build inventory report'}), 500
+
+@app.route('/api/reports/customers', methods=['GET'])
+@versioned('customers', memoize=True)
+def get_customer_report():
+    """Get the customer report: matching customers, sorted, with domain counts"""
+    try:
+        query = request.args.get('q', '')
+        sort_by = request.args.get('sort', 'name')
+        try:
+            limit, offset = get_report_window()
+        except ValueError:
+            return invalid_report_response()
+        
+        return jsonify(customer_report(data_manager, query, sort_by, limit, offset))
+    except Exception as e:
+        logging.error(f"Error building customer report: {str(e)}")
+        return jsonify({'error': 'Failed to build customer report'}), 500
+
+@app.route('/api/reports/stock-bands', methods=['GET'])
+@versioned('products', memoize=True)
+def get_stock_band_report():
+    """Get product counts, stock value and average price per stock band"""
+    try:
+        return jsonify(stock_band_report(data_manager))
+    except Exception as e:
+        logging.error(f"Error building stock band report: {str(e)}")
+        return jsonify({'error': 'Failed to build stock band report'}), 500
+
+@app.route('/api/events', methods=['GET'])
+def get_events():
+    """Stream product and customer changes as server-sent events
+    
+    Resumes after the standard Last-Event-ID header or a last_event_id
+    parameter; without either the stream starts at the current versions.
+    In ASGI mode the server passes ``asgi.event_stream``, is handed the
+    versions in it and sends the events from its event loop. Otherwise each
+    stream holds a server thread, so this answers 503 while
+    ``EVENT_STREAMS`` streams are already open, and a stream only notices
+    its client is gone when a write to it fails.
+    """
+    try:
+        event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        versions = parse_event_id(event_id) if event_id else None
+    except ValueError:
+        return jsonify({'error': 'Invalid event id: expected products:<version>,customers:<version>'}), 400
+    native = request.environ.get('asgi.event_stream')
+    if native is not None:
+        native['versions'] = versions
+        response = Response(iter(()), mimetype='text/event-stream')
+    elif not event_streams.acquire(blocking=False):
+        response = jsonify({'error': 'Too many event streams are open; try again later'})
+        response.headers['Retry-After'] = str(EVENT_KEEPALIVE_SECONDS)
+        return response, 503
+    else:
+        disconnected = request.environ.get('asgi.disconnected') or threading.Event()
+        response = Response(stream_events(versions, disconnected), mimetype='text/event-stream')
+        response.call_on_close(event_streams.release)
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop proxies holding events back to fill a buffer
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/stats/cache', methods=['GET'])
+def get_cache_stats():
+    """Get the response cache's size and hit/miss/eviction counters"""
+    return jsonify(response_cache.stats())
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,258 @@
+"""ASGI entry point: the same Flask app and routes, served by an ASGI server
+
+Run with ``uvicorn asgi:application`` (``pip install uvicorn``), or ``python
+asgi.py``. Connections are held by the server's event loop, so thousands of
+idle or slow clients cost no threads. Each request is handed to the Flask
+app on a bounded pool of worker threads (``ASGI_THREADS``, default 32), which
+keeps every storage read and write off the event loop. Request and response
+bodies are streamed between the two a chunk at a time.
+
+Once the whole request body is in, the loop goes on listening for the
+client to hang up, so that is noticed at once and the response stops.
+
+``/api/events`` streams are sent from the event loop itself, so they hold no
+worker thread while they wait: the route validates the request and hands over
+the versions to resume from, and one ``ChangeWatcher`` thread per process
+waits for writes and wakes every open stream. Only reading the changes runs
+on a worker thread.
+"""
+import asyncio
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app import EVENT_KEEPALIVE_SECONDS, app, current_versions, data_manager, format_event, pending_events
+
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", "32"))
+
+executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix='asgi-worker')
+
+
+class RequestBody(io.RawIOBase):
+    """``wsgi.input`` that pulls the request body from the event loop as it is read
+    
+    Starts from the request's first message. Calls ``on_complete`` once the
+    last chunk is in, and sets ``disconnected`` if the client goes first.
+    """
+    
+    def __init__(self, receive: Callable, loop: asyncio.AbstractEventLoop, first: Dict,
+                 disconnected: threading.Event, on_complete: Callable):
+        self.receive = receive
+        self.loop = loop
+        self.buffer = first.get('body', b'')
+        self.more = first.get('more_body', False)
+        self.disconnected = disconnected
+        self.on_complete = on_complete
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, target) -> int:
+        while not self.buffer and self.more:
+            message = asyncio.run_coroutine_threadsafe(self.receive(), self.loop).result()
+            if message['type'] == 'http.disconnect':
+                self.more = False
+                self.disconnected.set()
+                break
+            self.buffer = message.get('body', b'')
+            self.more = message.get('more_body', False)
+            if not self.more:
+                self.loop.call_soon_threadsafe(self.on_complete)
+        size = min(len(target), len(self.buffer))
+        target[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+
+def build_environ(scope: Dict, body: io.BufferedReader, disconnected: threading.Event) -> Dict:
+    """Translate an ASGI HTTP scope into a WSGI environ"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        # The body ends where the ASGI messages end, with or without a length
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'asgi.disconnected': disconnected,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def watch_disconnect(receive: Callable, disconnected: threading.Event):
+    """Wait, once the request body is in, for the client to disconnect"""
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+    disconnected.set()
+
+
+class ChangeWatcher:
+    """Waits for writes on one thread and wakes the event streams on the loop
+    
+    The thread reads the versions, wakes the streams, then waits for the
+    versions to move on. A stream takes ``changed`` before reading its
+    changes, so a write that lands while it reads still wakes it.
+    """
+    
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stop = threading.Event()
+        self.event = asyncio.Event()
+    
+    def changed(self, loop: asyncio.AbstractEventLoop) -> asyncio.Event:
+        """Return the event set by the next write, starting the thread for this loop if need be"""
+        if self.loop is not loop:
+            self.stop.set()
+            self.loop, self.stop, self.event = loop, threading.Event(), asyncio.Event()
+            threading.Thread(target=self.watch, args=(loop, self.stop), name='asgi-events', daemon=True).start()
+        return self.event
+    
+    def watch(self, loop: asyncio.AbstractEventLoop, stop: threading.Event):
+        while not stop.is_set():
+            versions = current_versions()
+            try:
+                loop.call_soon_threadsafe(self.wake)
+            except RuntimeError:
+                # The loop has closed
+                return
+            while not data_manager.wait_for_change(versions, EVENT_KEEPALIVE_SECONDS, stop):
+                if stop.is_set():
+                    return
+    
+    def wake(self):
+        event, self.event = self.event, asyncio.Event()
+        event.set()
+
+
+change_watcher = ChangeWatcher()
+
+
+async def serve_events(versions: Optional[Dict[str, int]], send: Callable, watchers: List[asyncio.Task]):
+    """Send an event stream from the loop until the client disconnects"""
+    loop = asyncio.get_running_loop()
+    
+    async def emit(events: List[str]):
+        if events:
+            await send({'type': 'http.response.body', 'body': ''.join(events).encode(), 'more_body': True})
+    
+    if versions is None:
+        versions = await loop.run_in_executor(executor, current_versions)
+        await emit([format_event('ready', versions, versions)])
+    while not any(task.done() for task in watchers):
+        changed = change_watcher.changed(loop)
+        await emit(await loop.run_in_executor(executor, pending_events, versions))
+        waiting = loop.create_task(changed.wait())
+        done, _ = await asyncio.wait([waiting, *watchers], timeout=EVENT_KEEPALIVE_SECONDS,
+                                     return_when=asyncio.FIRST_COMPLETED)
+        waiting.cancel()
+        if not done:
+            await emit([': keep-alive\n\n'])
+
+
+def run_wsgi(scope: Dict, body: RequestBody, disconnected: threading.Event, send: Callable,
+             loop: asyncio.AbstractEventLoop) -> Optional[Dict]:
+    """Call the Flask app on a worker thread, sending its response through the loop
+    
+    Stops iterating the response, and closes it, once the client is gone.
+    Returns ``asgi.event_stream`` when the app handed an event stream over
+    to the loop, leaving the response open.
+    """
+    def deliver(message: Dict):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+    
+    response: List[Optional[Tuple[int, List]]] = [None]
+    
+    def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+        response[0] = (int(status.split(' ', 1)[0]),
+                       [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers])
+    
+    def start():
+        status, headers = response[0]
+        deliver({'type': 'http.response.start', 'status': status, 'headers': headers})
+    
+    environ = build_environ(scope, io.BufferedReader(body), disconnected)
+    stream: Dict = {}
+    environ['asgi.event_stream'] = stream
+    result = app(environ, start_response)
+    try:
+        started = False
+        for chunk in result:
+            if disconnected.is_set():
+                return
+            if not chunk:
+                continue
+            if not started:
+                start()
+                started = True
+            deliver({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        if not started:
+            start()
+        if 'versions' in stream:
+            return stream
+        deliver({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+
+
+async def application(scope: Dict, receive: Callable, send: Callable):
+    """ASGI application serving the Flask app"""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                change_watcher.stop.set()
+                executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    if scope['type'] != 'http':
+        raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+    loop = asyncio.get_running_loop()
+    first = await receive()
+    if first['type'] == 'http.disconnect':
+        return
+    disconnected = threading.Event()
+    watchers: List[asyncio.Task] = []
+    
+    def watch():
+        watchers.append(loop.create_task(watch_disconnect(receive, disconnected)))
+    
+    body = RequestBody(receive, loop, first, disconnected, watch)
+    if not body.more:
+        watch()
+    try:
+        stream = await loop.run_in_executor(executor, run_wsgi, scope, body, disconnected, send, loop)
+        if stream is not None:
+            await serve_events(stream['versions'], send, watchers)
+    finally:
+        for watcher in watchers:
+            watcher.cancel()
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run('asgi:application', host='0.0.0.0', port=int(os.environ.get("PORT", "5000")))
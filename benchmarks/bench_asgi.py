@@ -0,0 +1,134 @@
+"""Load test the Flask development server against the ASGI mode (uvicorn asgi:application)
+
+Each server runs in its own process over the same synthetic catalogue. An
+asyncio client keeps --connections clients busy for --seconds, each sending
+a mix of product, summary and search GETs (reusing its connection where the
+server allows), and reports requests/sec and latency percentiles. Needs
+uvicorn installed.
+
+Usage: python benchmarks/bench_asgi.py [--products 10000] [--connections 50,1000] [--seconds 10]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_read_cache import write_catalogue
+
+PATHS = ['/api/products/42', '/api/stats/summary', '/api/products/search?q=Product%2012&limit=20']
+
+SERVERS = {
+    'flask': [sys.executable, '-c', 'from app import app; app.run(port={port}, threaded=True)'],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'asgi:application', '--port', '{port}',
+             '--log-level', 'warning', '--backlog', '4096'],
+}
+
+
+def free_port():
+    """Return a TCP port nothing is listening on"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    """Block until a server accepts connections on port"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+async def fetch(connection, port, path):
+    """Send one GET, reconnecting if needed; returns the connection to reuse or None"""
+    if connection is None:
+        connection = await asyncio.open_connection('127.0.0.1', port)
+    reader, writer = connection
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    headers = head.decode('latin-1').lower()
+    length = int(headers.split('content-length:')[1].split('\r\n')[0])
+    await reader.readexactly(length)
+    if head.startswith(b'HTTP/1.0') or 'connection: close' in headers:
+        writer.close()
+        return None
+    return connection
+
+
+async def client(port, deadline, latencies, errors, offset):
+    """Issue requests back to back until the deadline"""
+    connection, i = None, offset
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            connection = await asyncio.wait_for(fetch(connection, port, PATHS[i % len(PATHS)]), 30)
+            latencies.append(time.perf_counter() - start)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+            errors.append(1)
+            connection = None
+        i += 1
+    if connection is not None:
+        connection[1].close()
+
+
+async def load(port, connections, seconds):
+    """Return (requests/sec, p50 ms, p99 ms, errors) for one load level"""
+    latencies, errors = [], []
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(client(port, deadline, latencies, errors, i) for i in range(connections)))
+    latencies.sort()
+    if not latencies:
+        return 0, 0, 0, len(errors)
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    return len(latencies) / seconds, percentile(0.5), percentile(0.99), len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--connections', default='50,1000')
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    test_dir = tempfile.mkdtemp()
+    original_dir = os.getcwd()
+    os.chdir(test_dir)
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    try:
+        write_catalogue(args.products)
+        print(f"{'server':<8}{'conns':>7}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+        for name, command in SERVERS.items():
+            port = free_port()
+            server = subprocess.Popen([part.format(port=port) for part in command], env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_for_port(port)
+                asyncio.run(load(port, 5, 1))  # warm the caches
+                for connections in (int(n) for n in args.connections.split(',')):
+                    rate, p50, p99, errors = asyncio.run(load(port, connections, args.seconds))
+                    print(f"{name:<8}{connections:>7}{rate:>9.0f}{p50:>9.1f}{p99:>9.1f}{errors:>8}")
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(test_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark bulk stock updates sent as one PUT per product against one batch POST
+
+Usage: python benchmarks/bench_batch.py [--products 20000] [--updates 100,300]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_read_cache import write_catalogue
+
+
+def per_item(client, ids, stock):
+    """Send one PUT per product"""
+    for product_id in ids:
+        response = client.put(f'/api/products/{product_id}', data=json.dumps({'stock': stock}),
+                              content_type='application/json')
+        assert response.status_code == 200
+
+
+def batched(client, ids, stock):
+    """Send every update in a single batch request"""
+    operations = [{'op': 'update', 'id': product_id, 'stock': stock} for product_id in ids]
+    response = client.post('/api/products/batch', data=json.dumps({'operations': operations}),
+                           content_type='application/json')
+    assert response.status_code == 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--updates', default='100,300')
+    args = parser.parse_args()
+
+    test_dir = tempfile.mkdtemp()
+    original_dir = os.getcwd()
+    os.chdir(test_dir)
+    try:
+        write_catalogue(args.products)
+        from app import app  # the app's data manager opens the files in the current directory
+        client = app.test_client()
+
+        print(f"{'updates':>8}{'per-item ms':>14}{'batch ms':>12}{'speedup':>10}")
+        for count in (int(n) for n in args.updates.split(',')):
+            ids = range(1, min(count, args.products) + 1)
+            start = time.perf_counter()
+            per_item(client, ids, 7)
+            per_item_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            batched(client, ids, 8)
+            batch_ms = (time.perf_counter() - start) * 1000
+            print(f"{len(ids):>8}{per_item_ms:>14.1f}{batch_ms:>12.1f}{per_item_ms / batch_ms:>9.0f}x")
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(test_dir)
+
+
+if __name__ == '__main__':
+    main()
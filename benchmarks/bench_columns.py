@@ -0,0 +1,55 @@
+"""Benchmark stock band totals over NumPy columns against the pure-Python pass
+
+Covers the aggregates behind /api/reports/stock-bands and the inventory report
+summary: per band product count, price sum (for the average) and stock value.
+
+Usage: python benchmarks/bench_columns.py [--products 1000000] [--repeat 10]
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_read_cache import time_calls
+from columns import COLUMNS_AVAILABLE, ProductColumns, band_totals_python
+from data_manager import Collection
+from records import Product
+from reports import STOCK_BANDS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    index_types = (ProductColumns,) if COLUMNS_AVAILABLE else ()
+    products = Collection(({'id': i, 'name': f'Product {i}', 'price': rng.randint(100, 99999) / 100,
+                            'stock': rng.randint(0, 60)} for i in range(1, args.products + 1)),
+                          index_types=index_types, record_type=Product)
+    bands = dict(STOCK_BANDS, all=(None, None))
+
+    python_ms = time_calls(lambda: band_totals_python(products.by_id.values(), bands), args.repeat)
+    print(f"pure Python pass over {args.products} products: {python_ms:.1f} ms")
+    if not COLUMNS_AVAILABLE:
+        print("NumPy is not installed; the columnar path is unavailable")
+        return
+
+    columns = products.indexes[ProductColumns]
+    build_ms = time_calls(columns._build, 1)
+    numpy_ms = time_calls(lambda: columns.band_totals(bands), args.repeat)
+    expected, actual = band_totals_python(products.by_id.values(), bands), columns.band_totals(bands)
+    assert all(expected[name][0] == actual[name][0] and
+               round(expected[name][2], 2) == round(actual[name][2], 2) for name in bands)
+    print(f"NumPy columns: {numpy_ms:.1f} ms ({python_ms / numpy_ms:.0f}x), built once in {build_ms:.0f} ms")
+
+    update_ms = time_calls(lambda: products.put({'id': args.products // 2, 'name': 'Product',
+                                                 'price': 1.25, 'stock': 3}), 1000)
+    print(f"put() keeping the columns current: {update_ms * 1000:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
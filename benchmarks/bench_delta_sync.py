@@ -0,0 +1,56 @@
+"""Benchmark re-downloading /api/products against /api/products/changes after some churn
+
+A client that is in sync sees --churn stock updates, then catches up either by
+fetching the whole list again or by asking for the changes since its version.
+Reports server time and bytes transferred for each, at several churn levels.
+
+Usage: python benchmarks/bench_delta_sync.py [--products 100000] [--churn 10,100,1000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_read_cache import time_calls, write_catalogue
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--churn', default='10,100,1000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    test_dir = tempfile.mkdtemp()
+    original_dir = os.getcwd()
+    os.chdir(test_dir)
+    try:
+        write_catalogue(args.products)
+        from app import app, data_manager  # the app's data manager opens the files in the current directory
+        client = app.test_client()
+        rng = random.Random(3)
+
+        print(f"{'churn':>7}{'full ms':>10}{'full KiB':>10}{'delta ms':>10}{'delta KiB':>11}{'speedup':>9}")
+        for churn in (int(n) for n in args.churn.split(',')):
+            version = json.loads(client.get('/api/products/changes?since=-1').data)['version']
+            data_manager.apply_product_batch([{'op': 'update', 'id': rng.randint(1, args.products),
+                                               'stock': rng.randint(0, 60)} for _ in range(churn)])
+            url = f'/api/products/changes?since={version}'
+            full_bytes = len(client.get('/api/products').data)
+            delta_bytes = len(client.get(url).data)
+            full_ms = time_calls(lambda: client.get('/api/products'), args.repeat)
+            delta_ms = time_calls(lambda: client.get(url), args.repeat)
+            print(f"{churn:>7}{full_ms:>10.1f}{full_bytes / 1024:>10.0f}{delta_ms:>10.2f}"
+                  f"{delta_bytes / 1024:>11.1f}{full_ms / delta_ms:>8.0f}x")
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(test_dir)
+
+
+if __name__ == '__main__':
+    main()
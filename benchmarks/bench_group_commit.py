@@ -0,0 +1,78 @@
+"""Benchmark bursty concurrent writes with and without group commit
+
+Usage: python benchmarks/bench_group_commit.py [--products 10000] [--threads 32] [--writes 20]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import DataManager
+
+
+def write_catalogue(count):
+    """Write a synthetic products.json with the given number of rows"""
+    products = [
+        {'id': i, 'name': f'Product {i}', 'price': round(1 + (i % 997) * 0.37, 2), 'stock': i % 50}
+        for i in range(1, count + 1)
+    ]
+    with open('products.json', 'w') as f:
+        json.dump(products, f, indent=2)
+
+
+def run_burst(manager, threads, writes):
+    """Have every thread create products at once and return writes per second"""
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        barrier.wait()
+        for i in range(writes):
+            manager.create_product(f'Burst {i}', 9.99, i)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return threads * writes / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--writes', type=int, default=20, help='creates per thread')
+    args = parser.parse_args()
+
+    modes = [
+        ('rewrite', dict(cache=True)),
+        ('rewrite + group 2ms', dict(cache=True, group_commit_ms=2)),
+        ('rewrite + group 5ms', dict(cache=True, group_commit_ms=5)),
+        ('journal', dict(journal=True)),
+        ('journal + group 2ms', dict(journal=True, group_commit_ms=2)),
+    ]
+
+    original_dir = os.getcwd()
+    print(f"{'mode':<24}{'writes/s':>12}")
+    for label, options in modes:
+        test_dir = tempfile.mkdtemp()
+        os.chdir(test_dir)
+        try:
+            write_catalogue(args.products)
+            rate = run_burst(DataManager(**options), args.threads, args.writes)
+            print(f"{label:<24}{rate:>12.0f}")
+        finally:
+            os.chdir(original_dir)
+            shutil.rmtree(test_dir)
+
+
+if __name__ == '__main__':
+    main()
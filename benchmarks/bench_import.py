@@ -0,0 +1,106 @@
+"""Benchmark the streaming CSV import: peak memory of parsing and validating, and end-to-end time
+
+The memory table feeds the importer a store that discards each chunk, so it
+shows what the import itself holds, against reading the whole file into rows
+first. The timing table imports into the JSON store as the web app runs it
+(one snapshot rewrite per chunk) and as import_data.py runs it (journal, one
+rewrite at the end).
+
+Usage: python benchmarks/bench_import.py [--rows 50000,200000] [--chunk-size 5000]
+"""
+import argparse
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import DataManager
+from importer import import_records
+
+
+class DiscardingStore:
+    """Accepts product batches and keeps nothing"""
+
+    def apply_product_batch(self, operations):
+        return operations
+
+
+def write_supplier_csv(path, count):
+    """Write a supplier catalogue with one bad row in every thousand"""
+    with open(path, 'w') as f:
+        f.write('name,price,stock\n')
+        for i in range(count):
+            f.write(f'Supplier item {i},{1 + i % 997 * 0.37:.2f},{"n/a" if i % 1000 == 999 else i % 50}\n')
+
+
+def peak_kib(func):
+    """Return the tracemalloc peak of func() in KiB"""
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def read_whole_file(path):
+    """Parse every row into memory before doing anything with them"""
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def streamed_import(path, chunk_size):
+    """Stream the file through parsing and validation into a store that keeps nothing"""
+    with open(path, 'rb') as f:
+        return import_records(DiscardingStore(), 'products', f, 'csv', chunk_size)
+
+
+def timed_import(path, chunk_size, journal):
+    """Import into fresh JSON files; returns (seconds, summary)"""
+    for leftover in ('products.json', 'products.json.log'):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    store = DataManager(journal=True, compact_threshold=sys.maxsize) if journal else DataManager(cache=True)
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        summary = import_records(store, 'products', f, 'csv', chunk_size)
+    if journal:
+        store.compact()
+    return time.perf_counter() - start, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='50000,200000')
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    test_dir = tempfile.mkdtemp()
+    original_dir = os.getcwd()
+    os.chdir(test_dir)
+    try:
+        counts = [int(n) for n in args.rows.split(',')]
+        print(f"{'rows':>8}{'whole file KiB':>16}{'streamed KiB':>14}")
+        for count in counts:
+            write_supplier_csv('supplier.csv', count)
+            whole = peak_kib(lambda: read_whole_file('supplier.csv'))
+            streamed = peak_kib(lambda: streamed_import('supplier.csv', args.chunk_size))
+            print(f"{count:>8}{whole:>16.0f}{streamed:>14.0f}")
+
+        print(f"\n{'rows':>8}{'imported':>10}{'rejected':>10}{'per-chunk rewrite s':>21}{'journal s':>11}")
+        for count in counts:
+            write_supplier_csv('supplier.csv', count)
+            rewrite_s, _ = timed_import('supplier.csv', args.chunk_size, journal=False)
+            journal_s, summary = timed_import('supplier.csv', args.chunk_size, journal=True)
+            print(f"{count:>8}{summary['imported']:>10}{summary['rejected']:>10}{rewrite_s:>21.1f}{journal_s:>11.1f}")
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(test_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark full-scan search and summary aggregates split across 1..N worker processes
+
+Loads --customers customers and as many products into Collections of compact
+records, then times the scans the ScanExecutor runs: a customer search that
+checks every record ('jo', shorter than a trigram) and the product summary
+aggregates. The first row is the per-record loop these replace (a
+CustomerSearch.matches call per customer, building ProductStats); one worker
+is the inline column scan used below the threshold. Worker times include
+reading the columns out of the records and packing them for the pool.
+
+Usage: python benchmarks/bench_parallel_scans.py [--customers 1000000] [--workers 1,2,4,8] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_read_cache import time_calls
+from bench_search_index import DOMAINS, FIRST_NAMES, LAST_NAMES
+from data_manager import Collection
+from indexes import CustomerSearch, ProductStats
+from records import Customer, Product
+from scans import PRODUCT_TOTAL_FIELDS, ProductTotals, ScanExecutor, match_columns, summarize_products
+
+
+def build_collections(count, seed=1):
+    """Return (customers, products) Collections of synthetic records"""
+    rng = random.Random(seed)
+    customers = []
+    for i in range(1, count + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        customers.append({'id': i, 'name': f'{first} {last} {i}',
+                          'email': f'{first.lower()}.{last.lower()}{i}@{rng.choice(DOMAINS)}', 'phone': '555'})
+    products = [{'id': i, 'name': f'Product {i}', 'price': round(1 + (i % 997) * 0.37, 2), 'stock': i % 50}
+                for i in range(1, count + 1)]
+    return (Collection(customers, record_type=Customer), Collection(products, record_type=Product))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--customers', type=int, default=1000000)
+    parser.add_argument('--workers', default=','.join(str(n) for n in (1, 2, 4, 8) if n <= (os.cpu_count() or 1)))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    customers, products = build_collections(args.customers)
+    fields = ('id',) + CustomerSearch.fields
+
+    def inline_search():
+        return [c for c in customers.by_id.values() if CustomerSearch.matches(c, 'jo')]
+
+    def inline_summary():
+        return ProductStats(products)
+
+    expected = ProductStats(products)
+    print(f"{args.customers} records, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8}{'search ms':>12}{'speedup':>9}{'summary ms':>12}{'speedup':>9}")
+    search_base = time_calls(inline_search, args.repeat)
+    summary_base = time_calls(inline_summary, args.repeat)
+    print(f"{'record':>8}{search_base:>12.0f}{'':>9}{summary_base:>12.0f}")
+    for workers in (int(n) for n in args.workers.split(',')):
+        executor = ScanExecutor(workers=workers, threshold=1)
+        try:
+            def search():
+                return executor.scan(match_columns, customers, fields, 'jo')
+
+            def summary():
+                return ProductTotals(executor.scan(summarize_products, products, PRODUCT_TOTAL_FIELDS),
+                                     products.by_id)
+
+            # Start the pool and check the merged results before timing
+            assert sum(len(ids) for ids in search()) == len(inline_search())
+            totals = summary()
+            assert (totals.value_sum, totals.cheapest()) == (expected.value_sum, expected.cheapest())
+            search_ms = time_calls(search, args.repeat)
+            summary_ms = time_calls(summary, args.repeat)
+        finally:
+            executor.shutdown()
+        print(f"{workers:>8}{search_ms:>12.0f}{search_base / search_ms:>8.2f}x"
+              f"{summary_ms:>12.0f}{summary_base / summary_ms:>8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
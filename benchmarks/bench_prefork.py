@@ -0,0 +1,90 @@
+"""Benchmark the pre-forked launcher (serve.py) with and without a preloaded catalogue
+
+For each mode it starts serve.py over the same synthetic catalogue, times how
+long until every worker answers, drives a read load across the workers, then
+reports requests/sec and each worker's resident (RSS) and proportional (PSS)
+memory. PSS splits pages shared copy-on-write between the processes using
+them, so it shows what a worker really adds. Linux only (reads /proc).
+
+Usage: python benchmarks/bench_prefork.py [--products 200000] [--workers 4] [--connections 64] [--seconds 10]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_asgi import free_port, load
+from bench_read_cache import write_catalogue
+from serve import memory_kib
+
+MODES = {'preload': [], 'no-preload': ['--no-preload']}
+
+
+def children(pid):
+    """Return the pids of a process's children"""
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def wait_until_serving(port, workers, timeout=120):
+    """Block until enough requests have succeeded for every worker to have loaded the data"""
+    deadline = time.time() + timeout
+    answered = 0
+    while answered < workers * 4:
+        if time.time() > deadline:
+            raise RuntimeError(f'server on port {port} did not start')
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/stats/summary', timeout=60).read()
+            answered += 1
+        except OSError:
+            time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=200000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--connections', type=int, default=64)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    test_dir = tempfile.mkdtemp()
+    original_dir = os.getcwd()
+    os.chdir(test_dir)
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    try:
+        write_catalogue(args.products)
+        print(f"{'mode':<12}{'ready s':>9}{'req/s':>9}{'p99 ms':>9}{'RSS MiB':>9}{'PSS MiB':>9}{'total PSS':>11}")
+        for name, flags in MODES.items():
+            port = free_port()
+            start = time.perf_counter()
+            server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'serve.py'), '--port', str(port),
+                                       '--workers', str(args.workers)] + flags, env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_until_serving(port, args.workers)
+                ready = time.perf_counter() - start
+                rate, _, p99, _ = asyncio.run(load(port, args.connections, args.seconds))
+                workers = children(server.pid)
+                rss = [memory_kib(pid, 'Rss') / 1024 for pid in workers]
+                pss = [memory_kib(pid, 'Pss') / 1024 for pid in workers]
+                print(f"{name:<12}{ready:>9.1f}{rate:>9.0f}{p99:>9.1f}{max(rss):>9.0f}{max(pss):>9.0f}"
+                      f"{sum(pss):>11.0f}")
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(test_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark the DataManager read path with and without the in-memory cache
+
+Usage: python benchmarks/bench_read_cache.py [--products 100000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import DataManager
+
+
+def write_catalogue(count):
+    """Write a synthetic products.json with the given number of rows"""
+    products = [
+        {'id': i, 'name': f'Product {i}', 'price': round(1 + (i % 997) * 0.37, 2), 'stock': i % 50}
+        for i in range(1, count + 1)
+    ]
+    with open('products.json', 'w') as f:
+        json.dump(products, f, indent=2)
+
+
+def time_calls(func, repeat):
+    """Return the mean wall time of func() in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    test_dir = tempfile.mkdtemp()
+    original_dir = os.getcwd()
+    os.chdir(test_dir)
+    try:
+        write_catalogue(args.products)
+        target = args.products // 2
+
+        print(f"{'operation':<22}{'uncached ms':>14}{'cached ms':>14}{'speedup':>10}")
+        for label, call in [
+            ('get_all_products', lambda dm: dm.get_all_products()),
+            ('get_product', lambda dm: dm.get_product(target)),
+        ]:
+            plain = DataManager()
+            cached = DataManager(cache=True)
+            cached.get_all_products()  # warm the cache
+            plain_ms = time_calls(lambda: call(plain), args.repeat)
+            cached_ms = time_calls(lambda: call(cached), args.repeat)
+            print(f"{label:<22}{plain_ms:>14.3f}{cached_ms:>14.3f}{plain_ms / cached_ms:>9.0f}x")
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(test_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark the memory held by a cached collection of dicts against compact records
+
+Each collection is loaded from its JSON file under tracemalloc without indexes,
+so the figures are the records alone: what stays allocated once loaded, and the
+peak while loading. Conversion back to dicts at the API boundary is timed too.
+
+Usage: python benchmarks/bench_record_memory.py [--rows 1000000]
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import Collection
+from records import Customer, Product
+
+
+def write_files(count):
+    """Write synthetic products.json and customers.json with count rows each"""
+    with open('products.json', 'w') as f:
+        json.dump([{'id': i, 'name': f'Product {i}', 'price': round(1 + (i % 997) * 0.37, 2), 'stock': i % 50}
+                   for i in range(1, count + 1)], f)
+    with open('customers.json', 'w') as f:
+        json.dump([{'id': i, 'name': f'Customer {i}', 'email': f'customer{i}@example.com',
+                    'phone': f'555-{i % 10000:04d}'} for i in range(1, count + 1)], f)
+
+
+def measure(filename, record_type):
+    """Return (collection, retained MiB, peak MiB) for loading a file"""
+    gc.collect()
+    tracemalloc.start()
+    with open(filename) as f:
+        collection = Collection(json.load(f), record_type=record_type)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return collection, retained / 2 ** 20, peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    test_dir = tempfile.mkdtemp()
+    original_dir = os.getcwd()
+    os.chdir(test_dir)
+    try:
+        write_files(args.rows)
+        print(f"{'collection':<12}{'dict MiB':>10}{'record MiB':>12}{'saved':>8}"
+              f"{'dict peak':>11}{'record peak':>13}{'records() ms':>14}")
+        for filename, record_type in [('products.json', Product), ('customers.json', Customer)]:
+            _, dict_mib, dict_peak = measure(filename, None)
+            collection, record_mib, record_peak = measure(filename, record_type)
+            start = time.perf_counter()
+            collection.records()
+            convert_ms = (time.perf_counter() - start) * 1000
+            print(f"{filename.split('.')[0]:<12}{dict_mib:>10.0f}{record_mib:>12.0f}"
+                  f"{1 - record_mib / dict_mib:>8.0%}{dict_peak:>11.0f}{record_peak:>13.0f}{convert_ms:>14.0f}")
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(test_dir)
+
+
+if __name__ == '__main__':
+    main()
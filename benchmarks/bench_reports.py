@@ -0,0 +1,90 @@
+"""Benchmark the inventory report built in the browser against /api/reports/inventory
+
+The client-side path is what reports.js used to do: page through
+/api/products/search, then band, total and value every row itself (done here
+in Python in place of the browser).
+
+Usage: python benchmarks/bench_reports.py [--products 100000] [--repeat 5]
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_read_cache import write_catalogue
+
+PAGE_SIZE = 500
+REPORT_ROWS = 1000
+BANDS = {
+    'low': lambda stock: stock <= 5,
+    'medium': lambda stock: 5 < stock <= 20,
+    'high': lambda stock: stock > 20,
+}
+
+
+def client_side_report(client, band, sort_by):
+    """Fetch every page, then filter and total as the browser did; returns (rows, bytes)"""
+    rows, received, cursor = [], 0, None
+    while True:
+        url = f'/api/products/search?sort={sort_by}&limit={PAGE_SIZE}'
+        response = client.get(url + (f'&cursor={cursor}' if cursor else ''))
+        received += len(response.data)
+        page = json.loads(response.data)
+        rows.extend(p for p in page['items'] if BANDS[band](p['stock']))
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    for p in rows:
+        p['value'] = p['price'] * p['stock']
+    math.fsum(p['value'] for p in rows)
+    return rows, received
+
+
+def server_side_report(client, band, sort_by):
+    """One request for the first REPORT_ROWS rows and the band totals; returns (rows, bytes)"""
+    response = client.get(f'/api/reports/inventory?stock={band}&sort={sort_by}&limit={REPORT_ROWS}')
+    report = json.loads(response.data)
+    return report['items'], len(response.data)
+
+
+def time_report(build, repeat):
+    """Return (mean ms, rows, bytes) for building a report"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rows, received = build()
+    return (time.perf_counter() - start) / repeat * 1000, len(rows), received
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    test_dir = tempfile.mkdtemp()
+    original_dir = os.getcwd()
+    os.chdir(test_dir)
+    try:
+        write_catalogue(args.products)
+        from app import app  # the app's data manager opens the files in the current directory
+        client = app.test_client()
+
+        print(f"{'report':<16}{'client ms':>11}{'KiB':>9}{'server ms':>11}{'KiB':>7}{'speedup':>9}")
+        for band, sort_by in [('low', 'price'), ('medium', 'name'), ('high', 'stock')]:
+            client_ms, _, client_bytes = time_report(lambda: client_side_report(client, band, sort_by), args.repeat)
+            server_ms, _, server_bytes = time_report(lambda: server_side_report(client, band, sort_by), args.repeat)
+            print(f"{band + ' / ' + sort_by:<16}{client_ms:>11.1f}{client_bytes / 1024:>9.0f}"
+                  f"{server_ms:>11.1f}{server_bytes / 1024:>7.0f}{client_ms / server_ms:>8.0f}x")
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(test_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark customer search with a full scan against the trigram index
+
+Usage: python benchmarks/bench_search_index.py [--customers 1000000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_read_cache import time_calls
+from data_manager import DataManager
+from indexes import CustomerSearch
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda',
+               'David', 'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+              'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Thomas', 'Taylor']
+DOMAINS = ['example.com', 'mail.test', 'emerald.example', 'shop.example.org']
+
+# From very common to a single match
+QUERIES = ['example', 'johnson', 'jennifer.garcia', '4242@', 'zz-no-match']
+
+
+def write_customers(count, seed=1):
+    """Write a synthetic customers.json with the given number of rows"""
+    rng = random.Random(seed)
+    customers = []
+    for i in range(1, count + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        customers.append({
+            'id': i,
+            'name': f'{first} {last} {i}',
+            'email': f'{first.lower()}.{last.lower()}{i}@{rng.choice(DOMAINS)}',
+            'phone': f'555-{i % 10000:04d}',
+        })
+    with open('customers.json', 'w') as f:
+        json.dump(customers, f)
+
+
+def scan(customers, query):
+    """The per-request substring scan the index replaces"""
+    query = query.lower()
+    return [c for c in customers if query in c['name'].lower() or query in c['email'].lower()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--customers', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    test_dir = tempfile.mkdtemp()
+    original_dir = os.getcwd()
+    os.chdir(test_dir)
+    try:
+        write_customers(args.customers)
+        dm = DataManager(cache=True)
+        customers = dm.get_all_customers()
+        index = dm._cache[dm.customers_file].indexes[CustomerSearch]
+        # The first search builds the postings
+        start = time.perf_counter()
+        index.search('example')
+        build_s = time.perf_counter() - start
+        print(f"indexed {len(customers)} customers in {build_s:.1f} s "
+              f"({sum(len(p) for p in index.postings.values())} postings)")
+
+        print(f"{'query':<22}{'matches':>10}{'scan ms':>12}{'index ms':>12}{'speedup':>10}")
+        for query in QUERIES:
+            matches = len(index.search(query))
+            assert matches == len(scan(customers, query))
+            scan_ms = time_calls(lambda: scan(customers, query), args.repeat)
+            index_ms = time_calls(lambda: index.search(query), args.repeat)
+            print(f"{query:<22}{matches:>10}{scan_ms:>12.3f}{index_ms:>12.3f}{scan_ms / index_ms:>9.0f}x")
+
+        # End to end, including the sort by name and the first page
+        page_ms = time_calls(lambda: dm.page_customers('jennifer.garcia', 'name', 50), args.repeat)
+        print(f"page_customers('jennifer.garcia', 'name', 50): {page_ms:.3f} ms")
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(test_dir)
+
+
+if __name__ == '__main__':
+    main()
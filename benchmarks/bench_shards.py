@@ -0,0 +1,83 @@
+"""Benchmark single-record and full-scan work on one products.json against id-range shards
+
+Compares an uncached store writing one file with one split into --shard-size
+shards: time and bytes rewritten per update, point reads, the summary stats
+and a search scan, and how long a cached store takes to catch up after
+another process updates one record.
+
+Usage: python benchmarks/bench_shards.py [--products 200000] [--shard-size 10000] [--repeat 10]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_read_cache import time_calls, write_catalogue
+from data_manager import DataManager
+
+
+def measure(shard_size, products, repeat):
+    """Return {operation: (ms, KiB written or None)} for one storage layout"""
+    plain = DataManager(shard_size=shard_size)
+    cached = DataManager(cache=True, shard_size=shard_size)
+    cached.get_all_products()
+    rng = random.Random(5)
+
+    written = []
+    original_write = plain._write_json_file
+    def counting_write(filename, data):
+        original_write(filename, data)
+        written.append(os.path.getsize(filename))
+    plain._write_json_file = counting_write
+
+    results = {}
+    results['update_product'] = (
+        time_calls(lambda: plain.update_product(rng.randint(1, products), {'stock': rng.randint(0, 60)}), repeat),
+        sum(written) / repeat / 1024)
+    results['get_product'] = (time_calls(lambda: plain.get_product(rng.randint(1, products)), repeat), None)
+    results['get_summary_stats'] = (time_calls(plain.get_summary_stats, max(1, repeat // 5)), None)
+    results['search_products'] = (
+        time_calls(lambda: plain.search_products('product 12', 'price'), max(1, repeat // 5)), None)
+
+    def catch_up():
+        plain.update_product(rng.randint(1, products), {'stock': rng.randint(0, 60)})
+        cached.get_product(1)
+    update_ms = results['update_product'][0]
+    results['cached catch-up'] = (time_calls(catch_up, repeat) - update_ms, None)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=200000)
+    parser.add_argument('--shard-size', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    test_dir = tempfile.mkdtemp()
+    original_dir = os.getcwd()
+    try:
+        results = {}
+        for label, shard_size in (('single', 0), ('sharded', args.shard_size)):
+            os.makedirs(os.path.join(test_dir, label))
+            os.chdir(os.path.join(test_dir, label))
+            write_catalogue(args.products)
+            results[label] = measure(shard_size, args.products, args.repeat)
+
+        print(f"{args.products} products, {args.shard_size} ids per shard, {os.cpu_count()} CPUs")
+        print(f"{'operation':<20}{'single ms':>11}{'sharded ms':>12}{'speedup':>9}{'single KiB':>12}{'sharded KiB':>13}")
+        for operation, (single_ms, single_kib) in results['single'].items():
+            sharded_ms, sharded_kib = results['sharded'][operation]
+            written = f"{single_kib:>12.0f}{sharded_kib:>13.0f}" if single_kib is not None else ''
+            print(f"{operation:<20}{single_ms:>11.2f}{sharded_ms:>12.2f}{single_ms / sharded_ms:>8.1f}x{written}")
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(test_dir)
+
+
+if __name__ == '__main__':
+    main()
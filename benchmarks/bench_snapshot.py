@@ -0,0 +1,68 @@
+"""Benchmark startup and read latency of products.json against the binary snapshot
+
+Writes --products products as JSON, converts a copy to products.snap, then
+reports for each format: file size, time for a cached DataManager to start
+and answer its first get_product (what every process start and every cache
+reload after another process's write pays), get_product latency on an
+uncached store, and a full get_all_products.
+
+Usage: python benchmarks/bench_snapshot.py [--products 1000000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_read_cache import time_calls, write_catalogue
+from data_manager import DataManager
+from snapshots import json_to_snapshot
+
+
+def first_read_ms(snapshot, product_id):
+    """Return the time for a new cached manager to answer one get_product"""
+    start = time.perf_counter()
+    DataManager(cache=True, snapshot=snapshot).get_product(product_id)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    test_dir = tempfile.mkdtemp()
+    original_dir = os.getcwd()
+    try:
+        os.makedirs(os.path.join(test_dir, 'json'))
+        os.makedirs(os.path.join(test_dir, 'snapshot'))
+        os.chdir(os.path.join(test_dir, 'json'))
+        write_catalogue(args.products)
+        start = time.perf_counter()
+        json_to_snapshot('products.json', os.path.join(test_dir, 'snapshot', 'products.snap'))
+        print(f"{args.products} products, converted to a snapshot in {time.perf_counter() - start:.1f} s")
+
+        rng = random.Random(9)
+        print(f"{'format':<10}{'MiB':>8}{'start + first read ms':>24}{'get_product ms':>16}{'get_all ms':>12}")
+        for label, snapshot, filename in (('json', False, 'products.json'), ('snapshot', True, 'products.snap')):
+            os.chdir(os.path.join(test_dir, label))
+            size = os.path.getsize(filename) / (1 << 20)
+            startup_ms = first_read_ms(snapshot, args.products // 2)
+            plain = DataManager(snapshot=snapshot)
+            # The uncached JSON store parses the whole file per call, so fewer runs
+            repeat = args.repeat if snapshot else max(1, args.repeat // 10)
+            get_ms = time_calls(lambda: plain.get_product(rng.randint(1, args.products)), repeat)
+            all_ms = time_calls(plain.get_all_products, 1)
+            print(f"{label:<10}{size:>8.0f}{startup_ms:>24.1f}{get_ms:>16.3f}{all_ms:>12.0f}")
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(test_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark sorted listings, top-k and range queries against sorting per request
+
+Usage: python benchmarks/bench_sorted_index.py [--products 100000] [--repeat 20]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_read_cache import time_calls, write_catalogue
+from data_manager import DataManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    test_dir = tempfile.mkdtemp()
+    original_dir = os.getcwd()
+    os.chdir(test_dir)
+    try:
+        write_catalogue(args.products)
+        dm = DataManager(cache=True, journal=True)
+        products = dm.get_all_products()
+        by_price = lambda p: (p['price'], p['id'])
+
+        cases = [
+            ('first page by price',
+             lambda: sorted(products, key=by_price)[:50],
+             lambda: dm.page_products('', 'price', 50)),
+            ('5 most expensive',
+             lambda: sorted(products, key=by_price, reverse=True)[:5],
+             lambda: dm.range_products('price', limit=5, descending=True)),
+            ('stock <= 5',
+             lambda: sorted((p for p in products if p['stock'] <= 5), key=lambda p: (p['stock'], p['id'])),
+             lambda: dm.range_products('stock', high=5)),
+            ('price 10.00-10.50',
+             lambda: sorted((p for p in products if 10 <= p['price'] <= 10.5), key=by_price),
+             lambda: dm.range_products('price', 10, 10.5)),
+        ]
+        print(f"{'query':<22}{'rows':>8}{'sort ms':>12}{'index ms':>12}{'speedup':>10}")
+        for label, sort_per_request, indexed in cases:
+            rows = indexed()
+            rows = rows['items'] if isinstance(rows, dict) else rows
+            assert [p['id'] for p in rows] == [p['id'] for p in sort_per_request()]
+            sort_ms = time_calls(sort_per_request, args.repeat)
+            index_ms = time_calls(indexed, args.repeat)
+            print(f"{label:<22}{len(rows):>8}{sort_ms:>12.3f}{index_ms:>12.3f}{sort_ms / index_ms:>9.0f}x")
+
+        # Writes now also keep each built order up to date
+        write_ms = time_calls(lambda: dm.update_product(args.products // 2, {'price': 1.25, 'stock': 3}),
+                              args.repeat)
+        print(f"update_product with the price and stock orders built: {write_ms:.3f} ms")
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(test_dir)
+
+
+if __name__ == '__main__':
+    main()
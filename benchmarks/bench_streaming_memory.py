@@ -0,0 +1,70 @@
+"""Benchmark peak memory of buffered vs streamed full-catalogue exports
+
+Usage: python benchmarks/bench_streaming_memory.py [--sizes 10000 50000 200000]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import DataManager
+
+
+def write_catalogue(count):
+    """Write a synthetic products.json with the given number of rows"""
+    with open('products.json', 'w') as f:
+        json.dump([
+            {'id': i, 'name': f'Product {i}', 'price': round(1 + (i % 997) * 0.37, 2), 'stock': i % 50}
+            for i in range(1, count + 1)
+        ], f, indent=2)
+
+
+def peak_mib(func):
+    """Run func under tracemalloc and return its peak allocation in MiB"""
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 200000])
+    args = parser.parse_args()
+    
+    test_dir = tempfile.mkdtemp()
+    original_dir = os.getcwd()
+    os.chdir(test_dir)
+    try:
+        from app import stream_records
+        manager = DataManager()
+        
+        def buffered():
+            json.dumps(manager.get_all_products())
+        
+        def streamed():
+            for _ in stream_records(manager.iter_products(), 'json'):
+                pass
+        
+        def streamed_ndjson():
+            for _ in stream_records(manager.iter_products(), 'ndjson'):
+                pass
+        
+        print(f"{'products':>10}{'buffered MiB':>16}{'stream MiB':>14}{'ndjson MiB':>14}")
+        for size in args.sizes:
+            write_catalogue(size)
+            print(f"{size:>10}{peak_mib(buffered):>16.1f}{peak_mib(streamed):>14.2f}"
+                  f"{peak_mib(streamed_ndjson):>14.2f}")
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(test_dir)
+
+
+if __name__ == '__main__':
+    main()
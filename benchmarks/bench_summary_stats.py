@@ -0,0 +1,60 @@
+"""Benchmark summary statistics recomputed per request against maintained aggregates
+
+Usage: python benchmarks/bench_summary_stats.py [--products 10000 100000] [--repeat 20]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_read_cache import time_calls, write_catalogue
+from data_manager import DataManager
+
+
+def recompute_summary(dm):
+    """The per-request passes /api/stats/summary used to make"""
+    products = dm.get_all_products()
+    customers = dm.get_all_customers()
+    return {
+        'total_products': len(products),
+        'total_customers': len(customers),
+        'low_stock_items': len([p for p in products if p['stock'] <= 5]),
+        'total_inventory_value': round(sum(p['price'] * p['stock'] for p in products), 2),
+        'most_expensive_product': max(products, key=lambda x: x['price']) if products else None,
+        'cheapest_product': min(products, key=lambda x: x['price']) if products else None,
+        'average_price': round(sum(p['price'] for p in products) / len(products), 2) if products else 0,
+        'recent_products': products[-5:],
+        'recent_customers': customers[-5:],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'products':>10}{'recompute ms':>15}{'maintained ms':>15}{'write ms':>10}")
+    for count in args.products:
+        test_dir = tempfile.mkdtemp()
+        original_dir = os.getcwd()
+        os.chdir(test_dir)
+        try:
+            write_catalogue(count)
+            dm = DataManager(cache=True, journal=True)
+            assert recompute_summary(dm) == dm.get_summary_stats()
+            recompute_ms = time_calls(lambda: recompute_summary(dm), args.repeat)
+            maintained_ms = time_calls(dm.get_summary_stats, args.repeat)
+            # Each write also updates the aggregates; the journal keeps it cheap
+            write_ms = time_calls(lambda: dm.update_product(count // 2, {'price': 1.25}), args.repeat)
+            print(f"{count:>10}{recompute_ms:>15.3f}{maintained_ms:>15.3f}{write_ms:>10.3f}")
+        finally:
+            os.chdir(original_dir)
+            shutil.rmtree(test_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark write throughput of the rewrite path against the journaled store
+
+Usage: python benchmarks/bench_write_journal.py [--products 10000] [--writes 500]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import DataManager
+
+
+def write_catalogue(count):
+    """Write a synthetic products.json with the given number of rows"""
+    products = [
+        {'id': i, 'name': f'Product {i}', 'price': round(1 + (i % 997) * 0.37, 2), 'stock': i % 50}
+        for i in range(1, count + 1)
+    ]
+    with open('products.json', 'w') as f:
+        json.dump(products, f, indent=2)
+
+
+def run_writes(manager, writes, catalogue_size):
+    """Apply a create/update mix and return writes per second"""
+    start = time.perf_counter()
+    for i in range(writes):
+        if i % 2:
+            manager.update_product(1 + i % catalogue_size, {'stock': i})
+        else:
+            manager.create_product(f'New {i}', 9.99, i)
+    return writes / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--writes', type=int, default=500)
+    args = parser.parse_args()
+
+    modes = [
+        ('rewrite', lambda: DataManager()),
+        ('rewrite (cached)', lambda: DataManager(cache=True)),
+        ('journal', lambda: DataManager(journal=True, compact_threshold=args.writes + 1)),
+        ('journal + compaction', lambda: DataManager(journal=True, compact_threshold=100)),
+    ]
+
+    original_dir = os.getcwd()
+    print(f"{'mode':<24}{'writes/s':>12}")
+    for label, factory in modes:
+        test_dir = tempfile.mkdtemp()
+        os.chdir(test_dir)
+        try:
+            write_catalogue(args.products)
+            rate = run_writes(factory(), args.writes, args.products)
+            print(f"{label:<24}{rate:>12.0f}")
+        finally:
+            os.chdir(original_dir)
+            shutil.rmtree(test_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+# How many recent changes each collection keeps for clients catching up
+CHANGE_LOG_SIZE = 10000
+
+# One logged change: (version, op, record id); op is 'insert', 'update' or 'delete'
+ChangeEntry = Tuple[int, str, int]
+
+
+class ChangeLog:
+    """The most recent changes to one collection, in version order
+    
+    Versions are the collection's write generation, so a batch commit logs
+    several changes under one version. The log is complete for every version
+    after ``floor``: a client behind that has missed changes that were
+    trimmed, or never logged, and must reload in full. Trimming drops whole
+    versions, oldest first.
+    
+    With a ``path`` the log is shared through that file, one JSON line
+    ``[version, [[op, id], ...]]`` per write, so every process using the
+    collection, and one started later, sees the same history. Writers append
+    to it while holding the collection's write lock; ``refresh`` reads what
+    other processes appended. The file is rewritten with just the kept
+    history once it holds twice ``capacity`` lines.
+    """
+    
+    def __init__(self, capacity: int = CHANGE_LOG_SIZE, path: Optional[str] = None):
+        self.capacity = capacity
+        self.path = path
+        self.entries: List[ChangeEntry] = []
+        # The version of each entry, kept alongside for bisecting
+        self.versions: List[int] = []
+        self.floor: Optional[int] = None
+        self.latest: Optional[int] = None
+        # How far the file has been read, which file that was, and its line count
+        self._offset = 0
+        self._inode: Optional[int] = None
+        self._lines = 0
+        self._lock = threading.Lock()
+    
+    def record(self, version: int, changes: List[Tuple[str, int]]):
+        """Log the changes that took the collection to ``version``
+        
+        A jump of more than one version means writes this log never saw, so
+        its history restarts here. With a file, the caller holds the write lock.
+        """
+        with self._lock:
+            if self.path is not None:
+                self._read_file()
+                self._append_file(version, changes)
+            self._record(version, changes)
+            if self.path is not None and self._lines > 2 * self.capacity:
+                self._rewrite_file()
+    
+    def _record(self, version: int, changes: List[Tuple[str, int]]):
+        if self.latest is None or version != self.latest + 1:
+            self.entries, self.versions = [], []
+            self.floor = version - 1
+        self.entries.extend((version, op, record_id) for op, record_id in changes)
+        self.versions.extend(version for _ in changes)
+        self.latest = version
+        if len(self.entries) > self.capacity:
+            self.floor = self.versions[len(self.versions) - self.capacity - 1]
+            cut = bisect_right(self.versions, self.floor)
+            del self.entries[:cut], self.versions[:cut]
+    
+    def reset(self, version: int):
+        """Forget the history: the collection is at ``version`` by unknown changes"""
+        with self._lock:
+            self.entries, self.versions = [], []
+            self.floor = self.latest = version
+    
+    def refresh(self):
+        """Take in the writes other processes logged to the file; the caller holds the read lock"""
+        if self.path is not None:
+            with self._lock:
+                self._read_file()
+    
+    def _read_file(self):
+        try:
+            with open(self.path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_ino != self._inode or stat.st_size < self._offset:
+                    # Rewritten by another process: read it from the start
+                    self._inode, self._offset, self._lines = stat.st_ino, 0, 0
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        # A line without its newline is still being written, or was cut off by a crash
+        end = data.rfind(b'\n') + 1
+        self._offset += end
+        for line in data[:end].splitlines():
+            self._lines += 1
+            try:
+                version, changes = json.loads(line)
+            except ValueError:
+                # A torn line: the version gap it leaves restarts the history
+                continue
+            if self.latest is None or version > self.latest:
+                self._record(version, [(op, record_id) for op, record_id in changes])
+    
+    def _append_file(self, version: int, changes: List[Tuple[str, int]]):
+        line = json.dumps([version, [[op, record_id] for op, record_id in changes]]) + '\n'
+        with open(self.path, 'a') as f:
+            self._inode = os.fstat(f.fileno()).st_ino
+            if f.tell() != self._offset:
+                # Keep a torn line left by a crash apart from this one
+                line = '\n' + line
+            f.write(line)
+            self._offset = f.tell()
+        self._lines += 1
+    
+    def _rewrite_file(self):
+        """Replace the file with just the history kept in memory"""
+        by_version: Dict[int, List] = {}
+        for version, op, record_id in self.entries:
+            by_version.setdefault(version, []).append([op, record_id])
+        # Versions without changes have no entries but still have to be there
+        lines = [json.dumps([version, by_version.get(version, [])]) + '\n'
+                 for version in range(self.floor + 1, self.latest + 1)]
+        temp = self.path + '.tmp'
+        with open(temp, 'w') as f:
+            f.writelines(lines)
+            self._inode, self._offset = os.fstat(f.fileno()).st_ino, f.tell()
+        os.replace(temp, self.path)
+        self._lines = len(lines)
+    
+    def since(self, version: int) -> Optional[List[ChangeEntry]]:
+        """Return the changes after ``version``, or None if some are no longer known"""
+        with self._lock:
+            if self.floor is None or not self.floor <= version <= self.latest:
+                return None
+            return self.entries[bisect_right(self.versions, version):]
+
+
+def net_changes(changes: List[Dict]) -> Dict[str, list]:
+    """Fold a run of change events into what a client has to apply
+    
+    Returns the ``inserted`` and ``updated`` records and the ``deleted`` ids,
+    each id at most once, relative to the state at the start of the run: a
+    record created and deleted within it does not appear at all, and one
+    deleted and created again counts as updated.
+    """
+    first: Dict[int, Dict] = {}
+    last: Dict[int, Dict] = {}
+    for change in changes:
+        first.setdefault(change['id'], change)
+        last[change['id']] = change
+    inserted, updated, deleted = [], [], []
+    for record_id, change in last.items():
+        existed = first[record_id]['op'] != 'insert'
+        if change['op'] == 'delete':
+            if existed:
+                deleted.append(record_id)
+        elif 'record' in change:
+            (updated if existed else inserted).append(change['record'])
+    return {'inserted': inserted, 'updated': updated, 'deleted': deleted}
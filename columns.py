@@ -0,0 +1,109 @@
+import math
+from typing import Dict, Iterable, Optional, Tuple
+
+from indexes import CollectionIndex
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional; band totals then come from a Python pass
+    numpy = None
+
+# Inclusive (low, high) stock bounds; None leaves a side open
+Band = Tuple[Optional[int], Optional[int]]
+
+# (count, price sum, stock value sum) of the products in a band
+BandTotals = Tuple[int, float, float]
+
+COLUMNS_AVAILABLE = numpy is not None
+
+
+def in_band(stock: int, band: Band) -> bool:
+    """Check whether a stock level falls within inclusive band bounds"""
+    low, high = band
+    return (low is None or stock >= low) and (high is None or stock <= high)
+
+
+def band_totals_python(products: Iterable[Dict], bands: Dict[str, Band]) -> Dict[str, BandTotals]:
+    """Total each band with one pass over the products, without NumPy"""
+    prices: Dict[str, list] = {name: [] for name in bands}
+    values: Dict[str, list] = {name: [] for name in bands}
+    for product in products:
+        price, stock = product['price'], product['stock']
+        for name, band in bands.items():
+            if in_band(stock, band):
+                prices[name].append(price)
+                values[name].append(price * stock)
+    return {name: (len(prices[name]), math.fsum(prices[name]), math.fsum(values[name])) for name in bands}
+
+
+class ProductColumns(CollectionIndex):
+    """Product prices and stock levels held as NumPy columns
+    
+    Band counts and sums are then a few vectorized operations instead of a
+    Python loop over every product. Rows live in arrays that double when
+    full; ``slots`` maps each id to its row, and a removed row is filled with
+    the last one, so the live rows are always the first ``size``. Like the
+    trigram postings, the columns are first built by the first query.
+    """
+    
+    def __init__(self, collection):
+        self.collection = collection
+        self.slots: Optional[Dict[int, int]] = None
+        self.size = 0
+    
+    def _build(self):
+        """Load every product into fresh columns; safe to run under a shared lock"""
+        products = list(self.collection.by_id.values())
+        capacity = max(len(products) * 2, 1024)
+        ids = numpy.zeros(capacity, dtype=numpy.int64)
+        prices = numpy.zeros(capacity, dtype=numpy.float64)
+        stocks = numpy.zeros(capacity, dtype=numpy.int64)
+        ids[:len(products)] = [p['id'] for p in products]
+        prices[:len(products)] = [p['price'] for p in products]
+        stocks[:len(products)] = [p['stock'] for p in products]
+        # Publish the columns before the slots, which mark them as built
+        self.ids, self.prices, self.stocks = ids, prices, stocks
+        self.size = len(products)
+        self.slots = {p['id']: row for row, p in enumerate(products)}
+    
+    def add(self, product: Dict):
+        if self.slots is None:
+            return
+        if self.size == len(self.ids):
+            self.ids, self.prices, self.stocks = (
+                numpy.concatenate([column, numpy.zeros_like(column)])
+                for column in (self.ids, self.prices, self.stocks))
+        row = self.size
+        self.ids[row], self.prices[row], self.stocks[row] = product['id'], product['price'], product['stock']
+        self.slots[product['id']] = row
+        self.size += 1
+    
+    def discard(self, product: Dict):
+        if self.slots is None:
+            return
+        row = self.slots.pop(product['id'])
+        last = self.size - 1
+        if row != last:
+            self.ids[row], self.prices[row], self.stocks[row] = self.ids[last], self.prices[last], self.stocks[last]
+            self.slots[int(self.ids[row])] = row
+        self.size = last
+    
+    def warm(self):
+        if self.slots is None:
+            self._build()
+    
+    def band_totals(self, bands: Dict[str, Band]) -> Dict[str, BandTotals]:
+        """Return the count, price sum and stock value sum of each stock band"""
+        if self.slots is None:
+            self._build()
+        prices, stocks = self.prices[:self.size], self.stocks[:self.size]
+        values = prices * stocks
+        totals = {}
+        for name, (low, high) in bands.items():
+            mask = numpy.ones(self.size, dtype=bool)
+            if low is not None:
+                mask &= stocks >= low
+            if high is not None:
+                mask &= stocks <= high
+            totals[name] = (int(numpy.count_nonzero(mask)), float(prices[mask].sum()), float(values[mask].sum()))
+        return totals
@@ -1,11 +1,46 @@
 class DashboardApp {
     constructor() {
         this.apiBase = '';
+        this.etagCache = new Map();
+        this.etagCacheSize = 100;
+        this.refreshTimer = null;
+        this.eventRetryDelay = 1000;
         this.init();
     }
 
     init() {
         this.loadDashboardData();
+        this.listenForChanges();
+    }
+
+    // Reload the summary when the data changes instead of polling for it
+    listenForChanges() {
+        if (!window.EventSource) {
+            return;
+        }
+        const events = new EventSource(`${this.apiBase}/api/events`);
+        events.addEventListener('open', () => { this.eventRetryDelay = 1000; });
+        events.addEventListener('change', () => this.scheduleRefresh());
+        events.addEventListener('resync', () => this.scheduleRefresh());
+        // The browser retries a dropped connection itself, but gives up after an
+        // error response such as a 503, so reconnect with backoff and refresh meanwhile
+        events.addEventListener('error', () => {
+            if (events.readyState !== EventSource.CLOSED) {
+                return;
+            }
+            const delay = this.eventRetryDelay;
+            this.eventRetryDelay = Math.min(delay * 2, 60000);
+            setTimeout(() => {
+                this.scheduleRefresh();
+                this.listenForChanges();
+            }, delay);
+        });
+    }
+
+    // Coalesce a burst of changes, such as an import, into one reload
+    scheduleRefresh() {
+        clearTimeout(this.refreshTimer);
+        this.refreshTimer = setTimeout(() => this.loadDashboardData(), 250);
     }
 
     async loadDashboardData() {
@@ -53,25 +88,47 @@ class DashboardApp {
 
     async apiRequest(endpoint, options = {}) {
         try {
+            // Revalidate GETs we have seen before; a 304 reuses the parsed copy
+            const method = (options.method || 'GET').toUpperCase();
+            const cached = method === 'GET' ? this.etagCache.get(endpoint) : undefined;
             const response = await fetch(`${this.apiBase}${endpoint}`, {
+                ...options,
                 headers: {
                     'Content-Type': 'application/json',
+                    ...(cached ? { 'If-None-Match': cached.etag } : {}),
                     ...options.headers
-                },
-                ...options
+                }
             });
 
+            if (response.status === 304 && cached) {
+                return cached.data;
+            }
+
             if (!response.ok) {
                 const error = await response.json();
                 throw new Error(error.error || 'Request failed');
             }
 
-            return await response.json();
+            const data = await response.json();
+            const etag = response.headers.get('ETag');
+            if (method === 'GET' && etag) {
+                this.rememberResponse(endpoint, etag, data);
+            }
+            return data;
         } catch (error) {
             console.error('API request failed:', error);
             throw error;
         }
     }
+
+    // Keep the most recent ETagged responses, dropping the oldest first
+    rememberResponse(endpoint, etag, data) {
+        this.etagCache.delete(endpoint);
+        this.etagCache.set(endpoint, { etag, data });
+        if (this.etagCache.size > this.etagCacheSize) {
+            this.etagCache.delete(this.etagCache.keys().next().value);
+        }
+    }
 }
 
 // Initialize the dashboard app
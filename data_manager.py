@@ -1,156 +1,1319 @@
+import errno
+import itertools
 import json
 import os
 import logging
-from typing import List, Dict, Optional
+import shutil
+import tempfile
+import threading
+import time
+from bisect import bisect_right
+from contextlib import contextmanager
+from typing import IO, Any, Callable, Iterable, Iterator, List, Dict, MutableMapping, Optional, Set, Tuple, Type, Union
 
-class DataManager:
-    """Handles CRUD operations for products and customers using JSON files"""
+from changes import ChangeLog
+from columns import COLUMNS_AVAILABLE, Band, BandTotals, ProductColumns, band_totals_python
+from indexes import (CUSTOMER_SORT_KEYS, PRODUCT_SORT_KEYS, CollectionIndex, CustomerOrder, CustomerSearch,
+                     Entry, ProductOrder, ProductSearch, ProductStats, SortedIndex, TrigramIndex, recent_records)
+from locks import ReadWriteLock
+from records import Customer, Product, Record
+from scans import PRODUCT_TOTAL_FIELDS, ProductTotals, ScanExecutor, match_columns, summarize_products
+from shards import ShardLayout, match_shard, merge_summaries, read_shard, summarize_shard
+from snapshots import SNAPSHOT_SUFFIX, Snapshot, SnapshotRecords, write_snapshot
+
+# A persisted mutation: ('insert', record), ('update', record) or ('delete', record_id)
+Change = Tuple[str, Any]
+
+# Applies one mutation to a collection, returning (result, changes)
+Mutation = Callable[['Collection'], Tuple[Any, List[Change]]]
+
+
+# How often waiters for changes check for writes made by other processes
+CHANGE_POLL_SECONDS = 1.0
+
+# Loads the shard that the next created record goes to
+NEXT_ID = -1
+
+
+class BatchRejected(Exception):
+    """A batch named records that do not exist, so none of it was applied"""
+    
+    def __init__(self, missing: List[int]):
+        super().__init__(f"Operations {missing} refer to missing records")
+        self.missing = missing
+
+
+def _as_is(record: Dict) -> Dict:
+    return record
+
+
+def change_ids(changes: Iterable[Change]) -> List[int]:
+    """Return the id of the record each change touched"""
+    return [value if op == 'delete' else value['id'] for op, value in changes]
+
+
+class Collection:
+    """In-memory copy of one JSON file, indexed by record id
+    
+    Records are held in an insertion-ordered ``id -> record`` dict so that
+    lookups, updates and deletes are O(1) while list order still matches the
+    file. ``next_id`` is a stored counter, so creating a record never scans.
+    Derived structures (``CollectionIndex`` subclasses) are built on load and
+    updated on every mutation; look them up by class in ``indexes``.
+    
+    With a ``record_type`` the records in ``by_id`` are compact ``Record``
+    objects rather than dicts. Records go in and come out of the public
+    methods as dicts either way; ``as_dict`` converts one read from ``by_id``.
+    
+    Given ``SnapshotRecords`` instead of records, ``by_id`` is that mapping,
+    which decodes records from a binary snapshot as they are read.
+    """
+    
+    def __init__(self, records: Union[Iterable[Dict], SnapshotRecords], signature: Optional[Tuple] = None,
+                 index_types: Tuple[type, ...] = (), record_type: Optional[Type[Record]] = None):
+        self.signature = signature
+        self.record_type = record_type
+        self.as_dict: Callable[[Any], Dict] = record_type.to_dict if record_type else _as_is
+        if isinstance(records, SnapshotRecords):
+            self.by_id: MutableMapping[int, Any] = records
+            self.next_id = records.snapshot.next_id
+        else:
+            if record_type:
+                records = map(record_type.from_dict, records)
+            self.by_id = {record['id']: record for record in records}
+            self.next_id = max(self.by_id, default=0) + 1
+        # Journal replay position and number of entries not yet compacted
+        self.log_offset = 0
+        self.journal_entries = 0
+        # When sharded: the signature of each shard file loaded, and the
+        # shards holding journaled changes not yet written back to them
+        self.shards: Dict[int, Optional[Tuple]] = {}
+        self.dirty_shards: Set[int] = set()
+        self.indexes: Dict[type, CollectionIndex] = {
+            index_type: index_type(self) for index_type in index_types
+        }
+    
+    def __len__(self) -> int:
+        return len(self.by_id)
+    
+    def records(self) -> List[Dict]:
+        """Return the records in file order"""
+        return list(self.dicts())
+    
+    def dicts(self) -> Iterator[Dict]:
+        """Iterate over the records in file order, converting each as it is reached"""
+        return map(self.as_dict, self.by_id.values())
+    
+    def get(self, record_id: int) -> Optional[Dict]:
+        """Return the record with the given id, or None"""
+        record = self.by_id.get(record_id)
+        return None if record is None else self.as_dict(record)
+    
+    def _stored(self, record: Dict) -> Any:
+        """Return the form a record is kept in"""
+        return self.record_type.from_dict(record) if self.record_type else record
+    
+    def insert(self, record: Dict) -> Dict:
+        """Assign the next id to a new record and add it"""
+        record['id'] = self.next_id
+        stored = self._stored(record)
+        self.by_id[record['id']] = stored
+        self.next_id += 1
+        for index in self.indexes.values():
+            index.add(stored)
+        return record
+    
+    def put(self, record: Dict):
+        """Add or replace a record that already carries its id"""
+        stored = self._stored(record)
+        old = self.by_id.get(record['id'])
+        self.by_id[record['id']] = stored
+        self.next_id = max(self.next_id, record['id'] + 1)
+        for index in self.indexes.values():
+            if old is not None:
+                index.discard(old)
+            index.add(stored)
+    
+    def remove(self, record_id: int) -> Optional[Dict]:
+        """Remove and return the record with the given id, or None"""
+        old = self.by_id.pop(record_id, None)
+        if old is None:
+            return None
+        for index in self.indexes.values():
+            index.discard(old)
+        return self.as_dict(old)
+
+
+class PendingMutation:
+    """A mutation queued for group commit, and its outcome once persisted"""
+    
+    def __init__(self, apply: Mutation):
+        self.apply = apply
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.done = False
+
+
+class CommitGroup:
+    """Queue of mutations for one file, drained by a single leader thread"""
     
     def __init__(self):
+        self.cond = threading.Condition()
+        self.queue: List[PendingMutation] = []
+        self.leader = False
+
+
+class DataManager:
+    """Handles CRUD operations for products and customers using JSON files
+    
+    With ``cache=True`` the parsed collections are kept in memory and only
+    re-read when the file's inode, mtime or size changes (e.g. after an
+    external edit). Writes update the cached copy directly.
+    
+    With ``journal=True`` (which implies ``cache``) each mutation is appended
+    as one NDJSON line to ``<file>.log`` and fsynced, instead of rewriting the
+    whole file. Once ``compact_threshold`` entries have accumulated the log is
+    folded back into the JSON snapshot. Loading replays snapshot + log. A
+    manager without the journal also replays a log that another process is
+    appending to, and folds it in with its next write.
+    
+    Every method is safe to call from many threads: reads share a per-file
+    ``ReadWriteLock`` and writes hold it exclusively. The lock is backed by an
+    advisory lock on ``<file>.lock`` so several worker processes can share
+    the same files without losing writes or handing out duplicate ids.
+    
+    Files are replaced atomically (temp file, fsync, rename), so a crash
+    never leaves a truncated snapshot. With ``group_commit_ms`` set, writers
+    arriving within that window are applied together by one leader thread
+    and persisted with a single write; each call still returns only after
+    its mutation is on disk.
+    
+    With ``shard_size`` each collection is stored as files of that many ids
+    (see ``ShardLayout``); an existing single file is split on start, and a
+    sharded collection is joined back into one file when started without.
+    Writes, and journal compaction, replace only the shards they touched.
+    A cached store re-reads only the shards another process changed.
+    Without the cache, single-record reads and writes load just one shard,
+    and summary statistics and searches scan the shards in parallel worker
+    processes.
+    
+    Full scans of a loaded collection, for searches the trigram index cannot
+    narrow down and for uncached summary statistics, go through ``scanner``
+    (a ``ScanExecutor``), which splits large collections across worker
+    processes.
+    
+    With ``snapshot`` each collection is stored as a binary ``.snap`` file
+    (see ``snapshots.py``) in place of its JSON file, converting whichever
+    exists on start. Loading one maps the file and decodes records only as
+    they are read, so startup and reloads no longer scale with its size.
+    Every write without the journal rewrites the whole snapshot, so pair it
+    with ``journal``, whose compaction then writes the snapshot.
+    """
+    
+    def __init__(self, cache: bool = False, journal: bool = False,
+                 compact_threshold: int = 1000, group_commit_ms: float = 0, shard_size: int = 0,
+                 snapshot: bool = False):
+        if shard_size and snapshot:
+            raise ValueError("shard_size and snapshot cannot be combined")
         self.products_file = 'products.json'
         self.customers_file = 'customers.json'
+        self.journal = journal
+        self.cache = cache or journal
+        self.compact_threshold = compact_threshold
+        self.group_commit_ms = group_commit_ms
+        self.shard_size = shard_size
+        self.snapshot = snapshot
+        self._cache: Dict[str, Collection] = {}
+        self._locks = {
+            filename: ReadWriteLock(filename + '.lock')
+            for filename in (self.products_file, self.customers_file)
+        }
+        self._groups = {filename: CommitGroup() for filename in self._locks}
+        self._layouts = {filename: ShardLayout(filename, shard_size) for filename in self._locks}
+        self._snapshot_files = {filename: os.path.splitext(filename)[0] + SNAPSHOT_SUFFIX for filename in self._locks}
+        self.scanner = ScanExecutor()
+        # Recent changes per file, for change feeds, shared with other processes
+        # through <file>.changes; waiters sleep on _changed
+        self._change_logs = {filename: ChangeLog(path=filename + '.changes') for filename in self._locks}
+        self._changed = threading.Condition()
+        # Kept records are compact objects, which only become dicts on the way out
+        self._record_types = {self.products_file: Product, self.customers_file: Customer}
+        # Search and sort indexes only pay for themselves when kept between requests
+        columns = (ProductColumns,) if COLUMNS_AVAILABLE else ()
+        self._index_types = {
+            self.products_file: (ProductStats, ProductSearch, ProductOrder) + columns if self.cache else (),
+            self.customers_file: (CustomerSearch, CustomerOrder) if self.cache else (),
+        }
         self._ensure_files_exist()
+        
+        if not self.journal:
+            # Fold in a log left behind by an earlier journaled run
+            for filename in (self.products_file, self.customers_file):
+                if os.path.exists(self._journal_file(filename)):
+                    self.compact(filename)
+    
+    @contextmanager
+    def _reading(self, filename: str, record_id: Optional[int] = None) -> Iterator[Collection]:
+        """Yield an up-to-date collection while holding the shared lock
+        
+        Uncached sharded stores load only the shard of ``record_id`` when given.
+        """
+        lock = self._locks[filename]
+        with lock.read():
+            collection = self._cache.get(filename)
+            if not self.cache or (collection is not None and
+                                  collection.signature == self._collection_signature(filename)):
+                yield collection if self.cache else self._load_collection(filename, record_id)
+                return
+        
+        # Stale cache: reload under the exclusive lock so only one thread does it
+        with lock.write():
+            yield self._load_collection(filename)
+    
+    @contextmanager
+    def _writing(self, filename: str, record_id: Optional[int] = None) -> Iterator[Collection]:
+        """Yield an up-to-date collection while holding the exclusive lock"""
+        with self._locks[filename].write():
+            yield self._load_collection(filename, record_id)
+    
+    def _mutate(self, filename: str, apply: Mutation, record_id: Optional[int] = None) -> Any:
+        """Apply a mutation under the write lock and persist it
+        
+        ``record_id`` (or ``NEXT_ID`` for a create) names the only record the
+        mutation touches, so an uncached sharded store loads just its shard.
+        """
+        if self.group_commit_ms > 0:
+            return self._group_commit(filename, apply)
+        
+        with self._writing(filename, record_id) as collection:
+            try:
+                result, changes = apply(collection)
+            except Exception:
+                # A mutation that fails part-way can leave the collection
+                # or its indexes half-updated
+                self._cache.pop(filename, None)
+                raise
+            if changes:
+                self._save_collection(filename, collection, changes)
+            return result
+    
+    def _group_commit(self, filename: str, apply: Mutation) -> Any:
+        """Queue a mutation and wait until a leader has persisted it
+        
+        The first writer to arrive becomes the leader: it waits out the commit
+        window, then applies every queued mutation under one write lock and
+        persists them together, repeating until the queue is empty.
+        """
+        group = self._groups[filename]
+        pending = PendingMutation(apply)
+        with group.cond:
+            group.queue.append(pending)
+            if group.leader:
+                while not pending.done:
+                    group.cond.wait()
+            else:
+                group.leader = True
+        
+        if not pending.done:
+            time.sleep(self.group_commit_ms / 1000)
+            while True:
+                with group.cond:
+                    batch, group.queue = group.queue, []
+                    if not batch:
+                        group.leader = False
+                        break
+                self._commit_batch(filename, batch)
+                with group.cond:
+                    group.cond.notify_all()
+        
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+    
+    def _commit_batch(self, filename: str, batch: List[PendingMutation]):
+        """Apply queued mutations in order and persist them with one write
+        
+        A mutation that raises may have changed the collection part-way, so
+        the collection is then reloaded and the mutations that succeeded are
+        applied again without it before anything is persisted.
+        """
+        try:
+            with self._locks[filename].write():
+                applying = batch
+                while True:
+                    collection = self._load_collection(filename)
+                    changes: List[Change] = []
+                    for pending in applying:
+                        try:
+                            pending.result, applied = pending.apply(collection)
+                            changes.extend(applied)
+                        except Exception as e:
+                            pending.error = e
+                    if all(pending.error is None for pending in applying):
+                        break
+                    self._cache.pop(filename, None)
+                    applying = [pending for pending in applying if pending.error is None]
+                if changes:
+                    self._save_collection(filename, collection, changes)
+        except Exception as e:
+            for pending in batch:
+                pending.error = pending.error or e
+        finally:
+            for pending in batch:
+                pending.done = True
     
     def _ensure_files_exist(self):
-        """Create JSON files if they don't exist"""
-        if not os.path.exists(self.products_file):
-            with open(self.products_file, 'w') as f:
-                json.dump([], f)
+        """Create the files if they don't exist, and convert them to the configured layout"""
+        for filename in (self.products_file, self.customers_file):
+            # Check under the lock so a starting process never clobbers a
+            # file another process has just created and written to
+            with self._locks[filename].write():
+                layout = self._layouts[filename]
+                manifest = layout.read_manifest()
+                if manifest is not None:
+                    # Ids already sit in shards of the size they were split with
+                    layout.shard_size = manifest['shard_size']
+                snapshot_file = self._snapshot_files[filename]
+                # Other layouts are converted by way of the single JSON file
+                if not self.shard_size and manifest is not None and not os.path.exists(filename):
+                    self._join_shards(filename)
+                if not self.snapshot and os.path.exists(snapshot_file) and not os.path.exists(filename):
+                    self._write_json_file(filename, Snapshot(snapshot_file).dicts())
+                    os.remove(snapshot_file)
+                    self._bump(filename)
+                
+                if self.shard_size and manifest is None:
+                    self._split_into_shards(filename)
+                elif self.snapshot and not os.path.exists(snapshot_file):
+                    self._write_snapshot(filename, self._read_json_file(filename) if os.path.exists(filename) else [])
+                    if os.path.exists(filename):
+                        os.remove(filename)
+                    self._bump(filename)
+                elif not self.shard_size and not self.snapshot and not os.path.exists(filename):
+                    self._write_json_file(filename, [])
+                    self._bump(filename)
+    
+    def _write_snapshot(self, filename: str, records: Iterable[Dict], next_id: Optional[int] = None):
+        """Atomically replace a collection's binary snapshot"""
+        fields = self._record_types[filename].fields
+        self._replace_file(self._snapshot_files[filename],
+                           lambda f: write_snapshot(f, records, fields, next_id), binary=True)
+    
+    def _rewrite_snapshot(self, filename: str, collection: Collection):
+        """Write a loaded collection as its new snapshot, then read on from that"""
+        self._write_snapshot(filename, collection.dicts(), collection.next_id)
+        # Drops the changes held in memory since the previous snapshot
+        collection.by_id = self._snapshot_records(filename)
+    
+    def _snapshot_records(self, filename: str) -> SnapshotRecords:
+        """Open a collection's snapshot as the ``by_id`` of a Collection"""
+        snapshot = Snapshot(self._snapshot_files[filename])
+        record_type = self._record_types[filename]
+        if snapshot.fields == record_type.fields:
+            return SnapshotRecords(snapshot, lambda values: record_type(*values))
+        return SnapshotRecords(snapshot, lambda values: record_type.from_dict(snapshot.as_dict(values)))
+    
+    def _split_into_shards(self, filename: str):
+        """Move a single-file collection into shard files; the caller holds the write lock"""
+        layout = self._layouts[filename]
+        records = self._read_json_file(filename) if os.path.exists(filename) else []
+        by_key: Dict[int, List[Dict]] = {}
+        for record in sorted(records, key=lambda record: record['id']):
+            by_key.setdefault(layout.key(record['id']), []).append(record)
+        os.makedirs(layout.directory, exist_ok=True)
+        for key, shard in by_key.items():
+            self._write_json_file(layout.path(key), shard)
+        self._write_manifest(filename, max((record['id'] for record in records), default=0) + 1)
+        if os.path.exists(filename):
+            os.remove(filename)
+        self._bump(filename)
+    
+    def _join_shards(self, filename: str):
+        """Write a sharded collection back as one file; the caller holds the write lock"""
+        layout = self._layouts[filename]
+        self._write_json_file(filename, itertools.chain.from_iterable(
+            read_shard(layout.path(key)) for key in layout.keys()))
+        shutil.rmtree(layout.directory)
+        self._bump(filename)
+    
+    def _scans_shards(self, *filenames: str) -> bool:
+        """Whether full scans read these collections' shard files directly, rather than a loaded collection"""
+        return (bool(self.shard_size) and not self.cache
+                and not any(os.path.exists(self._journal_file(filename)) for filename in filenames))
+    
+    def _scan_shards(self, filename: str, scan: Callable[..., Any], *args: Any) -> List[Any]:
+        """Run ``scan(shard path, *args)`` on every shard under the read lock, across the scan workers"""
+        layout = self._layouts[filename]
+        with self._locks[filename].read():
+            return self.scanner.map(scan, [layout.path(key) for key in layout.keys()], *args)
+    
+    def _write_manifest(self, filename: str, next_id: int):
+        """Atomically replace a sharded collection's manifest"""
+        layout = self._layouts[filename]
+        manifest = {'shard_size': layout.shard_size, 'next_id': next_id}
+        self._replace_file(layout.manifest_path, lambda f: json.dump(manifest, f))
+    
+    def _write_shards(self, filename: str, collection: Collection, keys: Iterable[int]):
+        """Rewrite the given shards from a collection holding at least their records"""
+        layout = self._layouts[filename]
+        by_id = collection.by_id
+        for key in sorted(set(keys)):
+            path = layout.path(key)
+            records = [collection.as_dict(by_id[record_id]) for record_id in layout.ids(key) if record_id in by_id]
+            if records:
+                self._write_json_file(path, records)
+                collection.shards[key] = self._file_signature(path)
+            else:
+                if os.path.exists(path):
+                    os.remove(path)
+                collection.shards.pop(key, None)
+        manifest = layout.read_manifest()
+        if collection.next_id > manifest['next_id']:
+            self._write_manifest(filename, collection.next_id)
+    
+    def get_version(self, name: str) -> Tuple:
+        """Return the version of the 'products' or 'customers' collection
+        
+        The first element is the lock's write generation, which every write
+        from any process increments; the file stats that follow make edits
+        made outside the manager count too. Only the lock file is read, never
+        the data itself.
+        """
+        filename = self.products_file if name == 'products' else self.customers_file
+        with self._locks[filename].read():
+            return self._collection_signature(filename)
+    
+    def _file_signature(self, filename: str) -> Optional[Tuple]:
+        """Return (device, inode, mtime, size) for a file, or None if missing"""
+        try:
+            st = os.stat(filename)
+        except FileNotFoundError:
+            return None
+        return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+    
+    def _journal_file(self, filename: str) -> str:
+        """Return the path of the append-only log for a data file"""
+        return filename + '.log'
+    
+    def _collection_signature(self, filename: str) -> Tuple:
+        """Return the signature of everything a collection was loaded from
+        
+        Combines the lock's write generation with the stat of the snapshot and
+        of the log, which another process may be appending to even when this
+        manager does not. Must be called with the file lock held.
+        """
+        journal = self._file_signature(self._journal_file(filename))
+        if self.shard_size:
+            snapshot = self._layouts[filename].manifest_path
+        else:
+            snapshot = self._snapshot_files[filename] if self.snapshot else filename
+        return (self._locks[filename].generation, self._file_signature(snapshot), journal)
+    
+    def _read_collection(self, filename: str, record_id: Optional[int] = None) -> Collection:
+        """Build an indexed collection from disk, with any journal replayed onto it
+        
+        The journal is replayed without journal mode too: a process that has
+        it on, such as the import command, may be appending to it.
+        """
+        journal = self._journal_file(filename)
+        if not os.path.exists(journal):
+            return self._read_files(filename, record_id)
+        # Journaled records may belong to any shard
+        collection = self._read_files(filename)
+        self._replay_journal(filename, collection)
+        return collection
+    
+    def _read_files(self, filename: str, record_id: Optional[int] = None) -> Collection:
+        """Build an indexed collection from the snapshot, JSON or shard files
         
-        if not os.path.exists(self.customers_file):
-            with open(self.customers_file, 'w') as f:
-                json.dump([], f)
+        When sharded this joins every shard, or with ``record_id`` just the
+        one that holds (or, for ``NEXT_ID``, will hold) that record. A
+        snapshot is opened without decoding any record.
+        """
+        index_types, record_type = self._index_types[filename], self._record_types[filename]
+        if self.snapshot:
+            return Collection(self._snapshot_records(filename), index_types=index_types, record_type=record_type)
+        if not self.shard_size:
+            return Collection(self._read_json_file(filename), index_types=index_types, record_type=record_type)
+        
+        layout = self._layouts[filename]
+        manifest = layout.read_manifest()
+        if record_id is None:
+            keys = layout.keys()
+        else:
+            keys = [layout.key(manifest['next_id'] if record_id == NEXT_ID else record_id)]
+        # Stat before reading so a shard replaced meanwhile is re-read next time
+        signatures = {key: self._file_signature(layout.path(key)) for key in keys}
+        collection = Collection(itertools.chain.from_iterable(read_shard(layout.path(key)) for key in keys),
+                                index_types=index_types, record_type=record_type)
+        collection.next_id = max(collection.next_id, manifest['next_id'])
+        collection.shards = {key: signature for key, signature in signatures.items() if signature is not None}
+        return collection
+    
+    def _reload_shards(self, filename: str, collection: Collection):
+        """Bring a cached collection up to date by re-reading only the shards that changed"""
+        layout = self._layouts[filename]
+        by_id = collection.by_id
+        for key in sorted(set(layout.keys()) | set(collection.shards)):
+            path = layout.path(key)
+            signature = self._file_signature(path)
+            if signature == collection.shards.get(key):
+                continue
+            records = read_shard(path)
+            kept = {record['id'] for record in records}
+            for record_id in [record_id for record_id in layout.ids(key) if record_id in by_id]:
+                if record_id not in kept:
+                    collection.remove(record_id)
+            # Records still present keep their place in file order
+            for record in records:
+                current = by_id.get(record['id'])
+                if current is None or collection.as_dict(current) != record:
+                    collection.put(record)
+            if signature is None:
+                collection.shards.pop(key, None)
+            else:
+                collection.shards[key] = signature
+        collection.next_id = max(collection.next_id, layout.read_manifest()['next_id'])
+    
+    def _load_collection(self, filename: str, record_id: Optional[int] = None) -> Collection:
+        """Return the indexed collection for a file, from the cache when enabled"""
+        if not self.cache:
+            return self._read_collection(filename, record_id)
+        
+        # Stat before loading so a concurrent write is picked up next time
+        signature = self._collection_signature(filename)
+        collection = self._cache.get(filename)
+        if collection is not None and collection.signature == signature:
+            return collection
+        
+        if collection is not None and self._journal_grew(collection.signature, signature):
+            # Only new log entries were appended: replay the tail
+            self._replay_journal(filename, collection)
+        elif collection is not None and self.shard_size and collection.signature[2] is None and signature[2] is None:
+            # Another process rewrote some shards
+            self._reload_shards(filename, collection)
+        else:
+            collection = self._read_collection(filename)
+        collection.signature = signature
+        self._cache[filename] = collection
+        return collection
+    
+    def _journal_grew(self, old: Optional[Tuple], new: Tuple) -> bool:
+        """Check whether only the journal changed, by appending to the same file"""
+        if not self.journal or old is None or old[1] != new[1]:
+            return False
+        old_log, new_log = old[2], new[2]
+        return (old_log is not None and new_log is not None
+                and old_log[:2] == new_log[:2] and new_log[3] >= old_log[3])
+    
+    def _replay_journal(self, filename: str, collection: Collection):
+        """Apply complete log entries past the collection's replay offset"""
+        path = self._journal_file(filename)
+        try:
+            with open(path, 'rb') as f:
+                f.seek(collection.log_offset)
+                tail = f.read()
+        except FileNotFoundError:
+            return
+        
+        # A crash mid-append can leave a torn final line; it is ignored here
+        # and overwritten by the next append
+        complete = tail[:tail.rfind(b'\n') + 1]
+        touched = []
+        for line in complete.splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                logging.error(f"Skipping corrupt entry in {path}: {str(e)}")
+                continue
+            if entry['op'] == 'put':
+                touched.append(entry['record']['id'])
+                collection.put(entry['record'])
+            elif entry['op'] == 'delete':
+                if collection.remove(entry['id']) is not None:
+                    touched.append(entry['id'])
+            collection.journal_entries += 1
+        collection.log_offset += len(complete)
+        if self.shard_size:
+            collection.dirty_shards.update(self._layouts[filename].key(record_id) for record_id in touched)
+    
+    def _append_journal(self, filename: str, collection: Collection, changes: List[Change]):
+        """Append mutations to the log with a single fsync"""
+        lines = []
+        for op, value in changes:
+            entry = {'op': 'delete', 'id': value} if op == 'delete' else {'op': 'put', 'record': value}
+            lines.append(json.dumps(entry, separators=(',', ':')) + '\n')
+        
+        path = self._journal_file(filename)
+        payload = ''.join(lines).encode('utf-8')
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT)
+        try:
+            # Write at our replay offset so a torn tail is overwritten
+            os.lseek(fd, collection.log_offset, os.SEEK_SET)
+            remaining = memoryview(payload)
+            while remaining:
+                # os.write may write only part of the buffer, e.g. on a full disk
+                written = os.write(fd, remaining)
+                if not written:
+                    raise OSError(errno.ENOSPC, f"No space left to append to {path}")
+                remaining = remaining[written:]
+            os.ftruncate(fd, collection.log_offset + len(payload))
+            os.fsync(fd)
+        except OSError:
+            # Cut off the partial entries so no other reader replays them
+            try:
+                os.ftruncate(fd, collection.log_offset)
+            except OSError:
+                pass
+            raise
+        finally:
+            os.close(fd)
+        collection.log_offset += len(payload)
+        collection.journal_entries += len(lines)
+        if self.shard_size:
+            collection.dirty_shards.update(self._layouts[filename].key(record_id) for record_id in change_ids(changes))
+    
+    def _save_collection(self, filename: str, collection: Collection, changes: List[Change]):
+        """Persist mutations already applied to a collection"""
+        try:
+            if self.journal:
+                self._append_journal(filename, collection, changes)
+            elif self.shard_size:
+                layout = self._layouts[filename]
+                keys = {layout.key(record_id) for record_id in change_ids(changes)} | collection.dirty_shards
+                self._write_shards(filename, collection, keys)
+                collection.dirty_shards = set()
+            elif self.snapshot:
+                self._rewrite_snapshot(filename, collection)
+            else:
+                self._write_json_file(filename, collection.dicts())
+            if not self.journal:
+                # The write folded in any entries another process journaled
+                self._remove_journal(filename)
+        except Exception:
+            # The cached collection already holds the failed mutation
+            self._cache.pop(filename, None)
+            raise
+        
+        self._bump(filename, changes)
+        if self.cache:
+            collection.signature = self._collection_signature(filename)
+        if self.journal and collection.journal_entries >= self.compact_threshold:
+            self._compact(filename)
+    
+    def _remove_journal(self, filename: str):
+        """Delete a collection's log, if there is one"""
+        try:
+            os.remove(self._journal_file(filename))
+        except FileNotFoundError:
+            pass
+    
+    def _bump(self, filename: str, changes: List[Change] = ()):
+        """Count a write in the lock's generation and log its changes; the caller holds the write lock"""
+        lock = self._locks[filename]
+        lock.bump()
+        self._change_logs[filename].record(
+            lock.generation, [(op, record_id) for (op, _), record_id in zip(changes, change_ids(changes))])
+        with self._changed:
+            self._changed.notify_all()
+    
+    def changes_since(self, name: str, version: int) -> Tuple[int, Optional[List[Dict]]]:
+        """Return the current version of 'products' or 'customers' and the changes after ``version``
+        
+        Each change is ``{'collection', 'op', 'id', 'version'}`` plus the
+        current ``record`` for inserts and updates that still exist. The list
+        is None when the change log no longer reaches back to ``version``, in
+        which case the client has to reload the collection in full.
+        """
+        filename = self.products_file if name == 'products' else self.customers_file
+        with self._reading(filename) as collection:
+            log = self._change_logs[filename]
+            log.refresh()
+            generation = self._locks[filename].generation
+            if log.latest != generation:
+                # Written without logging, e.g. before the change log file existed
+                log.reset(generation)
+            entries = log.since(version)
+            if entries is None:
+                return generation, None
+            changes = []
+            for change_version, op, record_id in entries:
+                change = {'collection': name, 'op': op, 'id': record_id, 'version': change_version}
+                record = None if op == 'delete' else collection.get(record_id)
+                if record is not None:
+                    change['record'] = record
+                changes.append(change)
+            return generation, changes
+    
+    def wait_for_change(self, versions: Dict[str, int], timeout: float,
+                        stop: Optional[threading.Event] = None) -> bool:
+        """Block until a collection is past its version in ``versions``, for up to ``timeout`` seconds
+        
+        Writes made through this manager wake waiters at once; writes from
+        other processes, and ``stop`` being set, are noticed within
+        ``CHANGE_POLL_SECONDS``. Returns whether anything changed.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            if any(self.get_version(name)[0] > version for name, version in versions.items()):
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or stop is not None and stop.is_set():
+                return False
+            with self._changed:
+                self._changed.wait(min(remaining, CHANGE_POLL_SECONDS))
+    
+    def warm(self):
+        """Load both collections and build every index now, e.g. before forking workers
+        
+        Forked workers then share the loaded records copy-on-write instead of
+        each loading its own copy on first use. Only useful with the cache.
+        """
+        for filename in (self.products_file, self.customers_file):
+            with self._reading(filename) as collection:
+                for index in collection.indexes.values():
+                    index.warm()
+    
+    def compact(self, filename: Optional[str] = None):
+        """Fold the journal into the JSON snapshot and truncate it
+        
+        Compacts both collections when no filename is given.
+        """
+        if filename is None:
+            self.compact(self.products_file)
+            self.compact(self.customers_file)
+            return
+        
+        with self._locks[filename].write():
+            self._compact(filename)
+    
+    def _compact(self, filename: str):
+        """Compact one collection; the caller holds its write lock"""
+        if self.journal:
+            collection = self._load_collection(filename)
+        else:
+            collection = self._read_collection(filename)
+        
+        # Entries are idempotent puts/deletes, so a crash between these two
+        # steps just replays the log onto the new snapshot
+        if self.shard_size:
+            self._write_shards(filename, collection, collection.dirty_shards)
+            collection.dirty_shards = set()
+        elif self.snapshot:
+            self._rewrite_snapshot(filename, collection)
+        else:
+            self._write_json_file(filename, collection.dicts())
+        path = self._journal_file(filename)
+        self._bump(filename)
+        if self.journal:
+            open(path, 'w').close()
+            collection.log_offset = 0
+            collection.journal_entries = 0
+            collection.signature = self._collection_signature(filename)
+        else:
+            self._remove_journal(filename)
+            self._cache.pop(filename, None)
     
     def _read_json_file(self, filename: str) -> List[Dict]:
-        """Read data from JSON file"""
+        """Read data from JSON file
+        
+        A missing file is treated as empty. A corrupt file raises instead, so
+        it is never mistaken for an empty collection and overwritten.
+        """
         try:
             with open(filename, 'r') as f:
                 return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError) as e:
+        except FileNotFoundError as e:
             logging.error(f"Error reading {filename}: {str(e)}")
             return []
+        except json.JSONDecodeError as e:
+            logging.error(f"Error reading {filename}: {str(e)}")
+            raise
+    
+    def _iter_json_file(self, filename: str, chunk_size: int = 65536) -> Iterator[Dict]:
+        """Yield the records of a JSON array file one at a time
+        
+        The file is read in chunks and decoded incrementally, so memory use is
+        bounded by the largest record rather than the size of the file. Since
+        writes replace the file atomically, the open handle sees one snapshot.
+        """
+        decoder = json.JSONDecoder()
+        try:
+            f = open(filename, 'r')
+        except FileNotFoundError as e:
+            logging.error(f"Error reading {filename}: {str(e)}")
+            return
+        
+        with f:
+            buffer, pos, started = '', 0, False
+            while True:
+                # Skip whitespace, the opening bracket and separators
+                while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] in '[,'):
+                    if buffer[pos] == '[':
+                        started = True
+                    pos += 1
+                if started and pos < len(buffer) and buffer[pos] == ']':
+                    return
+                
+                try:
+                    if pos == len(buffer):
+                        raise ValueError('buffer exhausted')
+                    record, pos = decoder.raw_decode(buffer, pos)
+                except ValueError:
+                    # Records are objects, so a truncated one never decodes early
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        if not started and not buffer[pos:].strip():
+                            return
+                        raise json.JSONDecodeError('Unexpected end of file', buffer, pos)
+                    buffer, pos = buffer[pos:] + chunk, 0
+                    continue
+                yield record
+    
+    def _iter_records(self, filename: str) -> Iterator[Dict]:
+        """Iterate a collection without building it as one list of dicts
+        
+        Cached stores take a snapshot of references to the records already in
+        memory and turn each into a dict as it is reached; otherwise the file
+        itself is streamed, unless there is a journal to replay. A cached binary snapshot copies only the changes
+        held in memory, and decodes each record as it is reached.
+        """
+        if self.cache:
+            with self._reading(filename) as collection:
+                by_id = collection.by_id
+                records = by_id.copy().values() if isinstance(by_id, SnapshotRecords) else list(by_id.values())
+            return map(collection.as_dict, records)
+        if os.path.exists(self._journal_file(filename)):
+            # The files alone miss what another process has journaled
+            with self._reading(filename) as collection:
+                return collection.dicts()
+        if self.shard_size:
+            layout = self._layouts[filename]
+            return itertools.chain.from_iterable(self._iter_json_file(layout.path(key)) for key in layout.keys())
+        if self.snapshot:
+            return Snapshot(self._snapshot_files[filename]).dicts()
+        return self._iter_json_file(filename)
+    
+    def _write_json_file(self, filename: str, data: Iterable[Dict]):
+        """Atomically replace a JSON array file
+        
+        Records are encoded one at a time, in the layout ``json.dump(data,
+        indent=2)`` produces, so the whole file is never built in memory.
+        """
+        def write(f: IO[str]):
+            encode = json.JSONEncoder(indent=2).encode
+            separator = '[\n  '
+            for record in data:
+                f.write(separator + encode(record).replace('\n', '\n  '))
+                separator = ',\n  '
+            f.write('[]' if separator == '[\n  ' else '\n]')
+        
+        self._replace_file(filename, write)
     
-    def _write_json_file(self, filename: str, data: List[Dict]):
-        """Write data to JSON file"""
+    def _replace_file(self, filename: str, write: Callable[[IO], None], binary: bool = False):
+        """Atomically replace a file via temp file, fsync and rename"""
+        directory = os.path.dirname(filename) or '.'
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(filename)}.',
+                                         suffix='.tmp')
         try:
-            with open(filename, 'w') as f:
-                json.dump(data, f, indent=2)
+            with os.fdopen(fd, 'wb' if binary else 'w') as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                mode = os.stat(filename).st_mode & 0o777
+            except FileNotFoundError:
+                mode = 0o644
+            os.chmod(temp_path, mode)
+            os.replace(temp_path, filename)
         except Exception as e:
             logging.error(f"Error writing to {filename}: {str(e)}")
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
             raise
+        self._fsync_directory(directory)
     
-    def _get_next_id(self, data: List[Dict]) -> int:
-        """Generate next available ID"""
-        if not data:
-            return 1
-        return max(item['id'] for item in data) + 1
+    def _fsync_directory(self, directory: str):
+        """Flush a directory entry so a completed rename survives a crash"""
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return  # e.g. directories cannot be opened on Windows
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
     
     # Product CRUD Operations
     def get_all_products(self) -> List[Dict]:
         """Get all products"""
-        return self._read_json_file(self.products_file)
+        with self._reading(self.products_file) as products:
+            return products.records()
+    
+    def iter_products(self) -> Iterator[Dict]:
+        """Iterate over all products, for streaming exports"""
+        return self._iter_records(self.products_file)
     
     def get_product(self, product_id: int) -> Optional[Dict]:
         """Get a specific product by ID"""
-        products = self._read_json_file(self.products_file)
-        return next((p for p in products if p['id'] == product_id), None)
+        with self._reading(self.products_file, product_id) as products:
+            return products.get(product_id)
     
     def create_product(self, name: str, price: float, stock: int) -> Dict:
         """Create a new product"""
-        products = self._read_json_file(self.products_file)
-        new_product = {
-            'id': self._get_next_id(products),
+        def apply(products: Collection):
+            new_product = products.insert(self._new_product(name, price, stock))
+            return new_product, [('insert', new_product)]
+        
+        return self._mutate(self.products_file, apply, NEXT_ID)
+    
+    def _new_product(self, name: str, price: float, stock: int) -> Dict:
+        """Build a product record; the collection assigns its id"""
+        return {
+            'id': None,
             'name': name.strip(),
             'price': price,
             'stock': stock
         }
-        products.append(new_product)
-        self._write_json_file(self.products_file, products)
-        return new_product
     
     def update_product(self, product_id: int, updates: Dict) -> Optional[Dict]:
         """Update an existing product"""
-        products = self._read_json_file(self.products_file)
-        
-        for product in products:
-            if product['id'] == product_id:
-                # Update only provided fields
-                if 'name' in updates:
-                    product['name'] = updates['name'].strip()
-                if 'price' in updates:
-                    product['price'] = updates['price']
-                if 'stock' in updates:
-                    product['stock'] = updates['stock']
-                
-                self._write_json_file(self.products_file, products)
-                return product
+        def apply(products: Collection):
+            product = products.get(product_id)
+            if product is None:
+                return None, []
+            
+            product = self._updated_product(product, updates)
+            products.put(product)
+            return product, [('update', product)]
         
-        return None
+        return self._mutate(self.products_file, apply, product_id)
+    
+    def _updated_product(self, product: Dict, updates: Dict) -> Dict:
+        """Return an updated copy of a product record"""
+        # Copy on write so concurrent readers never see a half-applied update
+        product = dict(product)
+        
+        # Update only provided fields
+        if 'name' in updates:
+            product['name'] = updates['name'].strip()
+        if 'price' in updates:
+            product['price'] = updates['price']
+        if 'stock' in updates:
+            product['stock'] = updates['stock']
+        return product
     
     def delete_product(self, product_id: int) -> bool:
         """Delete a product"""
-        products = self._read_json_file(self.products_file)
-        original_length = len(products)
+        def apply(products: Collection):
+            if products.remove(product_id) is None:
+                return False, []
+            return True, [('delete', product_id)]
+        
+        return self._mutate(self.products_file, apply, product_id)
+    
+    def apply_product_batch(self, operations: List[Dict]) -> List[Any]:
+        """Apply product creates, updates and deletes all-or-nothing, persisting once
+        
+        Each operation is ``{'op': 'create', 'name', 'price', 'stock'}``,
+        ``{'op': 'update', 'id', ...fields}`` or ``{'op': 'delete', 'id'}``.
+        Returns the created or updated product, or True for a delete, per
+        operation. Raises BatchRejected, having changed nothing, if any update
+        or delete names a product that does not exist.
+        """
+        return self._apply_batch(
+            self.products_file, operations,
+            lambda op: self._new_product(op['name'], op['price'], op['stock']),
+            self._updated_product)
+    
+    def search_products(self, query: str = '', sort_by: str = 'name') -> List[Dict]:
+        """Search products by name, sorted by name, price or stock"""
+        sort_by = sort_by if sort_by in PRODUCT_SORT_KEYS else 'name'
+        return self._search(self.products_file, ProductSearch, ProductOrder, query, sort_by)
+    
+    def page_products(self, query: str = '', sort_by: str = 'id', limit: int = 50,
+                      after: Optional[Tuple] = None) -> Dict:
+        """Return one keyset page of matching products
         
-        products = [p for p in products if p['id'] != product_id]
+        ``after`` is the ``next`` value of the previous page. The result holds
+        the page ``items``, the ``total`` number of matches and ``next``, or
+        None on the last page.
+        """
+        sort_by = sort_by if sort_by in PRODUCT_SORT_KEYS else 'name'
+        return self._page(self.products_file, ProductSearch, ProductOrder, query, sort_by, limit, after)
+    
+    def range_products(self, sort_by: str = 'price', low: Any = None, high: Any = None,
+                       limit: Optional[int] = None, descending: bool = False) -> List[Dict]:
+        """Return products with ``low <= sort key <= high`` in sort key order
         
-        if len(products) < original_length:
-            self._write_json_file(self.products_file, products)
-            return True
+        Either bound may be None. With ``limit`` and ``descending`` this also
+        answers top-k queries such as the five most expensive products.
+        """
+        return self._range(self.products_file, ProductOrder, sort_by, low, high, limit, descending)
+    
+    def get_summary_stats(self) -> Dict:
+        """Get summary statistics, from aggregates maintained on every write when cached
         
-        return False
+        Uncached stores compute the product aggregates with one scan, split
+        across the scan workers for large collections.
+        """
+        if self._scans_shards(self.products_file, self.customers_file):
+            total_products, recent_products, totals = merge_summaries(
+                self._scan_shards(self.products_file, summarize_shard, True))
+            summary = self._product_summary(total_products, totals, _as_is, recent_products)
+            summary['total_customers'], summary['recent_customers'], _ = merge_summaries(
+                self._scan_shards(self.customers_file, summarize_shard, False))
+            return summary
+        
+        with self._reading(self.products_file) as products:
+            stats = products.indexes.get(ProductStats)
+            if stats is None:
+                stats = ProductTotals(self.scanner.scan(summarize_products, products, PRODUCT_TOTAL_FIELDS),
+                                      products.by_id)
+            summary = self._product_summary(len(products), stats, products.as_dict,
+                                            [products.as_dict(p) for p in recent_records(products)])
+        with self._reading(self.customers_file) as customers:
+            summary['total_customers'] = len(customers)
+            summary['recent_customers'] = [customers.as_dict(c) for c in recent_records(customers)]
+        return summary
+    
+    def _product_summary(self, total_products: int, stats: Any, as_dict: Callable[[Any], Dict],
+                         recent_products: List[Dict]) -> Dict:
+        """Format the product statistics from a ``ProductStats`` or ``ProductTotals``"""
+        most_expensive, cheapest = stats.most_expensive(), stats.cheapest()
+        return {
+            'total_products': total_products,
+            'low_stock_items': stats.low_stock,
+            'total_inventory_value': round(float(stats.value_sum), 2),
+            'most_expensive_product': most_expensive and as_dict(most_expensive),
+            'cheapest_product': cheapest and as_dict(cheapest),
+            'average_price': round(float(stats.price_sum / total_products), 2) if total_products else 0,
+            'recent_products': recent_products,
+        }
+    
+    def stock_band_totals(self, bands: Dict[str, Band]) -> Dict[str, BandTotals]:
+        """Return ``(count, price sum, stock value sum)`` for each inclusive stock band
+        
+        Vectorized over NumPy columns when NumPy is installed and the store is
+        cached, otherwise one Python pass over the products.
+        """
+        with self._reading(self.products_file) as products:
+            columns: Optional[ProductColumns] = products.indexes.get(ProductColumns)
+            if columns is not None:
+                return columns.band_totals(bands)
+            return band_totals_python(products.by_id.values(), bands)
     
     # Customer CRUD Operations
     def get_all_customers(self) -> List[Dict]:
         """Get all customers"""
-        return self._read_json_file(self.customers_file)
+        with self._reading(self.customers_file) as customers:
+            return customers.records()
+    
+    def iter_customers(self) -> Iterator[Dict]:
+        """Iterate over all customers, for streaming exports"""
+        return self._iter_records(self.customers_file)
     
     def get_customer(self, customer_id: int) -> Optional[Dict]:
         """Get a specific customer by ID"""
-        customers = self._read_json_file(self.customers_file)
-        return next((c for c in customers if c['id'] == customer_id), None)
+        with self._reading(self.customers_file, customer_id) as customers:
+            return customers.get(customer_id)
     
     def create_customer(self, name: str, email: str, phone: str) -> Dict:
         """Create a new customer"""
-        customers = self._read_json_file(self.customers_file)
-        new_customer = {
-            'id': self._get_next_id(customers),
+        def apply(customers: Collection):
+            new_customer = customers.insert(self._new_customer(name, email, phone))
+            return new_customer, [('insert', new_customer)]
+        
+        return self._mutate(self.customers_file, apply, NEXT_ID)
+    
+    def _new_customer(self, name: str, email: str, phone: str) -> Dict:
+        """Build a customer record; the collection assigns its id"""
+        return {
+            'id': None,
             'name': name.strip(),
             'email': email.strip(),
             'phone': phone.strip()
         }
-        customers.append(new_customer)
-        self._write_json_file(self.customers_file, customers)
-        return new_customer
     
     def update_customer(self, customer_id: int, updates: Dict) -> Optional[Dict]:
         """Update an existing customer"""
-        customers = self._read_json_file(self.customers_file)
-        
-        for customer in customers:
-            if customer['id'] == customer_id:
-                # Update only provided fields
-                if 'name' in updates:
-                    customer['name'] = updates['name'].strip()
-                if 'email' in updates:
-                    customer['email'] = updates['email'].strip()
-                if 'phone' in updates:
-                    customer['phone'] = updates['phone'].strip()
-                
-                self._write_json_file(self.customers_file, customers)
-                return customer
+        def apply(customers: Collection):
+            customer = customers.get(customer_id)
+            if customer is None:
+                return None, []
+            
+            customer = self._updated_customer(customer, updates)
+            customers.put(customer)
+            return customer, [('update', customer)]
         
-        return None
+        return self._mutate(self.customers_file, apply, customer_id)
+    
+    def _updated_customer(self, customer: Dict, updates: Dict) -> Dict:
+        """Return an updated copy of a customer record"""
+        # Copy on write so concurrent readers never see a half-applied update
+        customer = dict(customer)
+        
+        # Update only provided fields
+        if 'name' in updates:
+            customer['name'] = updates['name'].strip()
+        if 'email' in updates:
+            customer['email'] = updates['email'].strip()
+        if 'phone' in updates:
+            customer['phone'] = updates['phone'].strip()
+        return customer
     
     def delete_customer(self, customer_id: int) -> bool:
         """Delete a customer"""
-        customers = self._read_json_file(self.customers_file)
-        original_length = len(customers)
+        def apply(customers: Collection):
+            if customers.remove(customer_id) is None:
+                return False, []
+            return True, [('delete', customer_id)]
+        
+        return self._mutate(self.customers_file, apply, customer_id)
+    
+    def apply_customer_batch(self, operations: List[Dict]) -> List[Any]:
+        """Apply customer creates, updates and deletes, as for ``apply_product_batch``"""
+        return self._apply_batch(
+            self.customers_file, operations,
+            lambda op: self._new_customer(op['name'], op['email'], op['phone']),
+            self._updated_customer)
+    
+    def _apply_batch(self, filename: str, operations: List[Dict], build: Callable[[Dict], Dict],
+                     update: Callable[[Dict, Dict], Dict]) -> List[Any]:
+        """Apply a batch of operations under one write lock and persist them together"""
+        def apply(collection: Collection):
+            # Check every target first, so a rejected batch changes nothing.
+            # The rejection is returned rather than raised so that _mutate
+            # keeps the untouched cached collection.
+            deleted = set()
+            missing = []
+            for index, operation in enumerate(operations):
+                if operation['op'] == 'create':
+                    continue
+                if operation['id'] not in collection.by_id or operation['id'] in deleted:
+                    missing.append(index)
+                elif operation['op'] == 'delete':
+                    deleted.add(operation['id'])
+            if missing:
+                return BatchRejected(missing), []
+            
+            results, changes = [], []
+            for operation in operations:
+                if operation['op'] == 'create':
+                    record = collection.insert(build(operation))
+                    changes.append(('insert', record))
+                elif operation['op'] == 'update':
+                    record = update(collection.get(operation['id']), operation)
+                    collection.put(record)
+                    changes.append(('update', record))
+                else:
+                    collection.remove(operation['id'])
+                    changes.append(('delete', operation['id']))
+                    results.append(True)
+                    continue
+                results.append(record)
+            return results, changes
         
-        customers = [c for c in customers if c['id'] != customer_id]
+        results = self._mutate(filename, apply)
+        if isinstance(results, BatchRejected):
+            raise results
+        return results
+    
+    def search_customers(self, query: str = '', sort_by: str = 'name') -> List[Dict]:
+        """Search customers by name or email, sorted by name, email or phone"""
+        sort_by = sort_by if sort_by in CUSTOMER_SORT_KEYS else 'name'
+        return self._search(self.customers_file, CustomerSearch, CustomerOrder, query, sort_by)
+    
+    def page_customers(self, query: str = '', sort_by: str = 'id', limit: int = 50,
+                       after: Optional[Tuple] = None) -> Dict:
+        """Return one keyset page of matching customers, as for ``page_products``"""
+        sort_by = sort_by if sort_by in CUSTOMER_SORT_KEYS else 'name'
+        return self._page(self.customers_file, CustomerSearch, CustomerOrder, query, sort_by, limit, after)
+    
+    def range_customers(self, sort_by: str = 'name', low: Any = None, high: Any = None,
+                        limit: Optional[int] = None, descending: bool = False) -> List[Dict]:
+        """Return customers with ``low <= sort key <= high``, as for ``range_products``"""
+        return self._range(self.customers_file, CustomerOrder, sort_by, low, high, limit, descending)
+    
+    def _matches(self, collection: Collection, search_type: type, query: str) -> List[Dict]:
+        """Return the records matching a search, using the trigram index if loaded
         
-        if len(customers) < original_length:
-            self._write_json_file(self.customers_file, customers)
-            return True
+        Searches that have to check every record scan the fields column by
+        column, split across the scan workers when the collection is large.
+        """
+        index: Optional[TrigramIndex] = collection.indexes.get(search_type)
+        query = query.lower()
+        if index is not None and not index.scans(query):
+            return index.search(query)
+        by_id = collection.by_id
+        return [by_id[record_id] for ids in self.scanner.scan(
+            match_columns, collection, ('id',) + search_type.fields, query) for record_id in ids]
+    
+    def _ordered(self, collection: Collection, search_type: type, order_type: type,
+                 query: str, sort_by: str) -> List[Entry]:
+        """Return the (sort key, id) entries of matching records in order
         
-        return False
+        Without a query this is the sorted index itself. Matches are sorted
+        directly when they are few, and otherwise picked out of the index in
+        order, which is cheaper than sorting most of the collection.
+        """
+        index: Optional[SortedIndex] = collection.indexes.get(order_type)
+        if not query:
+            if index is not None:
+                return index.entries(sort_by)
+            matches = collection.by_id.values()
+        else:
+            matches = self._matches(collection, search_type, query)
+            if index is not None and len(matches) * 8 > len(collection):
+                ids = {record['id'] for record in matches}
+                return [entry for entry in index.entries(sort_by) if entry[1] in ids]
+        sort_key = order_type.sort_keys[sort_by]
+        return sorted((sort_key(record), record['id']) for record in matches)
+    
+    def _search(self, filename: str, search_type: type, order_type: type, query: str,
+                sort_by: str) -> List[Dict]:
+        """Return every matching record in (sort key, id) order"""
+        if query and self._scans_shards(filename):
+            sort_key = order_type.sort_keys[sort_by]
+            matches = itertools.chain.from_iterable(
+                self._scan_shards(filename, match_shard, search_type, query.lower()))
+            return sorted(matches, key=lambda record: (sort_key(record), record['id']))
+        with self._reading(filename) as collection:
+            by_id, as_dict = collection.by_id, collection.as_dict
+            return [as_dict(by_id[record_id]) for _, record_id in
+                    self._ordered(collection, search_type, order_type, query, sort_by)]
+    
+    def _page(self, filename: str, search_type: type, order_type: type, query: str, sort_by: str,
+              limit: int, after: Optional[Tuple]) -> Dict:
+        """Slice one page out of the matching records ordered by (sort key, id)"""
+        with self._reading(filename) as collection:
+            entries = self._ordered(collection, search_type, order_type, query, sort_by)
+            start = bisect_right(entries, tuple(after)) if after is not None else 0
+            page = entries[start:start + limit]
+            more = start + limit < len(entries)
+            return {
+                'items': [collection.as_dict(collection.by_id[record_id]) for _, record_id in page],
+                'total': len(entries),
+                'next': list(page[-1]) if page and more else None,
+            }
+    
+    def _range(self, filename: str, order_type: type, sort_by: str, low: Any, high: Any,
+               limit: Optional[int], descending: bool) -> List[Dict]:
+        """Return records in a sort key range, using the sorted index if loaded"""
+        with self._reading(filename) as collection:
+            index: Optional[SortedIndex] = collection.indexes.get(order_type)
+            if index is not None:
+                entries = index.range(sort_by, low, high, limit, descending)
+            else:
+                sort_key = order_type.sort_keys[sort_by]
+                entries = sorted(
+                    ((key, record['id']) for key, record in
+                     ((sort_key(record), record) for record in collection.by_id.values())
+                     if (low is None or key >= low) and (high is None or key <= high)),
+                    reverse=descending)[:limit]
+            by_id, as_dict = collection.by_id, collection.as_dict
+            return [as_dict(by_id[record_id]) for _, record_id in entries]
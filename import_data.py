@@ -0,0 +1,72 @@
+"""Import products or customers from a CSV or NDJSON file into the configured store
+
+Usage: python import_data.py products supplier.csv [--format csv] [--chunk-size 5000]
+
+The store is chosen as for the web app (STORAGE_BACKEND, SQLITE_DATABASE). Pass
+``-`` as the file to read standard input. Exits with status 1 if any row was
+rejected.
+"""
+import argparse
+import os
+import sys
+
+from data_manager import DataManager
+from importer import IMPORT_CHUNK_SIZE, IMPORT_FORMATS, IMPORTERS, import_records
+from sqlite_data_manager import SQLiteDataManager
+
+
+def guess_format(path):
+    """Return the import format implied by a file name, or None"""
+    extension = os.path.splitext(path)[1].lower()
+    return {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}.get(extension)
+
+
+def open_store():
+    """Open the store the web app is configured to use"""
+    if os.environ.get("STORAGE_BACKEND", "json") == "sqlite":
+        store = SQLiteDataManager(os.environ.get("SQLITE_DATABASE", "emerald.db"))
+        store.migrate_from_json()
+        return store
+    # Each chunk is appended to the journal and the snapshot is rewritten
+    # once at the end, rather than once per chunk
+    return DataManager(journal=True, compact_threshold=sys.maxsize,
+                       shard_size=int(os.environ.get("SHARD_SIZE", "0")),
+                       snapshot=os.environ.get("SNAPSHOT") == "1")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('collection', choices=sorted(IMPORTERS))
+    parser.add_argument('file')
+    parser.add_argument('--format', choices=IMPORT_FORMATS)
+    parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+    
+    fmt = args.format or guess_format(args.file)
+    if fmt is None:
+        parser.error('cannot tell the format from the file name, pass --format')
+    if args.chunk_size < 1:
+        parser.error('--chunk-size must be at least 1')
+    
+    store = open_store()
+    try:
+        if args.file == '-':
+            summary = import_records(store, args.collection, sys.stdin.buffer, fmt, args.chunk_size)
+        else:
+            with open(args.file, 'rb') as f:
+                summary = import_records(store, args.collection, f, fmt, args.chunk_size)
+    finally:
+        if isinstance(store, DataManager):
+            store.compact()
+    
+    for error in summary['errors']:
+        print(f"line {error['line']}: {error['error']}", file=sys.stderr)
+    if summary['rejected'] > len(summary['errors']):
+        print(f"... and {summary['rejected'] - len(summary['errors'])} more rejected rows", file=sys.stderr)
+    print(f"Imported {summary['imported']} {args.collection} in {summary['batches']} batches, "
+          f"rejected {summary['rejected']} rows")
+    return 1 if summary['rejected'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import codecs
+import csv
+import json
+from itertools import islice
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Set, Tuple
+
+from validation import ValidationError, validate_new_customer, validate_new_product
+
+# Rows validated and committed together; bounds the memory an import holds
+IMPORT_CHUNK_SIZE = 5000
+
+# Rejected rows listed in an import summary; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+# Row validator and store batch method of each importable collection
+IMPORTERS = {
+    'products': (validate_new_product, 'apply_product_batch'),
+    'customers': (validate_new_customer, 'apply_customer_batch'),
+}
+
+Row = Tuple[int, Optional[Any], Optional[str]]
+
+
+def decode_lines(stream: BinaryIO, bad_lines: Set[int]) -> Iterator[str]:
+    """Decode a byte stream line by line, noting the lines that are not UTF-8"""
+    for line, data in enumerate(stream, 1):
+        if line == 1 and data.startswith(codecs.BOM_UTF8):
+            data = data[len(codecs.BOM_UTF8):]
+        try:
+            yield data.decode('utf-8')
+        except UnicodeDecodeError:
+            bad_lines.add(line)
+            yield data.decode('utf-8', errors='replace')
+
+
+def read_rows(stream: BinaryIO, fmt: str) -> Iterator[Row]:
+    """Yield ``(line, row, error)`` for each record of a CSV or NDJSON byte stream
+    
+    Rows are decoded and parsed one at a time, so the whole file is never held
+    in memory. A CSV file starts with a header naming the fields. A row that
+    cannot be decoded or parsed comes back with an error instead.
+    """
+    bad_lines: Set[int] = set()
+    lines = decode_lines(stream, bad_lines)
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        first = 1
+        try:
+            reader.fieldnames  # read the header so line_num points past it
+            first = reader.line_num + 1
+            for row in reader:
+                # A quoted field may span lines, so a row covers first..line_num
+                if bad_lines.intersection(range(first, reader.line_num + 1)):
+                    yield first, None, 'Invalid UTF-8'
+                else:
+                    yield first, row, None
+                first = reader.line_num + 1
+        except csv.Error as e:
+            yield first, None, f'Malformed CSV, import stopped: {e}'
+    else:
+        for line, text in enumerate(lines, 1):
+            if line in bad_lines:
+                yield line, None, 'Invalid UTF-8'
+            elif text.strip():
+                try:
+                    yield line, json.loads(text), None
+                except ValueError:
+                    yield line, None, 'Invalid JSON'
+
+
+def import_records(store, collection: str, stream: BinaryIO, fmt: str,
+                   chunk_size: int = IMPORT_CHUNK_SIZE) -> Dict:
+    """Validate and create every record of a CSV or NDJSON byte stream
+    
+    ``store`` is a DataManager or SQLiteDataManager and ``collection`` is
+    'products' or 'customers'. Rows are checked with the same rules as the
+    create endpoints, ``chunk_size`` at a time; each chunk's valid rows are
+    created in one batch, which assigns their ids together. Invalid rows are
+    skipped and reported by line without stopping the import.
+    """
+    validate, apply_name = IMPORTERS[collection]
+    apply_batch = getattr(store, apply_name)
+    summary = {'imported': 0, 'rejected': 0, 'batches': 0, 'errors': []}
+    
+    rows = read_rows(stream, fmt)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        
+        operations = []
+        for line, row, error in chunk:
+            if error is None:
+                try:
+                    operations.append(dict(validate(row), op='create'))
+                    continue
+                except ValidationError as e:
+                    error = str(e)
+            summary['rejected'] += 1
+            if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                summary['errors'].append({'line': line, 'error': error})
+        
+        if operations:
+            summary['imported'] += len(apply_batch(operations))
+            summary['batches'] += 1
+    return summary
@@ -0,0 +1,417 @@
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from fractions import Fraction
+from math import isnan
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+Number = Union[int, float]
+
+# A position in a sorted index: (sort key, id)
+Entry = Tuple[Any, int]
+
+# Sort keys for search and keyset pagination; ties are always broken by id
+PRODUCT_SORT_KEYS: Dict[str, Callable[[Dict], Any]] = {
+    'id': lambda p: p['id'],
+    'name': lambda p: p['name'].lower(),
+    'price': lambda p: p['price'],
+    'stock': lambda p: p['stock'],
+}
+CUSTOMER_SORT_KEYS: Dict[str, Callable[[Dict], Any]] = {
+    'id': lambda c: c['id'],
+    'name': lambda c: c['name'].lower(),
+    'email': lambda c: c['email'].lower(),
+    'phone': lambda c: c['phone'],
+}
+
+# Stock at or below this level counts as low stock
+LOW_STOCK_THRESHOLD = 5
+
+# How many of the most recently added records the summary shows
+RECENT_COUNT = 5
+
+# Stop intersecting posting lists once the next one is this many times
+# longer than the candidate set; checking the candidates directly is cheaper
+CANDIDATE_RATIO = 8
+
+# Scan every record instead when even the shortest posting list covers more
+# than this fraction of the collection
+SCAN_FRACTION = 0.25
+
+
+def exact_sum(values: Iterable[Number]) -> Union[Fraction, float]:
+    """Sum floats exactly by grouping their integer ratios by denominator
+    
+    Infinities and NaNs have no ratio; from the first one on the values are
+    summed as floats, which gives the same inf or nan.
+    """
+    by_denominator: Dict[int, int] = defaultdict(int)
+    values = iter(values)
+    for value in values:
+        try:
+            numerator, denominator = value.as_integer_ratio()
+        except (OverflowError, ValueError):
+            return sum(values, value)
+        by_denominator[denominator] += numerator
+    return sum((Fraction(n, d) for d, n in by_denominator.items()), Fraction(0))
+
+
+def exact(value: Number) -> Union[Fraction, float]:
+    """Convert a float or int to an exact fraction; infinities and NaNs stay floats"""
+    try:
+        return Fraction(value)
+    except (OverflowError, ValueError):
+        return value
+
+
+def ranked(products: Iterable[Dict]) -> List[Tuple[Number, int]]:
+    """Return the (price, id) of products, leaving out NaN prices, which have no order"""
+    return [(p['price'], p['id']) for p in products if not isnan(p['price'])]
+
+
+class CollectionIndex:
+    """A structure derived from a Collection's records and kept in step with it
+    
+    The collection builds each index from its records on load, then calls
+    ``add`` after a record is inserted and ``discard`` after one is removed;
+    an update is a ``discard`` of the old record followed by an ``add`` of the
+    new one. Both are called with the collection's ``by_id`` already updated,
+    and always under the collection's write lock, so readers only ever see an
+    index between mutations.
+    """
+    
+    def __init__(self, collection):
+        self.collection = collection
+        for record in collection.by_id.values():
+            self.add(record)
+    
+    def add(self, record: Dict):
+        raise NotImplementedError
+    
+    def discard(self, record: Dict):
+        raise NotImplementedError
+    
+    def warm(self):
+        """Build any lazily built parts now rather than on the first query"""
+
+
+class ProductStats(CollectionIndex):
+    """Running aggregates behind the summary statistics
+    
+    Counts and sums are adjusted on every mutation. Sums are kept as exact
+    fractions so that millions of adds and removes never drift. The cheapest
+    and most expensive products come from two heaps with lazy deletion:
+    entries for removed or repriced products are pruned from the top after
+    each mutation, so the top entry is always current and reads never modify
+    the heaps. Like the trigram postings, everything is first built by the
+    first read, so loading a collection never touches every record. Sums
+    holding an inf or NaN are floats, and removing such a product rebuilds
+    the aggregates on the next read.
+    """
+    
+    def __init__(self, collection):
+        self.collection = collection
+        self.built = False
+    
+    def _build(self):
+        """Bulk build: one exact pass per sum and a heapify per heap; safe to run under a shared lock"""
+        products = list(self.collection.by_id.values())
+        cheapest = ranked(products)
+        dearest = [(-price, product_id) for price, product_id in cheapest]
+        heapq.heapify(cheapest)
+        heapq.heapify(dearest)
+        # Publish only finished heaps to concurrent readers and builders
+        self._low_stock = sum(1 for p in products if p['stock'] <= LOW_STOCK_THRESHOLD)
+        self._price_sum = exact_sum(p['price'] for p in products)
+        self._value_sum = exact_sum(p['price'] * p['stock'] for p in products)
+        self._cheapest = cheapest
+        self._dearest = dearest
+        self.built = True
+    
+    def warm(self):
+        if not self.built:
+            self._build()
+    
+    @property
+    def low_stock(self) -> int:
+        self.warm()
+        return self._low_stock
+    
+    @property
+    def price_sum(self) -> Union[Fraction, float]:
+        self.warm()
+        return self._price_sum
+    
+    @property
+    def value_sum(self) -> Union[Fraction, float]:
+        self.warm()
+        return self._value_sum
+    
+    def add(self, product: Dict):
+        if not self.built:
+            return
+        if product['stock'] <= LOW_STOCK_THRESHOLD:
+            self._low_stock += 1
+        self._price_sum += exact(product['price'])
+        self._value_sum += exact(product['price'] * product['stock'])
+        if not isnan(product['price']):
+            heapq.heappush(self._cheapest, (product['price'], product['id']))
+            heapq.heappush(self._dearest, (-product['price'], product['id']))
+        self._prune()
+    
+    def discard(self, product: Dict):
+        if not self.built:
+            return
+        price, value = exact(product['price']), exact(product['price'] * product['stock'])
+        if isinstance(price, float) or isinstance(value, float):
+            # An inf or nan cannot be subtracted back out (inf - inf is nan),
+            # so the next read rebuilds everything instead
+            self.built = False
+            return
+        if product['stock'] <= LOW_STOCK_THRESHOLD:
+            self._low_stock -= 1
+        self._price_sum -= price
+        self._value_sum -= value
+        self._prune()
+    
+    def _is_current(self, price: Number, product_id: int) -> bool:
+        """Check that a heap entry still matches a live product"""
+        product = self.collection.by_id.get(product_id)
+        return product is not None and product['price'] == price
+    
+    def _prune(self):
+        """Drop stale heap tops, and rebuild heaps that are mostly garbage"""
+        if len(self._cheapest) > 2 * len(self.collection) + 64:
+            self._cheapest = ranked(self.collection.by_id.values())
+            self._dearest = [(-price, product_id) for price, product_id in self._cheapest]
+            heapq.heapify(self._cheapest)
+            heapq.heapify(self._dearest)
+        while self._cheapest and not self._is_current(*self._cheapest[0]):
+            heapq.heappop(self._cheapest)
+        while self._dearest and not self._is_current(-self._dearest[0][0], self._dearest[0][1]):
+            heapq.heappop(self._dearest)
+    
+    def cheapest(self) -> Optional[Dict]:
+        """Return the cheapest product, lowest id first on ties"""
+        self.warm()
+        return self.collection.by_id[self._cheapest[0][1]] if self._cheapest else None
+    
+    def most_expensive(self) -> Optional[Dict]:
+        """Return the most expensive product, lowest id first on ties"""
+        self.warm()
+        return self.collection.by_id[self._dearest[0][1]] if self._dearest else None
+
+
+def trigrams(text: str) -> Set[str]:
+    """Return the set of three-character substrings of a lowercased string"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex(CollectionIndex):
+    """Substring search over some text fields via trigram posting lists
+    
+    Every record is listed under each trigram of its lowercased ``fields``. A
+    query of three or more characters can only match records listed under
+    all of its trigrams, so the candidates come from intersecting the shortest
+    posting lists, and each candidate is then checked against its current
+    record. The work done tracks the number of matches rather than the size
+    of the collection.
+    
+    Posting lists are append-only arrays of ids. Deleted and changed records
+    leave stale entries behind, which the final check filters out; once the
+    stale entries outnumber the live records the postings are rebuilt. They
+    are first built by the first search, so loading a collection that is
+    never searched costs nothing.
+    """
+    
+    fields: Tuple[str, ...] = ()
+    
+    def __init__(self, collection):
+        self.collection = collection
+        self.postings: Optional[Dict[str, array]] = None
+        self.stale = 0
+    
+    def _build(self):
+        """Index every record; safe to run under a shared lock"""
+        postings: Dict[str, array] = {}
+        for record in self.collection.by_id.values():
+            self._post(postings, record)
+        # Publish only the finished dict to concurrent readers
+        self.stale = 0
+        self.postings = postings
+    
+    def _post(self, postings: Dict[str, array], record: Dict):
+        record_id = record['id']
+        grams = set()
+        for field in self.fields:
+            grams |= trigrams(record[field].lower())
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array('q')
+            posting.append(record_id)
+    
+    def add(self, record: Dict):
+        if self.postings is not None:
+            self._post(self.postings, record)
+    
+    def discard(self, record: Dict):
+        if self.postings is None:
+            return
+        self.stale += 1
+        if self.stale > max(len(self.collection), 1024):
+            self._build()
+    
+    def warm(self):
+        if self.postings is None:
+            self._build()
+    
+    @classmethod
+    def matches(cls, record: Dict, query: str) -> bool:
+        """Check whether any indexed field contains the lowercased query"""
+        for field in cls.fields:
+            if query in record[field].lower():
+                return True
+        return False
+    
+    def _postings(self, query: str) -> Optional[List[array]]:
+        """Return the posting lists of a lowercased query's trigrams, shortest first, or None if one is empty"""
+        if self.postings is None:
+            self._build()
+        postings = []
+        for gram in trigrams(query):
+            posting = self.postings.get(gram)
+            if posting is None:
+                return None
+            postings.append(posting)
+        postings.sort(key=len)
+        return postings
+    
+    def scans(self, query: str) -> bool:
+        """Check whether searching for a lowercased query checks every record"""
+        postings = self._postings(query)
+        return postings is not None and (not postings or len(postings[0]) > SCAN_FRACTION * len(self.collection))
+    
+    def search(self, query: str) -> List[Dict]:
+        """Return the records whose fields contain ``query``, ignoring case
+        
+        Queries shorter than a trigram, and queries so common that most
+        records match, fall back to checking every record.
+        """
+        query = query.lower()
+        by_id = self.collection.by_id
+        postings = self._postings(query)
+        if postings is None:
+            return []
+        if not postings or len(postings[0]) > SCAN_FRACTION * len(by_id):
+            return [record for record in by_id.values() if self.matches(record, query)]
+        
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates or len(posting) > CANDIDATE_RATIO * len(candidates):
+                break
+            candidates.intersection_update(posting)
+        
+        records = []
+        for record_id in candidates:
+            record = by_id.get(record_id)
+            if record is not None and self.matches(record, query):
+                records.append(record)
+        return records
+
+
+class ProductSearch(TrigramIndex):
+    """Substring search over product names"""
+    fields = ('name',)
+
+
+class CustomerSearch(TrigramIndex):
+    """Substring search over customer names and emails"""
+    fields = ('name', 'email')
+
+
+class SortedIndex(CollectionIndex):
+    """The collection's (sort key, id) entries kept in order for each sort key
+    
+    Each order is built by the first query that needs it and from then on
+    maintained with ``insort`` and a bisected delete, so sorted listings,
+    keyset pages, top-k and range queries never sort the collection. Entries
+    are ordered like the tuples ``(sort key, id)``, so ties fall to the lower id.
+    """
+    
+    sort_keys: Dict[str, Callable[[Dict], Any]] = {}
+    
+    def __init__(self, collection):
+        self.collection = collection
+        self._orders: Dict[str, List[Entry]] = {}
+    
+    def entries(self, sort_by: str) -> List[Entry]:
+        """Return the sorted entries for a sort key; callers must not modify them"""
+        entries = self._orders.get(sort_by)
+        if entries is None:
+            key = self.sort_keys[sort_by]
+            entries = sorted((key(record), record['id']) for record in self.collection.by_id.values())
+            # Concurrent readers may both build an order; either result is valid
+            self._orders[sort_by] = entries
+        return entries
+    
+    def warm(self):
+        for sort_by in self.sort_keys:
+            self.entries(sort_by)
+    
+    def add(self, record: Dict):
+        for sort_by, entries in self._orders.items():
+            insort(entries, (self.sort_keys[sort_by](record), record['id']))
+    
+    def discard(self, record: Dict):
+        for sort_by, entries in list(self._orders.items()):
+            entry = (self.sort_keys[sort_by](record), record['id'])
+            i = bisect_left(entries, entry)
+            if i < len(entries) and entries[i] == entry:
+                del entries[i]
+            else:
+                # Keys that do not compare, such as NaN, leave the order
+                # unsearchable; drop it and let the next query rebuild it
+                del self._orders[sort_by]
+    
+    def range(self, sort_by: str, low: Any = None, high: Any = None, limit: Optional[int] = None,
+              descending: bool = False) -> List[Entry]:
+        """Return up to ``limit`` entries with ``low <= sort key <= high``
+        
+        None leaves a bound open. Descending ranges start from the high end,
+        so a top-k query only copies k entries.
+        """
+        entries = self.entries(sort_by)
+        start = bisect_left(entries, (low,)) if low is not None else 0
+        stop = bisect_right(entries, (high, float('inf'))) if high is not None else len(entries)
+        if limit is not None:
+            if descending:
+                start = max(start, stop - limit)
+            else:
+                stop = min(stop, start + limit)
+        selected = entries[start:stop]
+        if descending:
+            selected.reverse()
+        return selected
+
+
+class ProductOrder(SortedIndex):
+    """Products ordered by each of the product sort keys"""
+    sort_keys = PRODUCT_SORT_KEYS
+
+
+class CustomerOrder(SortedIndex):
+    """Customers ordered by each of the customer sort keys"""
+    sort_keys = CUSTOMER_SORT_KEYS
+
+
+def recent_records(collection, count: int = RECENT_COUNT) -> List[Dict]:
+    """Return the last ``count`` records in file order without a full scan"""
+    recent = []
+    for record_id in reversed(collection.by_id):
+        if len(recent) == count:
+            break
+        recent.append(collection.by_id[record_id])
+    recent.reverse()
+    return recent
@@ -0,0 +1,95 @@
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock
+    fcntl = None
+
+GENERATION = struct.Struct('<Q')
+
+
+class ReadWriteLock:
+    """Many concurrent readers or a single writer, across threads and processes
+    
+    Within a process readers share the lock and writers get it exclusively,
+    with waiting writers taking priority over new readers. When ``path`` is
+    given the lock is extended to other processes with an advisory ``flock``
+    on that file: shared while any thread in this process is reading,
+    exclusive while writing.
+    
+    The lock file also stores a write generation counter. It is read whenever
+    the lock is first acquired and bumped by writers via ``bump()``, so cached
+    data can be checked for changes made by other processes without relying
+    on file timestamps.
+    """
+    
+    def __init__(self, path: str = None):
+        self.path = path if fcntl is not None else None
+        self.generation = 0
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self._fd = None
+    
+    def _acquire_file(self, operation: int):
+        """Open the lock file, flock it and read the current generation"""
+        if self.path is None:
+            return
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, operation)
+        data = os.pread(self._fd, GENERATION.size, 0)
+        self.generation = GENERATION.unpack(data)[0] if len(data) == GENERATION.size else 0
+    
+    def _release_file(self):
+        """Close the lock file, which drops the flock"""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+    
+    @contextmanager
+    def read(self):
+        """Hold the lock shared for the duration of the block"""
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            if self._readers == 0:
+                self._acquire_file(fcntl.LOCK_SH if fcntl else 0)
+            self._readers += 1
+        try:
+            yield self
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._release_file()
+                    self._cond.notify_all()
+    
+    @contextmanager
+    def write(self):
+        """Hold the lock exclusively for the duration of the block"""
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        try:
+            self._acquire_file(fcntl.LOCK_EX if fcntl else 0)
+            yield self
+        finally:
+            self._release_file()
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+    
+    def bump(self):
+        """Record a write; only valid while holding the lock for writing"""
+        self.generation += 1
+        if self._fd is not None:
+            os.pwrite(self._fd, GENERATION.pack(self.generation), 0)
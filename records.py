@@ -0,0 +1,111 @@
+from typing import Any, Dict, Optional, Tuple
+
+
+class IncompleteRecord(ValueError):
+    """A stored record lacks one of the fields its type requires"""
+
+
+class Record:
+    """Base of the compact records a Collection keeps in memory
+    
+    A subclass declares its ``fields`` as ``__slots__``, so each record is one
+    small fixed-size object instead of a dict with its own hash table. Fields
+    read as ``record['name']`` as well as ``record.name``, so indexes and sort
+    keys accept either form. Records are never changed once stored; an update
+    replaces the whole record. ``to_dict`` builds the dict the API hands out.
+    
+    Any other fields a stored record carries are kept in ``extra`` (None when
+    there are none) and written back by ``to_dict``, so they survive writes.
+    A record missing one of ``fields`` raises ``IncompleteRecord``.
+    """
+    
+    __slots__ = ()
+    fields: Tuple[str, ...] = ()
+    extra: Optional[Dict[str, Any]]
+    
+    # record['name'] is a plain attribute read
+    __getitem__ = object.__getattribute__
+    
+    def keys(self) -> Tuple[str, ...]:
+        return self.fields
+    
+    def to_dict(self) -> Dict[str, Any]:
+        record = {field: getattr(self, field) for field in self.fields}
+        if self.extra:
+            record.update(self.extra)
+        return record
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Record':
+        try:
+            return cls(*(data[field] for field in cls.fields), cls.extra_fields(data))
+        except KeyError as e:
+            raise cls.incomplete(data, e) from None
+    
+    @classmethod
+    def extra_fields(cls, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the fields of a record dict beyond ``fields``, or None"""
+        if len(data) <= len(cls.fields):
+            return None
+        return {key: value for key, value in data.items() if key not in cls.fields} or None
+    
+    @classmethod
+    def incomplete(cls, data: Dict[str, Any], error: KeyError) -> IncompleteRecord:
+        return IncompleteRecord(f"{cls.__name__} {data.get('id')!r} has no {error.args[0]!r} field")
+    
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class Product(Record):
+    """A product as stored in memory"""
+    
+    fields = ('id', 'name', 'price', 'stock')
+    __slots__ = fields + ('extra',)
+    
+    def __init__(self, id: int, name: str, price: float, stock: int, extra: Optional[Dict[str, Any]] = None):
+        self.id = id
+        self.name = name
+        self.price = price
+        self.stock = stock
+        self.extra = extra
+    
+    def to_dict(self) -> Dict[str, Any]:
+        product = {'id': self.id, 'name': self.name, 'price': self.price, 'stock': self.stock}
+        if self.extra:
+            product.update(self.extra)
+        return product
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Product':
+        try:
+            return cls(data['id'], data['name'], data['price'], data['stock'], cls.extra_fields(data))
+        except KeyError as e:
+            raise cls.incomplete(data, e) from None
+
+
+class Customer(Record):
+    """A customer as stored in memory"""
+    
+    fields = ('id', 'name', 'email', 'phone')
+    __slots__ = fields + ('extra',)
+    
+    def __init__(self, id: int, name: str, email: str, phone: str, extra: Optional[Dict[str, Any]] = None):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.phone = phone
+        self.extra = extra
+    
+    def to_dict(self) -> Dict[str, Any]:
+        customer = {'id': self.id, 'name': self.name, 'email': self.email, 'phone': self.phone}
+        if self.extra:
+            customer.update(self.extra)
+        return customer
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Customer':
+        try:
+            return cls(data['id'], data['name'], data['email'], data['phone'], cls.extra_fields(data))
+        except KeyError as e:
+            raise cls.incomplete(data, e) from None
@@ -1,6 +1,9 @@
 class ReportsApp {
     constructor() {
         this.apiBase = '';
+        this.etagCache = new Map();
+        this.etagCacheSize = 100;
+        this.reportRows = 1000;
         this.init();
     }
 
@@ -11,27 +14,66 @@ class ReportsApp {
 
     async apiRequest(endpoint, options = {}) {
         try {
+            // Revalidate GETs we have seen before; a 304 reuses the parsed copy
+            const method = (options.method || 'GET').toUpperCase();
+            const cached = method === 'GET' ? this.etagCache.get(endpoint) : undefined;
             const response = await fetch(`${this.apiBase}${endpoint}`, {
+                ...options,
                 headers: {
                     'Content-Type': 'application/json',
+                    ...(cached ? { 'If-None-Match': cached.etag } : {}),
                     ...options.headers
-                },
-                ...options
+                }
             });
 
+            if (response.status === 304 && cached) {
+                return cached.data;
+            }
+
             if (!response.ok) {
                 const error = await response.json();
                 throw new Error(error.error || 'Request failed');
             }
 
-            return await response.json();
+            const data = await response.json();
+            const etag = response.headers.get('ETag');
+            if (method === 'GET' && etag) {
+                this.rememberResponse(endpoint, etag, data);
+            }
+            return data;
         } catch (error) {
             console.error('API request failed:', error);
             throw error;
         }
     }
+
+    // Keep the most recent ETagged responses, dropping the oldest first
+    rememberResponse(endpoint, etag, data) {
+        this.etagCache.delete(endpoint);
+        this.etagCache.set(endpoint, { etag, data });
+        if (this.etagCache.size > this.etagCacheSize) {
+            this.etagCache.delete(this.etagCache.keys().next().value);
+        }
+    }
+
+    // Fetch a server-built report: the first reportRows rows plus totals
+    async fetchReport(endpoint, params = {}) {
+        const query = new URLSearchParams({ ...params, limit: this.reportRows });
+        return this.apiRequest(`${endpoint}?${query}`);
+    }
+}
+
+// Note shown under a report table when only the first rows were returned
+function shownRowsNote(shown, total) {
+    return shown < total ? `<p class="text-muted">Showing the first ${shown} of ${total} rows.</p>` : '';
 }
 
+const STOCK_BADGES = {
+    low: '<span class="badge bg-danger">Low Stock</span>',
+    medium: '<span class="badge bg-warning">Medium Stock</span>',
+    high: '<span class="badge bg-success">Good Stock</span>'
+};
+
 // Initialize the reports app
 document.addEventListener('DOMContentLoaded', () => {
     window.reportsApp = new ReportsApp();
@@ -43,28 +85,9 @@ async function generateInventoryReport() {
         const sortBy = document.getElementById('sortBy').value;
         const filterStock = document.getElementById('filterStock').value;
         
-        const products = await reportsApp.apiRequest('/api/products');
-        
-        // Filter products based on stock level
-        let filteredProducts = products;
-        if (filterStock === 'low') {
-            filteredProducts = products.filter(p => p.stock <= 5);
-        } else if (filterStock === 'medium') {
-            filteredProducts = products.filter(p => p.stock > 5 && p.stock <= 20);
-        } else if (filterStock === 'high') {
-            filteredProducts = products.filter(p => p.stock > 20);
-        }
-
-        // Sort products
-        filteredProducts.sort((a, b) => {
-            if (sortBy === 'price') {
-                return a.price - b.price;
-            } else if (sortBy === 'stock') {
-                return a.stock - b.stock;
-            } else {
-                return a.name.localeCompare(b.name);
-            }
-        });
+        // Banding, sorting, row values and totals are computed on the server
+        const report = await reportsApp.fetchReport('/api/reports/inventory', { stock: filterStock, sort: sortBy });
+        const products = report.items;
 
         // Generate report HTML
         const reportHtml = `
@@ -80,29 +103,23 @@ async function generateInventoryReport() {
                         </tr>
                     </thead>
                     <tbody>
-                        ${filteredProducts.map(product => `
+                        ${products.map(product => `
                             <tr>
                                 <td>${product.name}</td>
                                 <td>€${product.price.toFixed(2)}</td>
                                 <td>${product.stock}</td>
-                                <td>€${(product.price * product.stock).toFixed(2)}</td>
-                                <td>
-                                    ${product.stock <= 5 ? 
-                                        '<span class="badge bg-danger">Low Stock</span>' : 
-                                        product.stock <= 20 ? 
-                                        '<span class="badge bg-warning">Medium Stock</span>' : 
-                                        '<span class="badge bg-success">Good Stock</span>'
-                                    }
-                                </td>
+                                <td>€${product.value.toFixed(2)}</td>
+                                <td>${STOCK_BADGES[product.status]}</td>
                             </tr>
                         `).join('')}
                     </tbody>
                 </table>
                 </div>
+            ${shownRowsNote(products.length, report.summary.total_items)}
             <div class="mt-3">
                 <h6>Summary:</h6>
-                <p><strong>Total Items:</strong> ${filteredProducts.length}</p>
-                <p><strong>Total Value:</strong> €${filteredProducts.reduce((sum, p) => sum + (p.price * p.stock), 0).toFixed(2)}</p>
+                <p><strong>Total Items:</strong> ${report.summary.total_items}</p>
+                <p><strong>Total Value:</strong> €${report.summary.total_value.toFixed(2)}</p>
             </div>
         `;
 
@@ -117,26 +134,9 @@ async function generateCustomerReport() {
         const searchTerm = document.getElementById('searchCustomer').value.toLowerCase();
         const sortBy = document.getElementById('sortCustomers').value;
         
-        let customers = await reportsApp.apiRequest('/api/customers');
-        
-        // Filter customers based on search
-        if (searchTerm) {
-            customers = customers.filter(c => 
-                c.name.toLowerCase().includes(searchTerm) || 
-                c.email.toLowerCase().includes(searchTerm)
-            );
-        }
-
-        // Sort customers
-        customers.sort((a, b) => {
-            if (sortBy === 'email') {
-                return a.email.localeCompare(b.email);
-            } else if (sortBy === 'phone') {
-                return a.phone.localeCompare(b.phone);
-            } else {
-                return a.name.localeCompare(b.name);
-            }
-        });
+        // Filtering, sorting and domain counts happen on the server
+        const report = await reportsApp.fetchReport('/api/reports/customers', { q: searchTerm, sort: sortBy });
+        const customers = report.items;
 
         // Generate report HTML
         const reportHtml = `
@@ -158,16 +158,17 @@ async function generateCustomerReport() {
                                 <td>${customer.name}</td>
                                 <td>${customer.email}</td>
                                 <td>${customer.phone}</td>
-                                <td>${customer.email.split('@')[1]}</td>
+                                <td>${customer.domain}</td>
                             </tr>
                         `).join('')}
                     </tbody>
                 </table>
             </div>
+            ${shownRowsNote(customers.length, report.summary.total_customers)}
             <div class="mt-3">
                 <h6>Summary:</h6>
-                <p><strong>Total Customers:</strong> ${customers.length}</p>
-                <p><strong>Unique Domains:</strong> ${new Set(customers.map(c => c.email.split('@')[1])).size}</p>
+                <p><strong>Total Customers:</strong> ${report.summary.total_customers}</p>
+                <p><strong>Unique Domains:</strong> ${report.summary.unique_domains}</p>
             </div>
         `;
 
@@ -0,0 +1,96 @@
+from typing import Dict, Optional
+
+from indexes import LOW_STOCK_THRESHOLD, PRODUCT_SORT_KEYS
+
+# Inclusive (low, high) stock bounds of each inventory report band; None is open
+STOCK_BANDS = {
+    'low': (None, LOW_STOCK_THRESHOLD),
+    'medium': (LOW_STOCK_THRESHOLD + 1, 20),
+    'high': (21, None),
+}
+
+
+def stock_status(stock: int) -> str:
+    """Return the name of the stock band a stock level falls in"""
+    for band, (low, high) in STOCK_BANDS.items():
+        if (low is None or stock >= low) and (high is None or stock <= high):
+            return band
+    return 'high'
+
+
+def inventory_report(store, stock_band: str = 'all', sort_by: str = 'name', limit: Optional[int] = None,
+                     offset: int = 0) -> Dict:
+    """Build the inventory report for one stock band
+    
+    ``store`` is a DataManager or SQLiteDataManager. The summary covers the
+    whole band and comes from the store's band totals, while ``items`` holds
+    the requested slice of rows, each with its stock value and status. Rows
+    are read with range queries, so a slice in stock order, or of the whole
+    catalogue, only reads the rows up to its end.
+    """
+    sort_by = sort_by if sort_by in PRODUCT_SORT_KEYS else 'name'
+    low, high = STOCK_BANDS.get(stock_band, (None, None))
+    count, _, value = store.stock_band_totals({stock_band: (low, high)})[stock_band]
+    
+    end = None if limit is None else offset + limit
+    if stock_band == 'all':
+        products = store.range_products(sort_by, limit=end)
+    elif sort_by == 'stock':
+        products = store.range_products('stock', low, high, limit=end)
+    else:
+        products = store.range_products('stock', low, high)
+        sort_key = PRODUCT_SORT_KEYS[sort_by]
+        products.sort(key=lambda p: (sort_key(p), p['id']))
+    
+    return {
+        'items': [
+            dict(product, value=round(product['price'] * product['stock'], 2),
+                 status=stock_status(product['stock']))
+            for product in products[offset:end]
+        ],
+        'summary': {
+            'total_items': count,
+            'total_value': round(value, 2),
+        },
+    }
+
+
+def stock_band_report(store) -> Dict:
+    """Break the catalogue down by stock band
+    
+    Each band gets its product count, stock value and average price, plus
+    the same totals for the whole catalogue.
+    """
+    bands = dict(STOCK_BANDS, all=(None, None))
+    totals = store.stock_band_totals(bands)
+    rows = [
+        {
+            'band': name,
+            'min_stock': low,
+            'max_stock': high,
+            'count': totals[name][0],
+            'total_value': round(totals[name][2], 2),
+            'average_price': round(totals[name][1] / totals[name][0], 2) if totals[name][0] else 0,
+        }
+        for name, (low, high) in bands.items()
+    ]
+    return {'bands': rows[:-1], 'total': rows[-1]}
+
+
+def customer_report(store, query: str = '', sort_by: str = 'name', limit: Optional[int] = None,
+                    offset: int = 0) -> Dict:
+    """Build the customer report for a search, as for ``inventory_report``
+    
+    Each row carries the customer's email domain; the summary counts the
+    matching customers and their distinct domains.
+    """
+    customers = store.search_customers(query, sort_by)
+    end = None if limit is None else offset + limit
+    return {
+        'items': [dict(customer, domain=customer['email'].partition('@')[2])
+                  for customer in customers[offset:end]],
+        'summary': {
+            'total_customers': len(customers),
+            'unique_domains': len({c['email'].partition('@')[2] for c in customers}),
+        },
+    }
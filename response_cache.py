@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class ResponseCache:
+    """Bounded LRU cache of serialized response bodies
+    
+    Each entry remembers the collection versions it was built from. A lookup
+    made with different versions evicts the entry as stale, so nothing built
+    from older data is ever served. Bodies larger than ``max_body`` bytes are
+    not stored, so full-catalogue responses cannot pin the memory.
+    """
+    
+    def __init__(self, max_entries: int = 256, max_body: int = 1 << 20):
+        self.max_entries = max_entries
+        self.max_body = max_body
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, key: Hashable, versions: Any) -> Optional[bytes]:
+        """Return the cached body for key if it was built from these versions"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != versions:
+                del self._entries[key]
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, key: Hashable, versions: Any, body: bytes):
+        """Store a body, evicting the least recently used entries beyond the limit"""
+        if len(body) > self.max_body or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (versions, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+    
+    def stats(self) -> Dict[str, int]:
+        """Return the size, limits and hit/miss/eviction counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': sum(len(body) for _, body in self._entries.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,176 @@
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from array import array
+from fractions import Fraction
+from math import isnan
+from operator import attrgetter, itemgetter, mul, neg
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from indexes import LOW_STOCK_THRESHOLD, exact_sum
+
+# Collections smaller than this are scanned inline: shipping them to worker
+# processes costs more than the scan saves
+SCAN_THRESHOLD = 200000
+
+# The product fields the summary aggregates are computed from
+PRODUCT_TOTAL_FIELDS = ('id', 'price', 'stock')
+
+
+class ScanExecutor:
+    """Runs full scans over chunks of a collection in worker processes
+    
+    A scan function takes a list of columns, one per field, and returns a
+    partial result; the caller merges the partials. Columns are sent to the
+    workers packed (see ``pack_column``), which pickles far faster than the
+    records themselves. Collections below ``threshold`` records, or any
+    collection when there is only one worker, are scanned inline in a single
+    chunk. The pool uses the spawn start method, so it is safe to start from
+    a threaded server, and is only started by the first scan that needs it.
+    
+    A spawned worker runs the parent's main module again before its first
+    task. For the app's entry points that would build a store, with its
+    file locks and compaction, in every worker, so workers are started with
+    this module standing in as the main one and import nothing else.
+    """
+    
+    def __init__(self, workers: Optional[int] = None, threshold: int = SCAN_THRESHOLD):
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.threshold = threshold
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+    
+    def parallel(self, size: int) -> bool:
+        """Check whether a scan over ``size`` records goes to the workers"""
+        return self.workers > 1 and size >= self.threshold
+    
+    def map(self, func: Callable[..., Any], items: List[Any], *args: Any) -> List[Any]:
+        """Return ``[func(item, *args) for item in items]``, in the workers when there are several items"""
+        if len(items) < 2 or self.workers < 2:
+            return [func(item, *args) for item in items]
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            # The pool spawns workers as tasks are submitted, which map does before returning
+            with scans_as_main():
+                results = self._pool.map(func, items, *([arg] * len(items) for arg in args))
+        return list(results)
+    
+    def scan(self, func: Callable[..., Any], collection, fields: Tuple[str, ...], *args: Any) -> List[Any]:
+        """Apply ``func(columns, *args)`` to chunks of a collection's ``fields`` and return the partial results"""
+        # Compact records are read by attribute, which is much faster than by key
+        getter = attrgetter if collection.record_type else itemgetter
+        records = collection.by_id.values()
+        columns = [list(map(getter(field), records)) for field in fields]
+        if not self.parallel(len(records)):
+            return [func(columns, *args)]
+        # Two chunks per worker evens out the load without much per-chunk overhead
+        chunk_size = -(-len(records) // (self.workers * 2))
+        return self.map(func, [[pack_column(column[i:i + chunk_size]) for column in columns]
+                               for i in range(0, len(records), chunk_size)], *args)
+    
+    def shutdown(self):
+        """Stop the worker processes, if any were started"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+@contextmanager
+def scans_as_main():
+    """Make this module ``__main__`` while workers are spawned, so they run it instead of the entry point"""
+    main = sys.modules['__main__']
+    sys.modules['__main__'] = sys.modules[__name__]
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = main
+
+
+def pack_column(values: List[Any]) -> Union[bytes, array, List[Any]]:
+    """Encode a column for a worker as one buffer where possible
+    
+    Strings become a single NUL-separated UTF-8 string and numbers an array,
+    both of which pickle as raw bytes; anything else is sent as it is.
+    """
+    if values and isinstance(values[0], str):
+        joined = '\0'.join(values)
+        # A value holding a NUL itself would not split back apart
+        return joined.encode() if joined.count('\0') == len(values) - 1 else values
+    try:
+        return array('q', values)
+    except (TypeError, OverflowError):
+        pass
+    try:
+        packed = array('d', values)
+    except TypeError:
+        return values
+    # Ints too large for a double must stay exact
+    return packed if packed.tolist() == values else values
+
+
+def unpack_column(column: Union[bytes, array, List[Any]]) -> Sequence[Any]:
+    """Reverse ``pack_column``; unpacked columns are returned as they are"""
+    if isinstance(column, bytes):
+        return column.decode().split('\0')
+    return column
+
+
+def match_columns(columns: List[Sequence], query: str) -> List[int]:
+    """Return, in order, the ids (first column) of records with any text column containing the lowercased query"""
+    ids, *texts = map(unpack_column, columns)
+    hits: Set[int] = set()
+    for column in texts:
+        hits.update(i for i, text in enumerate(column) if query in text.lower())
+    return [ids[i] for i in sorted(hits)]
+
+
+def summarize_products(columns: List[Sequence]) -> Dict:
+    """Partial summary aggregates over id, price and stock columns"""
+    ids, prices, stocks = map(unpack_column, columns)
+    if not ids:
+        return {'count': 0}
+    ranked_prices, ranked_ids = prices, ids
+    if any(map(isnan, prices)):
+        # NaN prices have no order, so they are never the cheapest or dearest
+        kept = [i for i, price in enumerate(prices) if not isnan(price)]
+        ranked_prices, ranked_ids = [prices[i] for i in kept], [ids[i] for i in kept]
+    return {
+        'count': len(ids),
+        'low_stock': sum(1 for stock in stocks if stock <= LOW_STOCK_THRESHOLD),
+        'price_sum': exact_sum(prices),
+        'value_sum': exact_sum(map(mul, prices, stocks)),
+        # Ties fall to the lowest id, as in ProductStats
+        'cheapest': min(zip(ranked_prices, ranked_ids), default=None),
+        'dearest': min(zip(map(neg, ranked_prices), ranked_ids), default=None),
+    }
+
+
+class ProductTotals:
+    """Summary aggregates merged from partial scans, read like ``ProductStats``
+    
+    ``records`` maps ids to records and must hold at least the cheapest and
+    most expensive products.
+    """
+    
+    def __init__(self, partials: Iterable[Dict], records: Dict[int, Any]):
+        parts = [partial for partial in partials if partial['count']]
+        self.records = records
+        self.count = sum(partial['count'] for partial in parts)
+        self.low_stock = sum(partial['low_stock'] for partial in parts)
+        self.price_sum = sum((partial['price_sum'] for partial in parts), Fraction(0))
+        self.value_sum = sum((partial['value_sum'] for partial in parts), Fraction(0))
+        self._cheapest = min((partial['cheapest'] for partial in parts if partial['cheapest']), default=None)
+        self._dearest = min((partial['dearest'] for partial in parts if partial['dearest']), default=None)
+    
+    def cheapest(self) -> Optional[Any]:
+        """Return the cheapest product, lowest id first on ties"""
+        return self._cheapest and self.records[self._cheapest[1]]
+    
+    def most_expensive(self) -> Optional[Any]:
+        """Return the most expensive product, lowest id first on ties"""
+        return self._dearest and self.records[self._dearest[1]]
@@ -0,0 +1,135 @@
+"""Production entry point: pre-forked workers sharing a preloaded catalogue
+
+Usage: python serve.py [--workers N] [--host 0.0.0.0] [--port 5000] [--no-preload]
+
+The master process imports the app, loads both collections and builds their
+indexes, then opens the listening socket and forks the workers (one per core
+by default). Workers inherit the loaded catalogue copy-on-write instead of
+each parsing the files, and accept connections from the shared socket. Writes
+go through the storage layer's file locks, so a change made by one worker is
+seen by the others on their next read. The master restarts workers that die,
+waiting longer after each death within ``RESTART_WINDOW`` seconds, and gives
+up after ``MAX_RESTARTS`` of them, so a worker that fails on startup does not
+fork in a loop. It stops them all on SIGTERM or Ctrl-C. Startup time and each
+worker's resident (RSS) and proportional (PSS) memory are logged once they are
+up.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+from werkzeug.serving import make_server
+
+# Worker deaths within this many seconds count together; past MAX_RESTARTS of
+# them the master gives up, and each restart waits twice as long as the last
+RESTART_WINDOW = 60
+MAX_RESTARTS = 5
+RESTART_DELAY = 0.5
+MAX_RESTART_DELAY = 30
+
+
+def memory_kib(pid, field):
+    """Return a memory figure such as 'Rss' or 'Pss' of a process in KiB, or None"""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def run_worker(app, listener):
+    """Serve requests from the inherited socket until terminated"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    host, port = listener.getsockname()[:2]
+    server = make_server(host, port, app, threaded=True, fd=listener.fileno())
+    server.serve_forever()
+
+
+def spawn(app, listener):
+    """Fork one worker and return its pid"""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(app, listener)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get("PORT", "5000")))
+    parser.add_argument('--no-preload', action='store_true',
+                        help='let each worker load the catalogue on its first request')
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    from app import app, data_manager
+    if not args.no_preload:
+        data_manager.warm()
+    # Keep the collector from touching, and so copying, every preloaded object
+    gc.freeze()
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    loaded = time.perf_counter()
+    
+    listener = socket.create_server((args.host, args.port), backlog=2048)
+    workers = {spawn(app, listener) for _ in range(args.workers)}
+    logging.info(f"Preloaded in {loaded - start:.2f}s, {len(workers)} workers forked in "
+                 f"{(time.perf_counter() - loaded) * 1000:.0f}ms, serving on {args.host}:{args.port}")
+    time.sleep(0.5)
+    for pid in sorted(workers):
+        logging.info(f"Worker {pid}: RSS {memory_kib(pid, 'Rss')} KiB, PSS {memory_kib(pid, 'Pss')} KiB")
+    
+    stopping = False
+    deaths = []
+    
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        workers.discard(pid)
+        if stopping:
+            continue
+        now = time.monotonic()
+        deaths = [death for death in deaths if death > now - RESTART_WINDOW] + [now]
+        if len(deaths) > MAX_RESTARTS:
+            logging.error(f"Worker {pid} exited with status {status}; {len(deaths)} workers died within "
+                          f"{RESTART_WINDOW}s, so stopping")
+            stop(None, None)
+            continue
+        delay = min(RESTART_DELAY * 2 ** (len(deaths) - 1), MAX_RESTART_DELAY)
+        logging.error(f"Worker {pid} exited with status {status}, restarting it in {delay:g}s")
+        # Sleep in steps so a SIGTERM during the wait stops the master promptly
+        until = now + delay
+        while not stopping and time.monotonic() < until:
+            time.sleep(max(0, min(0.1, until - time.monotonic())))
+        if not stopping:
+            workers.add(spawn(app, listener))
+    return 1 if len(deaths) > MAX_RESTARTS else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from indexes import RECENT_COUNT
+from scans import PRODUCT_TOTAL_FIELDS, ProductTotals, summarize_products
+
+MANIFEST_NAME = 'manifest.json'
+
+
+class ShardLayout:
+    """Where the shard files of one collection live and which ids each holds
+    
+    ``products.json`` is stored as the directory ``products.shards`` with
+    one ``<key>.json`` array per non-empty range of ``shard_size`` ids, where
+    ``key = id // shard_size``, and a ``manifest.json`` recording the shard
+    size and the next id to hand out. A write only replaces the shards it
+    touched, and a single record is found without reading any other shard.
+    Shards are written before the manifest, so the files present are the
+    truth about which shards exist; a crash in between can only leave
+    ``next_id`` behind, and loading a shard never hands out an id it holds.
+    """
+    
+    def __init__(self, filename: str, shard_size: int):
+        self.shard_size = shard_size
+        self.directory = os.path.splitext(filename)[0] + '.shards'
+        self.manifest_path = os.path.join(self.directory, MANIFEST_NAME)
+    
+    def key(self, record_id: int) -> int:
+        """Return the key of the shard holding an id"""
+        return record_id // self.shard_size
+    
+    def ids(self, key: int) -> range:
+        """Return the ids a shard can hold"""
+        return range(key * self.shard_size, (key + 1) * self.shard_size)
+    
+    def path(self, key: int) -> str:
+        """Return the file of one shard"""
+        return os.path.join(self.directory, f'{key:06d}.json')
+    
+    def keys(self) -> List[int]:
+        """Return the keys of the shard files present, in order"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[:-5]) for name in names if name.endswith('.json') and name[:-5].isdigit())
+    
+    def read_manifest(self) -> Optional[Dict]:
+        """Return the manifest, or None if the collection has not been sharded"""
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+def read_shard(path: str) -> List[Dict]:
+    """Read one shard file; a missing shard is empty"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+# Partial results of scans run on one shard each, in a worker process
+
+def summarize_shard(path: str, products: bool) -> Dict:
+    """Count a shard's records and keep its last ones; partial totals too for products"""
+    records = read_shard(path)
+    summary = {'count': len(records), 'recent': records[-RECENT_COUNT:]}
+    if products:
+        summary['totals'] = totals = summarize_products(
+            [[p[field] for p in records] for field in PRODUCT_TOTAL_FIELDS])
+        # The parent holds no records, so send along the two extremes
+        ids = {totals[key][1] for key in ('cheapest', 'dearest') if totals.get(key)}
+        summary['extremes'] = {p['id']: p for p in records if p['id'] in ids}
+    return summary
+
+
+def merge_summaries(summaries: List[Dict]) -> Tuple[int, List[Dict], ProductTotals]:
+    """Combine shard summaries, given in shard order, into (count, recent records, product totals)"""
+    count = sum(s['count'] for s in summaries)
+    recent = [record for s in summaries for record in s['recent']][-RECENT_COUNT:]
+    extremes = {record_id: record for s in summaries for record_id, record in s.get('extremes', {}).items()}
+    return count, recent, ProductTotals((s['totals'] for s in summaries if 'totals' in s), extremes)
+
+
+def match_shard(path: str, search_type: type, query: str) -> List[Dict]:
+    """Return the records of a shard matching a lowercased search query"""
+    return [record for record in read_shard(path) if search_type.matches(record, query)]
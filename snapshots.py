@@ -0,0 +1,304 @@
+"""Binary snapshot files read through mmap, one record decoded at a time
+
+A snapshot holds one collection column by column::
+    
+    magic (8 bytes) | header length (uint64) | header JSON | sections...
+
+The header gives the record ``count``, the ``next_id``, each field's name and
+kind, and the ``[offset, length]`` of every section, each 8-byte aligned:
+
+- ``int`` fields: an int64 array.
+- ``number`` fields: a float64 array, plus a ``<field>.int`` byte per record
+  marking values that were ints, so they come back as ints.
+- ``str`` fields (and ``json``, for values of any other type, JSON encoded):
+  a ``<field>.offsets`` uint64 array of ``count + 1`` offsets into the UTF-8
+  ``<field>.heap``.
+- ``order.ids`` and ``order.positions``: the ids sorted, with the position of
+  each, so a record is found by bisection.
+- ``@extra``, when the header's ``extra`` is set: a ``json`` column holding
+  each record's fields beyond those listed, or null.
+
+Opening a snapshot maps the file and parses only the header, whatever its
+size. Arrays are in the byte order of the machine that wrote them.
+
+Usage: python snapshots.py products.json products.snap (or the reverse)
+"""
+import json
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from collections.abc import MutableMapping, ValuesView
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+MAGIC = b'EMSNAP\x00\x01'
+SNAPSHOT_SUFFIX = '.snap'
+
+# The native arrays are read back with memoryview.cast
+TYPECODES = {'int': 'q', 'number': 'd'}
+
+# The column of fields some records have beyond the snapshot's fields
+EXTRA = '@extra'
+
+
+def column_kind(values: List[Any]) -> str:
+    """Pick the narrowest kind that stores every value of a column exactly"""
+    if all(type(value) is int for value in values):
+        try:
+            array('q', values)
+            return 'int'
+        except OverflowError:
+            return 'json'
+    if all(type(value) in (int, float) for value in values):
+        # Ints too large for a double must stay exact
+        return 'number' if array('d', values).tolist() == values else 'json'
+    if all(type(value) is str for value in values):
+        return 'str'
+    return 'json'
+
+
+def encode_column(name: str, kind: str, values: List[Any]) -> List[Tuple[str, bytes]]:
+    """Return the (section name, bytes) of one column"""
+    if kind in ('int', 'number'):
+        sections = [(name, array(TYPECODES[kind], values).tobytes())]
+        if kind == 'number':
+            sections.append((f'{name}.int', bytes(type(value) is int for value in values)))
+        return sections
+    encode = str.encode if kind == 'str' else lambda value: json.dumps(value).encode()
+    encoded = [encode(value) for value in values]
+    offsets = array('Q', [0])
+    offsets.extend(accumulate(map(len, encoded)))
+    return [(f'{name}.offsets', offsets.tobytes()), (f'{name}.heap', b''.join(encoded))]
+
+
+def write_snapshot(f: IO[bytes], records: Iterable[Dict], fields: Sequence[str], next_id: Optional[int] = None):
+    """Write records, which all have the given fields and maybe others, to a binary file as a snapshot"""
+    records = list(records)
+    columns = {field: [record[field] for record in records] for field in fields}
+    kinds = {field: column_kind(values) for field, values in columns.items()}
+    sections = [section for field in fields for section in encode_column(field, kinds[field], columns[field])]
+    extras = [{key: value for key, value in record.items() if key not in fields} or None
+              if len(record) > len(fields) else None for record in records]
+    if any(extras):
+        sections.extend(encode_column(EXTRA, 'json', extras))
+    if 'id' in columns:
+        order = sorted(range(len(records)), key=columns['id'].__getitem__)
+        sections.append(('order.ids', array('q', (columns['id'][i] for i in order)).tobytes()))
+        sections.append(('order.positions', array('q', order).tobytes()))
+        next_id = max(next_id or 0, max(columns['id'], default=0) + 1)
+    
+    layout, offset = {}, 0
+    for name, data in sections:
+        layout[name] = [offset, len(data)]
+        offset += -(-len(data) // 8) * 8
+    # Section offsets count from the end of the header, whose length depends
+    # on them, so grow the header until its padded length stops changing
+    start = 0
+    while True:
+        header = {'count': len(records), 'next_id': next_id, 'byteorder': sys.byteorder,
+                  'fields': [[field, kinds[field]] for field in fields], 'extra': any(extras),
+                  'sections': {name: [start + offset, length] for name, (offset, length) in layout.items()}}
+        encoded = json.dumps(header).encode()
+        end = -(-(len(MAGIC) + 8 + len(encoded)) // 8) * 8
+        if end <= start:
+            break
+        start = end
+    encoded = encoded.ljust(start - len(MAGIC) - 8)
+    
+    f.write(MAGIC + struct.pack('<Q', len(encoded)) + encoded)
+    for name, data in sections:
+        f.write(data + bytes(-len(data) % 8))
+
+
+class Snapshot:
+    """A snapshot file mapped into memory, decoding records as they are read"""
+    
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a snapshot")
+        (length,) = struct.unpack_from('<Q', self._map, len(MAGIC))
+        header = json.loads(self._map[len(MAGIC) + 8:len(MAGIC) + 8 + length])
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError(f"{path} was written on a {header['byteorder']}-endian machine")
+        self.count: int = header['count']
+        self.next_id: Optional[int] = header['next_id']
+        self.fields: Tuple[str, ...] = tuple(field for field, _ in header['fields'])
+        self._sections = header['sections']
+        self.extra: bool = header.get('extra', False)
+        self._readers = [self._reader(field, kind) for field, kind in header['fields']]
+        if self.extra:
+            self._readers.append(self._reader(EXTRA, 'json'))
+        if 'order.ids' in self._sections:
+            self._ids = self._view('id', 'q')
+            self._sorted_ids = self._view('order.ids', 'q')
+            self._positions = self._view('order.positions', 'q')
+    
+    def _view(self, section: str, typecode: str) -> memoryview:
+        offset, length = self._sections[section]
+        return memoryview(self._map)[offset:offset + length].cast(typecode)
+    
+    def _reader(self, field: str, kind: str) -> Callable[[int], Any]:
+        """Return a function reading one field of the record at a position"""
+        if kind == 'int':
+            return self._view(field, 'q').__getitem__
+        if kind == 'number':
+            numbers, is_int = self._view(field, 'd'), self._view(f'{field}.int', 'B')
+            return lambda position: int(numbers[position]) if is_int[position] else numbers[position]
+        offsets = self._view(f'{field}.offsets', 'Q')
+        heap = self._sections[f'{field}.heap'][0]
+        data = self._map
+        if kind == 'str':
+            return lambda position: data[heap + offsets[position]:heap + offsets[position + 1]].decode()
+        return lambda position: json.loads(data[heap + offsets[position]:heap + offsets[position + 1]])
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def values(self, position: int) -> Tuple:
+        """Decode the field values of the record at a position, in field order
+        
+        With ``extra`` set, the record's other fields (a dict, or None) follow.
+        """
+        return tuple(read(position) for read in self._readers)
+    
+    def as_dict(self, values: Tuple) -> Dict:
+        """Build the record dict from the output of ``values``"""
+        record = dict(zip(self.fields, values))
+        if self.extra and values[-1]:
+            record.update(values[-1])
+        return record
+    
+    def id_at(self, position: int) -> int:
+        return self._ids[position]
+    
+    def position(self, record_id: int) -> Optional[int]:
+        """Return the position of the record with an id, or None"""
+        i = bisect_left(self._sorted_ids, record_id)
+        if i < self.count and self._sorted_ids[i] == record_id:
+            return self._positions[i]
+        return None
+    
+    def dicts(self) -> Iterator[Dict]:
+        """Iterate over the records as dicts, in file order"""
+        for position in range(self.count):
+            yield self.as_dict(self.values(position))
+
+
+class SnapshotRecords(MutableMapping):
+    """The ``id -> record`` mapping of a Collection loaded from a snapshot
+    
+    Records are decoded from the snapshot each time they are read. Changes
+    since it was written are kept in memory: records replaced in place,
+    snapshot ids deleted, and records added since, which iterate after the
+    snapshot's in insertion order, as they would in a dict.
+    """
+    
+    def __init__(self, snapshot: Snapshot, decode: Callable[[Tuple], Any]):
+        self.snapshot = snapshot
+        self.decode = decode
+        self.changed: Dict[int, Any] = {}
+        self.removed: Set[int] = set()
+        self.added: Dict[int, Any] = {}
+    
+    def __getitem__(self, record_id: int) -> Any:
+        if record_id in self.added:
+            return self.added[record_id]
+        if record_id in self.removed:
+            raise KeyError(record_id)
+        if record_id in self.changed:
+            return self.changed[record_id]
+        position = self.snapshot.position(record_id)
+        if position is None:
+            raise KeyError(record_id)
+        return self.decode(self.snapshot.values(position))
+    
+    def __contains__(self, record_id: object) -> bool:
+        if record_id in self.added:
+            return True
+        return record_id not in self.removed and self.snapshot.position(record_id) is not None
+    
+    def __setitem__(self, record_id: int, record: Any):
+        if record_id in self.added or record_id in self.removed or self.snapshot.position(record_id) is None:
+            self.added[record_id] = record
+        else:
+            self.changed[record_id] = record
+    
+    def __delitem__(self, record_id: int):
+        if record_id in self.added:
+            del self.added[record_id]
+        elif record_id in self.removed or self.snapshot.position(record_id) is None:
+            raise KeyError(record_id)
+        else:
+            self.removed.add(record_id)
+            self.changed.pop(record_id, None)
+    
+    def __len__(self) -> int:
+        return self.snapshot.count - len(self.removed) + len(self.added)
+    
+    def _positions(self, positions: Iterable[int]) -> Iterator[Tuple[int, int]]:
+        """Yield the (position, id) of the live snapshot records at some positions"""
+        id_at, removed = self.snapshot.id_at, self.removed
+        for position in positions:
+            record_id = id_at(position)
+            if record_id not in removed:
+                yield position, record_id
+    
+    def __iter__(self) -> Iterator[int]:
+        for _, record_id in self._positions(range(self.snapshot.count)):
+            yield record_id
+        yield from list(self.added)
+    
+    def __reversed__(self) -> Iterator[int]:
+        yield from reversed(list(self.added))
+        for _, record_id in self._positions(reversed(range(self.snapshot.count))):
+            yield record_id
+    
+    def copy(self) -> 'SnapshotRecords':
+        """Return a copy over the same snapshot, unaffected by later changes to this one"""
+        copied = SnapshotRecords(self.snapshot, self.decode)
+        copied.changed, copied.removed, copied.added = dict(self.changed), set(self.removed), dict(self.added)
+        return copied
+    
+    def values(self) -> 'SnapshotValues':
+        return SnapshotValues(self)
+    
+    def _values(self) -> Iterator[Any]:
+        """Iterate over the records in order, decoding each snapshot record once"""
+        changed, values, decode = self.changed, self.snapshot.values, self.decode
+        for position, record_id in self._positions(range(self.snapshot.count)):
+            record = changed.get(record_id)
+            yield decode(values(position)) if record is None else record
+        yield from list(self.added.values())
+
+
+class SnapshotValues(ValuesView):
+    """The records of a ``SnapshotRecords``, read in one pass over the snapshot rather than by id"""
+    
+    def __iter__(self) -> Iterator[Any]:
+        return self._mapping._values()
+
+
+def json_to_snapshot(json_path: str, snapshot_path: str):
+    """Convert a JSON array of records to a snapshot, with a column for each field every record has"""
+    with open(json_path) as f:
+        records = json.load(f)
+    fields = [field for field in records[0] if all(field in record for record in records)] if records else ['id']
+    with open(snapshot_path, 'wb') as f:
+        write_snapshot(f, records, fields)
+
+
+def snapshot_to_json(snapshot_path: str, json_path: str):
+    """Convert a snapshot back to a JSON array, laid out as the JSON store writes it"""
+    with open(json_path, 'w') as f:
+        json.dump(list(Snapshot(snapshot_path).dicts()), f, indent=2)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit(__doc__.splitlines()[-1])
+    source, target = sys.argv[1:]
+    (snapshot_to_json if source.endswith(SNAPSHOT_SUFFIX) else json_to_snapshot)(source, target)
@@ -0,0 +1,462 @@
+import json
+import os
+import logging
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Iterator, List, Dict, Optional, Tuple
+
+from changes import CHANGE_LOG_SIZE
+from data_manager import CHANGE_POLL_SECONDS, BatchRejected
+from indexes import LOW_STOCK_THRESHOLD, RECENT_COUNT
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    price REAL NOT NULL,
+    stock INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_products_name ON products (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_products_price ON products (price);
+CREATE INDEX IF NOT EXISTS idx_products_stock ON products (stock);
+
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    phone TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_customers_name ON customers (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_customers_email ON customers (email COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_customers_phone ON customers (phone);
+
+-- Per-table change counters, bumped by triggers on every write
+CREATE TABLE IF NOT EXISTS versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO versions (name, version) VALUES ('products', 0), ('customers', 0);
+
+-- The most recent row changes, one per version, for change feeds
+CREATE TABLE IF NOT EXISTS changes (
+    name TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    op TEXT NOT NULL,
+    record_id INTEGER NOT NULL,
+    PRIMARY KEY (name, version)
+);
+"""
+
+# Replaces the version-only triggers of older databases
+VERSION_TRIGGER = """
+DROP TRIGGER IF EXISTS {table}_{op}_version;
+CREATE TRIGGER IF NOT EXISTS {table}_{op}_change AFTER {event} ON {table}
+BEGIN
+    UPDATE versions SET version = version + 1 WHERE name = '{table}';
+    INSERT INTO changes (name, version, op, record_id)
+        SELECT '{table}', version, '{op}', {row}.id FROM versions WHERE name = '{table}';
+    DELETE FROM changes WHERE name = '{table}'
+        AND version <= (SELECT version FROM versions WHERE name = '{table}') - {size};
+END;
+"""
+
+# Sort expressions for each supported sort key; id is always the tiebreaker
+PRODUCT_SORTS = {
+    'id': 'id',
+    'name': 'name COLLATE NOCASE',
+    'price': 'price',
+    'stock': 'stock',
+}
+CUSTOMER_SORTS = {
+    'id': 'id',
+    'name': 'name COLLATE NOCASE',
+    'email': 'email COLLATE NOCASE',
+    'phone': 'phone',
+}
+
+
+def _like_pattern(query: str) -> str:
+    """Build a LIKE pattern matching the query as a literal substring"""
+    escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+class SQLiteDataManager:
+    """Handles CRUD operations for products and customers using SQLite
+    
+    Exposes the same methods as ``DataManager`` so the Flask app can use either
+    store. The database runs in WAL mode so readers never block the writer, and
+    each thread gets its own connection. Search and sort run in SQL.
+    """
+    
+    def __init__(self, db_file: str = 'emerald.db'):
+        self.db_file = db_file
+        self._local = threading.local()
+        # Connections must not be shared across a fork, so forked workers open their own
+        if hasattr(os, 'register_at_fork'):
+            manager = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: manager() and manager()._forget_connections())
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            for table in ('products', 'customers'):
+                for event in ('INSERT', 'UPDATE', 'DELETE'):
+                    conn.executescript(VERSION_TRIGGER.format(
+                        table=table, op=event.lower(), event=event, row='OLD' if event == 'DELETE' else 'NEW',
+                        size=CHANGE_LOG_SIZE))
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+    
+    def _forget_connections(self):
+        """Drop the connections opened before a fork"""
+        self._local = threading.local()
+    
+    def warm(self):
+        """Nothing to preload: the rows stay in SQLite and its pages in the OS cache"""
+    
+    def _query(self, sql: str, params: Tuple = ()) -> List[Dict]:
+        """Run a SELECT and return the rows as dicts"""
+        return [dict(row) for row in self._connection().execute(sql, params)]
+    
+    def _query_one(self, sql: str, params: Tuple = ()) -> Optional[Dict]:
+        """Run a SELECT and return the first row as a dict, or None"""
+        row = self._connection().execute(sql, params).fetchone()
+        return dict(row) if row else None
+    
+    def _iter_query(self, sql: str, batch_size: int = 1000) -> Iterator[Dict]:
+        """Yield the rows of a SELECT as dicts, fetching them in batches"""
+        cursor = self._connection().execute(sql)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+    
+    def _page(self, table: str, columns: str, sort: str, where: str, params: Tuple,
+              limit: int, after: Optional[Tuple]) -> Dict:
+        """Fetch one keyset page ordered by (sort expression, id)"""
+        total = self._connection().execute(
+            f'SELECT COUNT(*) FROM {table} WHERE {where}', params).fetchone()[0]
+        
+        page_where, page_params = where, params
+        if after is not None:
+            page_where = f'({where}) AND ({sort}, id) > (?, ?)'
+            page_params = params + tuple(after)
+        
+        # Fetch one extra row to learn whether another page follows
+        items = self._query(
+            f'SELECT {columns}, {sort.split()[0]} AS sort_key FROM {table} '
+            f'WHERE {page_where} ORDER BY {sort}, id LIMIT ?',
+            page_params + (limit + 1,))
+        more = len(items) > limit
+        items = items[:limit]
+        last = [items[-1]['sort_key'], items[-1]['id']] if items and more else None
+        for item in items:
+            del item['sort_key']
+        return {'items': items, 'total': total, 'next': last}
+    
+    def _range(self, table: str, columns: str, sort: str, low, high,
+               limit: Optional[int], descending: bool) -> List[Dict]:
+        """Fetch the rows with low <= sort expression <= high, in (sort, id) order"""
+        clauses, params = ['1'], []
+        if low is not None:
+            clauses.append(f'{sort} >= ?')
+            params.append(low)
+        if high is not None:
+            clauses.append(f'{sort} <= ?')
+            params.append(high)
+        direction = ' DESC' if descending else ''
+        params.append(-1 if limit is None else limit)
+        return self._query(
+            f'SELECT {columns} FROM {table} WHERE {" AND ".join(clauses)} '
+            f'ORDER BY {sort}{direction}, id{direction} LIMIT ?', tuple(params))
+    
+    def get_version(self, name: str) -> int:
+        """Return the change counter of the 'products' or 'customers' table"""
+        return self._connection().execute('SELECT version FROM versions WHERE name = ?', (name,)).fetchone()[0]
+    
+    def changes_since(self, name: str, version: int) -> Tuple[int, Optional[List[Dict]]]:
+        """Return the current version of a table and its changes after ``version``, as ``DataManager.changes_since``
+        
+        Every row write is one version, logged by the triggers that count it.
+        """
+        columns = 'id, name, price, stock' if name == 'products' else 'id, name, email, phone'
+        conn = self._connection()
+        # One read transaction, so the version and the log agree
+        with conn:
+            conn.execute('BEGIN')
+            current = self.get_version(name)
+            oldest = conn.execute('SELECT MIN(version) FROM changes WHERE name = ?', (name,)).fetchone()[0]
+            if not (version == current or (oldest is not None and oldest - 1 <= version < current)):
+                return current, None
+            rows = conn.execute(
+                f'SELECT c.version, c.op, c.record_id, {", ".join("t." + column for column in columns.split(", "))} '
+                f'FROM changes c LEFT JOIN {name} t ON t.id = c.record_id AND c.op != \'delete\' '
+                f'WHERE c.name = ? AND c.version > ? ORDER BY c.version', (name, version)).fetchall()
+        changes = []
+        for row in rows:
+            change = {'collection': name, 'op': row['op'], 'id': row['record_id'], 'version': row['version']}
+            if row['id'] is not None:
+                change['record'] = {column: row[column] for column in columns.split(', ')}
+            changes.append(change)
+        return current, changes
+    
+    def wait_for_change(self, versions: Dict[str, int], timeout: float,
+                        stop: Optional[threading.Event] = None) -> bool:
+        """Poll the version counters until one passes ``versions``, for up to ``timeout`` seconds
+        
+        Gives up early once ``stop`` is set.
+        """
+        deadline = time.monotonic() + timeout
+        while not any(self.get_version(name) > version for name, version in versions.items()):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or stop is not None and stop.is_set():
+                return False
+            time.sleep(min(remaining, CHANGE_POLL_SECONDS / 4))
+        return True
+    
+    def _apply_batch(self, table: str, columns: Tuple[str, ...], text_columns: Tuple[str, ...],
+                     operations: List[Dict]) -> List:
+        """Apply create/update/delete operations in one transaction, rolling back on a missing id"""
+        results, missing = [], []
+        select = f'SELECT id, {", ".join(columns)} FROM {table} WHERE id = ?'
+        with self._connection() as conn:
+            for index, operation in enumerate(operations):
+                values = self._values(columns, text_columns, operation)
+                if operation['op'] == 'create':
+                    cursor = conn.execute(
+                        f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" for _ in columns)})',
+                        [values[column] for column in columns])
+                    results.append({'id': cursor.lastrowid, **values})
+                    continue
+                
+                if operation['op'] == 'update':
+                    self._update(conn, table, operation['id'], values)
+                    row = conn.execute(select, (operation['id'],)).fetchone()
+                    result = dict(row) if row else None
+                else:
+                    result = conn.execute(f'DELETE FROM {table} WHERE id = ?', (operation['id'],)).rowcount > 0
+                if not result:
+                    missing.append(index)
+                results.append(result)
+            
+            if missing:
+                # Raising inside the with block rolls the transaction back
+                raise BatchRejected(missing)
+        return results
+    
+    def _values(self, columns: Tuple[str, ...], text_columns: Tuple[str, ...], fields: Dict) -> Dict:
+        """Pick the given columns out of request fields, stripping the text ones"""
+        return {column: fields[column].strip() if column in text_columns else fields[column]
+                for column in columns if column in fields}
+    
+    def _update(self, conn: sqlite3.Connection, table: str, record_id: int, values: Dict):
+        """Set columns of one row with a single UPDATE, so the triggers count it as one change"""
+        if values:
+            conn.execute(f'UPDATE {table} SET {", ".join(f"{column} = ?" for column in values)} WHERE id = ?',
+                         list(values.values()) + [record_id])
+    
+    def migrate_from_json(self, products_file: str = 'products.json',
+                          customers_file: str = 'customers.json') -> Tuple[int, int]:
+        """One-shot import of the JSON files, keeping their ids
+        
+        Does nothing for a table that already holds rows. Returns the number of
+        products and customers imported.
+        """
+        counts = []
+        with self._connection() as conn:
+            for table, filename, columns in (
+                ('products', products_file, ('id', 'name', 'price', 'stock')),
+                ('customers', customers_file, ('id', 'name', 'email', 'phone')),
+            ):
+                if conn.execute(f'SELECT 1 FROM {table} LIMIT 1').fetchone() or not os.path.exists(filename):
+                    counts.append(0)
+                    continue
+                try:
+                    with open(filename, 'r') as f:
+                        records = json.load(f)
+                except json.JSONDecodeError as e:
+                    logging.error(f"Error reading {filename}: {str(e)}")
+                    counts.append(0)
+                    continue
+                
+                placeholders = ', '.join('?' for _ in columns)
+                conn.executemany(
+                    f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders})',
+                    ([record[column] for column in columns] for record in records))
+                counts.append(len(records))
+        return counts[0], counts[1]
+    
+    # Product CRUD Operations
+    def get_all_products(self) -> List[Dict]:
+        """Get all products"""
+        return self._query('SELECT id, name, price, stock FROM products ORDER BY id')
+    
+    def iter_products(self) -> Iterator[Dict]:
+        """Iterate over all products, for streaming exports"""
+        return self._iter_query('SELECT id, name, price, stock FROM products ORDER BY id')
+    
+    def get_product(self, product_id: int) -> Optional[Dict]:
+        """Get a specific product by ID"""
+        return self._query_one('SELECT id, name, price, stock FROM products WHERE id = ?', (product_id,))
+    
+    def create_product(self, name: str, price: float, stock: int) -> Dict:
+        """Create a new product"""
+        with self._connection() as conn:
+            cursor = conn.execute('INSERT INTO products (name, price, stock) VALUES (?, ?, ?)',
+                                  (name.strip(), price, stock))
+        return {'id': cursor.lastrowid, 'name': name.strip(), 'price': price, 'stock': stock}
+    
+    def update_product(self, product_id: int, updates: Dict) -> Optional[Dict]:
+        """Update an existing product"""
+        with self._connection() as conn:
+            # Update only provided fields
+            self._update(conn, 'products', product_id, self._values(('name', 'price', 'stock'), ('name',), updates))
+        return self.get_product(product_id)
+    
+    def delete_product(self, product_id: int) -> bool:
+        """Delete a product"""
+        with self._connection() as conn:
+            cursor = conn.execute('DELETE FROM products WHERE id = ?', (product_id,))
+        return cursor.rowcount > 0
+    
+    def apply_product_batch(self, operations: List[Dict]) -> List:
+        """Apply product operations all-or-nothing, as ``DataManager.apply_product_batch``"""
+        return self._apply_batch('products', ('name', 'price', 'stock'), ('name',), operations)
+    
+    def search_products(self, query: str = '', sort_by: str = 'name') -> List[Dict]:
+        """Search products by name, sorted by name, price or stock"""
+        order = PRODUCT_SORTS.get(sort_by, PRODUCT_SORTS['name'])
+        if not query:
+            return self._query(f'SELECT id, name, price, stock FROM products ORDER BY {order}, id')
+        return self._query(
+            f"SELECT id, name, price, stock FROM products WHERE name LIKE ? ESCAPE '\\' ORDER BY {order}, id",
+            (_like_pattern(query),))
+    
+    def page_products(self, query: str = '', sort_by: str = 'id', limit: int = 50,
+                      after: Optional[Tuple] = None) -> Dict:
+        """Return one keyset page of matching products, as ``DataManager.page_products``"""
+        sort = PRODUCT_SORTS.get(sort_by, PRODUCT_SORTS['name'])
+        where, params = ("name LIKE ? ESCAPE '\\'", (_like_pattern(query),)) if query else ('1', ())
+        return self._page('products', 'id, name, price, stock', sort, where, params, limit, after)
+    
+    def get_summary_stats(self) -> Dict:
+        """Get summary statistics, aggregated in SQL"""
+        conn = self._connection()
+        totals = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(stock <= ?), 0), COALESCE(SUM(price * stock), 0), AVG(price) '
+            'FROM products', (LOW_STOCK_THRESHOLD,)).fetchone()
+        columns = 'SELECT id, name, price, stock FROM products'
+        recent_products = self._query(f'{columns} ORDER BY id DESC LIMIT ?', (RECENT_COUNT,))
+        recent_customers = self._query(
+            'SELECT id, name, email, phone FROM customers ORDER BY id DESC LIMIT ?', (RECENT_COUNT,))
+        return {
+            'total_products': totals[0],
+            'total_customers': conn.execute('SELECT COUNT(*) FROM customers').fetchone()[0],
+            'low_stock_items': totals[1],
+            'total_inventory_value': round(totals[2], 2),
+            'most_expensive_product': self._query_one(f'{columns} ORDER BY price DESC, id LIMIT 1'),
+            'cheapest_product': self._query_one(f'{columns} ORDER BY price, id LIMIT 1'),
+            'average_price': round(totals[3], 2) if totals[0] else 0,
+            'recent_products': recent_products[::-1],
+            'recent_customers': recent_customers[::-1],
+        }
+    
+    def stock_band_totals(self, bands: Dict[str, Tuple[Optional[int], Optional[int]]]) -> Dict[str, Tuple]:
+        """Return ``(count, price sum, stock value sum)`` per stock band, as ``DataManager.stock_band_totals``"""
+        totals = {}
+        conn = self._connection()
+        for name, (low, high) in bands.items():
+            row = conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(price), 0), COALESCE(SUM(price * stock), 0) FROM products '
+                'WHERE stock >= COALESCE(?, stock) AND stock <= COALESCE(?, stock)', (low, high)).fetchone()
+            totals[name] = tuple(row)
+        return totals
+    
+    def range_products(self, sort_by: str = 'price', low=None, high=None,
+                       limit: Optional[int] = None, descending: bool = False) -> List[Dict]:
+        """Return products in a sort key range, as ``DataManager.range_products``"""
+        return self._range('products', 'id, name, price, stock', PRODUCT_SORTS[sort_by],
+                           low, high, limit, descending)
+    
+    # Customer CRUD Operations
+    def get_all_customers(self) -> List[Dict]:
+        """Get all customers"""
+        return self._query('SELECT id, name, email, phone FROM customers ORDER BY id')
+    
+    def iter_customers(self) -> Iterator[Dict]:
+        """Iterate over all customers, for streaming exports"""
+        return self._iter_query('SELECT id, name, email, phone FROM customers ORDER BY id')
+    
+    def get_customer(self, customer_id: int) -> Optional[Dict]:
+        """Get a specific customer by ID"""
+        return self._query_one('SELECT id, name, email, phone FROM customers WHERE id = ?', (customer_id,))
+    
+    def create_customer(self, name: str, email: str, phone: str) -> Dict:
+        """Create a new customer"""
+        with self._connection() as conn:
+            cursor = conn.execute('INSERT INTO customers (name, email, phone) VALUES (?, ?, ?)',
+                                  (name.strip(), email.strip(), phone.strip()))
+        return {'id': cursor.lastrowid, 'name': name.strip(), 'email': email.strip(), 'phone': phone.strip()}
+    
+    def update_customer(self, customer_id: int, updates: Dict) -> Optional[Dict]:
+        """Update an existing customer"""
+        with self._connection() as conn:
+            # Update only provided fields
+            text_columns = ('name', 'email', 'phone')
+            self._update(conn, 'customers', customer_id, self._values(text_columns, text_columns, updates))
+        return self.get_customer(customer_id)
+    
+    def delete_customer(self, customer_id: int) -> bool:
+        """Delete a customer"""
+        with self._connection() as conn:
+            cursor = conn.execute('DELETE FROM customers WHERE id = ?', (customer_id,))
+        return cursor.rowcount > 0
+    
+    def apply_customer_batch(self, operations: List[Dict]) -> List:
+        """Apply customer operations all-or-nothing, as ``DataManager.apply_customer_batch``"""
+        return self._apply_batch('customers', ('name', 'email', 'phone'), ('name', 'email', 'phone'), operations)
+    
+    def search_customers(self, query: str = '', sort_by: str = 'name') -> List[Dict]:
+        """Search customers by name or email, sorted by name, email or phone"""
+        order = CUSTOMER_SORTS.get(sort_by, CUSTOMER_SORTS['name'])
+        if not query:
+            return self._query(f'SELECT id, name, email, phone FROM customers ORDER BY {order}, id')
+        pattern = _like_pattern(query)
+        return self._query(
+            f"SELECT id, name, email, phone FROM customers "
+            f"WHERE name LIKE ? ESCAPE '\\' OR email LIKE ? ESCAPE '\\' ORDER BY {order}, id",
+            (pattern, pattern))
+    
+    def page_customers(self, query: str = '', sort_by: str = 'id', limit: int = 50,
+                       after: Optional[Tuple] = None) -> Dict:
+        """Return one keyset page of matching customers, as ``DataManager.page_customers``"""
+        sort = CUSTOMER_SORTS.get(sort_by, CUSTOMER_SORTS['name'])
+        where, params = ('1', ())
+        if query:
+            pattern = _like_pattern(query)
+            where, params = "name LIKE ? ESCAPE '\\' OR email LIKE ? ESCAPE '\\'", (pattern, pattern)
+        return self._page('customers', 'id, name, email, phone', sort, where, params, limit, after)
+    
+    def range_customers(self, sort_by: str = 'name', low=None, high=None,
+                        limit: Optional[int] = None, descending: bool = False) -> List[Dict]:
+        """Return customers in a sort key range, as ``DataManager.range_customers``"""
+        return self._range('customers', 'id, name, email, phone', CUSTOMER_SORTS[sort_by],
+                           low, high, limit, descending)
+
+
+if __name__ == '__main__':
+    manager = SQLiteDataManager()
+    products, customers = manager.migrate_from_json()
+    print(f"Imported {products} products and {customers} customers into {manager.db_file}")
@@ -1,9 +1,10 @@
 import unittest
+import base64
 import json
 import os
 import tempfile
 import shutil
-from app import app
+from app import app, event_streams, response_cache
 
 class TestAPI(unittest.TestCase):
     
@@ -15,6 +16,7 @@ class TestAPI(unittest.TestCase):
         
         app.config['TESTING'] = True
         self.client = app.test_client()
+        response_cache.clear()
     
     def tearDown(self):
         """Clean up test environment"""
@@ -71,6 +73,22 @@ class TestAPI(unittest.TestCase):
         
         self.assertEqual(response.status_code, 400)
     
+    def test_non_finite_prices_rejected(self):
+        """Test that inf, nan and prices whose stock value overflows get a 400, not a 500"""
+        for price, stock in (('inf', 1), ('nan', 1), (1e308, 10), (10.0, 10 ** 400)):
+            response = self.client.post('/api/products',
+                                        data=json.dumps({'name': 'Bad', 'price': price, 'stock': stock}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        
+        self.create_products([('Radio', 25.0, 3)])
+        response = self.client.put('/api/products/1', data=json.dumps({'price': 'nan'}),
+                                   content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/stats/summary')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['total_inventory_value'], 75.0)
+    
     def test_get_product(self):
         """Test getting a specific product"""
         # Create a product first
@@ -105,8 +123,8 @@ class TestAPI(unittest.TestCase):
             'price': 99.99,
             'stock': 10
         }
-
-  response = self.client.post('/api/products', 
+        
+        response = self.client.post('/api/products', 
                                   data=json.dumps(product_data),
                                   content_type='application/json')
         
@@ -209,8 +227,8 @@ class TestAPI(unittest.TestCase):
             'email': 'alice@example.com',
             'phone': '087-123-4567'
         }
-
-response = self.client.post('/api/customers', 
+        
+        response = self.client.post('/api/customers', 
                                   data=json.dumps(customer_data),
                                   content_type='application/json')
         
@@ -252,7 +270,387 @@ response = self.client.post('/api/customers',
         response = self.client.get('/api/customers')
         customers = json.loads(response.data)
         self.assertEqual(len(customers), 0)
+    
+    def create_products(self, products):
+        """Create products from (name, price, stock) tuples"""
+        for name, price, stock in products:
+            response = self.client.post('/api/products',
+                                      data=json.dumps({'name': name, 'price': price, 'stock': stock}),
+                                      content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+    
+    def collect_pages(self, url):
+        """Follow next_cursor links and return every page body"""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = json.loads(response.data)
+            pages.append(page)
+            base = url.split('&cursor=')[0]
+            url = f"{base}&cursor={page['next_cursor']}" if page['next_cursor'] else None
+        return pages
+    
+    def test_paginated_products(self):
+        """Test walking the product list page by page"""
+        self.create_products([('Radio', 25.0, 3), ('Kettle', 30.0, 8), ('Toaster', 20.0, 1),
+                              ('Lamp', 15.0, 9), ('Fan', 25.0, 4)])
+        
+        pages = self.collect_pages('/api/products?limit=2')
+        self.assertEqual([len(p['items']) for p in pages], [2, 2, 1])
+        self.assertEqual({p['total'] for p in pages}, {5})
+        self.assertEqual([item['id'] for p in pages for item in p['items']], [1, 2, 3, 4, 5])
+        
+        pages = self.collect_pages('/api/products?limit=2&sort=price')
+        names = [item['name'] for p in pages for item in p['items']]
+        self.assertEqual(names, ['Lamp', 'Toaster', 'Radio', 'Fan', 'Kettle'])
+    
+    def test_paginated_search(self):
+        """Test that search pages only contain matches and count them"""
+        self.create_products([('Phone Case', 9.0, 30), ('Laptop', 999.0, 2), ('iPhone', 899.0, 5),
+                              ('Phone Charger', 19.0, 12)])
+        
+        pages = self.collect_pages('/api/products/search?q=phone&sort=name&limit=2')
+        self.assertEqual(pages[0]['total'], 3)
+        names = [item['name'] for p in pages for item in p['items']]
+        self.assertEqual(names, ['iPhone', 'Phone Case', 'Phone Charger'])
+    
+    def test_unpaginated_list_unchanged(self):
+        """Test that list endpoints still return a plain array without limit"""
+        self.create_products([('Radio', 25.0, 3)])
+        data = json.loads(self.client.get('/api/products').data)
+        self.assertIsInstance(data, list)
+    
+    def test_invalid_pagination(self):
+        """Test bad limits and cursors are rejected"""
+        self.create_products([('Radio', 25.0, 3), ('Kettle', 30.0, 8)])
+        
+        self.assertEqual(self.client.get('/api/products?limit=0').status_code, 400)
+        self.assertEqual(self.client.get('/api/products?limit=abc').status_code, 400)
+        self.assertEqual(self.client.get('/api/customers?cursor=not-a-cursor').status_code, 400)
+        
+        page = json.loads(self.client.get('/api/products?limit=1&sort=price').data)
+        response = self.client.get(f"/api/products?limit=1&sort=name&cursor={page['next_cursor']}")
+        self.assertEqual(response.status_code, 400)
+        
+        # Sort keys of the wrong type for the sort
+        for sort_by, position in [('price', ['abc', 1]), ('price', [True, 1]), ('name', [5, 1]),
+                                  ('name', [{}, 1]), ('stock', [None, 1])]:
+            cursor = base64.urlsafe_b64encode(json.dumps([sort_by] + position).encode()).decode()
+            response = self.client.get(f"/api/products?limit=1&sort={sort_by}&cursor={cursor}")
+            self.assertEqual(response.status_code, 400, (sort_by, position))
+        cursor = base64.urlsafe_b64encode(json.dumps(['price', 25, 1]).encode()).decode()
+        response = self.client.get(f"/api/products?limit=1&sort=price&cursor={cursor}")
+        self.assertEqual([p['name'] for p in json.loads(response.data)['items']], ['Kettle'])
+    
+    def test_stream_products_json_array(self):
+        """Test ?stream=1 returns the same array as the buffered endpoint"""
+        self.create_products([('Radio', 25.0, 3), ('Kettle', 30.0, 8), ('Toaster', 20.0, 1)])
+        
+        response = self.client.get('/api/products?stream=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(json.loads(response.data), json.loads(self.client.get('/api/products').data))
+    
+    def test_stream_ndjson(self):
+        """Test Accept: application/x-ndjson streams one record per line"""
+        self.create_products([('Radio', 25.0, 3), ('Kettle', 30.0, 8)])
+        
+        response = self.client.get('/api/products', headers={'Accept': 'application/x-ndjson'})
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = response.data.decode().splitlines()
+        self.assertEqual([json.loads(line)['name'] for line in lines], ['Radio', 'Kettle'])
+        
+        response = self.client.get('/api/customers?stream=1&format=ndjson')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertEqual(response.data, b'')
+        
+        response = self.client.get('/api/customers?stream=1')
+        self.assertEqual(json.loads(response.data), [])
+    
+    def test_summary_stats(self):
+        """Test summary statistics follow creates, updates and deletes"""
+        response = self.client.get('/api/stats/summary')
+        self.assertEqual(response.status_code, 200)
+        stats = json.loads(response.data)
+        self.assertEqual(stats['total_products'], 0)
+        self.assertIsNone(stats['cheapest_product'])
+        
+        self.create_products([('Radio', 25.0, 3), ('Kettle', 30.0, 8), ('Toaster', 20.0, 1)])
+        self.client.put('/api/products/3', data=json.dumps({'stock': 10}), content_type='application/json')
+        self.client.delete('/api/products/2')
+        
+        stats = json.loads(self.client.get('/api/stats/summary').data)
+        self.assertEqual(stats['total_products'], 2)
+        self.assertEqual(stats['low_stock_items'], 1)
+        self.assertEqual(stats['total_inventory_value'], 275.0)
+        self.assertEqual(stats['average_price'], 22.5)
+        self.assertEqual(stats['most_expensive_product']['name'], 'Radio')
+        self.assertEqual(stats['cheapest_product']['name'], 'Toaster')
+        self.assertEqual([p['id'] for p in stats['recent_products']], [1, 3])
+    
+    def test_etag_not_modified(self):
+        """Test GETs carry an ETag that yields 304 until the collection changes"""
+        self.create_products([('Radio', 25.0, 3)])
+        
+        response = self.client.get('/api/products')
+        etag = response.headers['ETag']
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        
+        response = self.client.get('/api/products', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.headers['ETag'], etag)
+        
+        # Other URLs and representations get their own tags
+        self.assertNotEqual(self.client.get('/api/products?limit=1').headers['ETag'], etag)
+        self.assertNotEqual(self.client.get('/api/products?stream=1').headers['ETag'], etag)
+        
+        # Customers changing leaves product tags alone but not the summary's
+        stats_etag = self.client.get('/api/stats/summary').headers['ETag']
+        self.client.post('/api/customers', data=json.dumps({'name': 'John Doe', 'email': 'john@example.com',
+                                                            'phone': '555-0100'}),
+                         content_type='application/json')
+        self.assertEqual(self.client.get('/api/products', headers={'If-None-Match': etag}).status_code, 304)
+        response = self.client.get('/api/stats/summary', headers={'If-None-Match': stats_etag})
+        self.assertEqual(response.status_code, 200)
+        
+        self.client.put('/api/products/1', data=json.dumps({'stock': 9}), content_type='application/json')
+        response = self.client.get('/api/products', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)[0]['stock'], 9)
+        
+        # Errors are not tagged
+        self.assertNotIn('ETag', self.client.get('/api/products/99').headers)
+    
+    def test_memoized_search(self):
+        """Test repeated searches are served from the response cache until a write"""
+        self.create_products([('Phone Case', 9.0, 30), ('iPhone', 899.0, 5)])
+        
+        first = self.client.get('/api/products/search?q=phone&sort=price')
+        second = self.client.get('/api/products/search?sort=price&q=phone')
+        self.assertEqual(second.data, first.data)
+        stats = json.loads(self.client.get('/api/stats/cache').data)
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+        
+        self.create_products([('Phone Charger', 19.0, 12)])
+        names = [p['name'] for p in json.loads(self.client.get('/api/products/search?q=phone&sort=price').data)]
+        self.assertEqual(names, ['Phone Case', 'Phone Charger', 'iPhone'])
+        stats = json.loads(self.client.get('/api/stats/cache').data)
+        self.assertEqual((stats['hits'], stats['misses'], stats['invalidations']), (1, 2, 1))
+    
+    def test_inventory_report(self):
+        """Test the inventory report returns one band's rows and totals"""
+        self.create_products([('Radio', 25.0, 3), ('Kettle', 30.0, 8), ('Toaster', 20.0, 1),
+                              ('Lamp', 15.0, 25)])
+        
+        response = self.client.get('/api/reports/inventory?stock=low&sort=name')
+        self.assertEqual(response.status_code, 200)
+        report = json.loads(response.data)
+        self.assertEqual([p['name'] for p in report['items']], ['Radio', 'Toaster'])
+        self.assertEqual(report['summary'], {'total_items': 2, 'total_value': 95.0})
+        
+        report = json.loads(self.client.get('/api/reports/inventory?limit=1').data)
+        self.assertEqual(len(report['items']), 1)
+        self.assertEqual(report['summary']['total_items'], 4)
+        
+        self.assertEqual(self.client.get('/api/reports/inventory?stock=none').status_code, 400)
+        self.assertEqual(self.client.get('/api/reports/inventory?offset=-1').status_code, 400)
+    
+    def test_customer_report(self):
+        """Test the customer report filters, sorts and counts domains"""
+        for name, email in [('John Doe', 'john@example.com'), ('Jane Smith', 'jane@example.org'),
+                            ('Johnny Five', 'johnny@example.com')]:
+            response = self.client.post('/api/customers',
+                                      data=json.dumps({'name': name, 'email': email, 'phone': '555-0100'}),
+                                      content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+        
+        report = json.loads(self.client.get('/api/reports/customers?q=john&sort=email').data)
+        self.assertEqual([c['name'] for c in report['items']], ['John Doe', 'Johnny Five'])
+        self.assertEqual(report['items'][0]['domain'], 'example.com')
+        self.assertEqual(report['summary'], {'total_customers': 2, 'unique_domains': 1})
+        
+        report = json.loads(self.client.get('/api/reports/customers').data)
+        self.assertEqual(report['summary'], {'total_customers': 3, 'unique_domains': 2})
+        self.assertEqual(self.client.get('/api/reports/customers?limit=0').status_code, 400)
+    
+    def test_product_batch(self):
+        """Test the batch endpoint applies every operation and reports each one"""
+        self.client.post('/api/products', data=json.dumps({'name': 'Product 1', 'price': 10.00, 'stock': 5}),
+                         content_type='application/json')
+        
+        response = self.client.post('/api/products/batch', data=json.dumps({'operations': [
+            {'op': 'create', 'name': 'Product 2', 'price': '20.50', 'stock': '7'},
+            {'op': 'update', 'id': 1, 'price': 12.00},
+            {'op': 'delete', 'id': 1},
+        ]}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(response.data)
+        self.assertTrue(body['applied'])
+        self.assertEqual(body['results'][0], {'status': 201, 'product': {'id': 2, 'name': 'Product 2',
+                                                                          'price': 20.50, 'stock': 7}})
+        self.assertEqual(body['results'][1]['product']['price'], 12.00)
+        self.assertEqual(body['results'][2], {'status': 200, 'message': 'Product deleted successfully'})
+        self.assertEqual([p['id'] for p in json.loads(self.client.get('/api/products').data)], [2])
+    
+    def test_batch_errors(self):
+        """Test invalid or unknown operations reject the whole batch"""
+        response = self.client.post('/api/customers/batch', data=json.dumps({'operations': [
+            {'op': 'create', 'name': 'John Doe', 'email': 'john@example.com', 'phone': '555-0100'},
+            {'op': 'create', 'name': 'Jane Smith', 'email': 'not-an-email', 'phone': '555-0101'},
+            {'op': 'rename', 'id': 1},
+        ]}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.data), {'applied': False, 'errors': [
+            {'index': 1, 'status': 400, 'error': 'Invalid email format'},
+            {'index': 2, 'status': 400, 'error': "Each operation needs an op of 'create', 'update' or 'delete'"},
+        ]})
+        
+        response = self.client.post('/api/customers/batch', data=json.dumps({'operations': [
+            {'op': 'create', 'name': 'John Doe', 'email': 'john@example.com', 'phone': '555-0100'},
+            {'op': 'update', 'id': 42, 'name': 'Nobody'},
+        ]}), content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(json.loads(response.data)['errors'], [{'index': 1, 'status': 404,
+                                                                'error': 'Customer not found'}])
+        self.assertEqual(json.loads(self.client.get('/api/customers').data), [])
+        
+        for body in ['not json', json.dumps({'operations': []}), json.dumps([])]:
+            response = self.client.post('/api/products/batch', data=body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+    
+    def test_import_products(self):
+        """Test a streamed CSV upload creates the valid rows and lists the bad ones"""
+        data = 'name,price,stock\nCable,4.50,40\nPlug,-1,3\nSocket,2.25,7\n'
+        response = self.client.post('/api/products/import', data=data, content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {
+            'imported': 2, 'rejected': 1, 'batches': 1,
+            'errors': [{'line': 3, 'error': 'Price cannot be negative'}],
+        })
+        self.assertEqual([p['name'] for p in json.loads(self.client.get('/api/products').data)],
+                         ['Cable', 'Socket'])
+        
+        data = '{"name": "John Doe", "email": "john@example.com", "phone": "555-0100"}\n'
+        response = self.client.post('/api/customers/import?format=ndjson', data=data, content_type='text/plain')
+        self.assertEqual(json.loads(response.data)['imported'], 1)
+        
+        response = self.client.post('/api/customers/import', data=data, content_type='text/plain')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_stock_band_report(self):
+        """Test the stock band breakdown counts and totals each band"""
+        for name, price, stock in [('Cable', 4.00, 3), ('Plug', 2.00, 10), ('Socket', 6.00, 12), ('Fuse', 1.00, 50)]:
+            self.client.post('/api/products', data=json.dumps({'name': name, 'price': price, 'stock': stock}),
+                             content_type='application/json')
+        
+        report = json.loads(self.client.get('/api/reports/stock-bands').data)
+        self.assertEqual(report['bands'], [
+            {'band': 'low', 'min_stock': None, 'max_stock': 5, 'count': 1, 'total_value': 12.0, 'average_price': 4.0},
+            {'band': 'medium', 'min_stock': 6, 'max_stock': 20, 'count': 2, 'total_value': 92.0,
+             'average_price': 4.0},
+            {'band': 'high', 'min_stock': 21, 'max_stock': None, 'count': 1, 'total_value': 50.0,
+             'average_price': 1.0},
+        ])
+        self.assertEqual(report['total'], {'band': 'all', 'min_stock': None, 'max_stock': None, 'count': 4,
+                                           'total_value': 154.0, 'average_price': 3.25})
+    
+    def read_events(self, count, **kwargs):
+        """Open the event stream and parse its first events"""
+        response = self.client.get('/api/events', buffered=False, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        chunks = iter(response.response)
+        events = []
+        for _ in range(count):
+            fields = dict(line.split(': ', 1) for line in next(chunks).decode().strip().split('\n'))
+            events.append((fields['event'], json.loads(fields['data']), fields.get('id')))
+        response.close()
+        return events
+    
+    def test_event_stream(self):
+        """Test the change feed resumes after an event id and sends deltas"""
+        self.client.post('/api/products', data=json.dumps({'name': 'Old', 'price': 1.0, 'stock': 1}),
+                         content_type='application/json')
+        [(event, versions, event_id)] = self.read_events(1)
+        self.assertEqual(event, 'ready')
+        self.assertEqual(event_id, f"products:{versions['products']},customers:{versions['customers']}")
+        
+        self.client.post('/api/products', data=json.dumps({'name': 'New', 'price': 2.0, 'stock': 3}),
+                         content_type='application/json')
+        self.client.delete('/api/products/1')
+        self.client.post('/api/products/batch', content_type='application/json', data=json.dumps({'operations': [
+            {'op': 'update', 'id': 2, 'stock': 9},
+            {'op': 'create', 'name': 'Third', 'price': 3.0, 'stock': 1}]}))
+        
+        events = self.read_events(4, headers={'Last-Event-ID': event_id})
+        self.assertEqual([(e[1]['op'], e[1]['id']) for e in events],
+                         [('insert', 2), ('delete', 1), ('update', 2), ('insert', 3)])
+        self.assertEqual(events[0][1]['record'], {'id': 2, 'name': 'New', 'price': 2.0, 'stock': 9})
+        # The two batch changes share a version, and only the last carries an id
+        self.assertEqual(events[2][1]['version'], events[3][1]['version'])
+        self.assertIsNone(events[2][2])
+        
+        # Resuming from the middle version replays just what followed it
+        resumed = self.read_events(2, query_string={'last_event_id': events[1][2]})
+        self.assertEqual([e[1]['id'] for e in resumed], [2, 3])
+    
+    def test_event_stream_resync(self):
+        """Test bad event ids are rejected and unknown history asks for a resync"""
+        self.assertEqual(self.client.get('/api/events?last_event_id=products:x').status_code, 400)
+        [(event, data, event_id)] = self.read_events(1, query_string={'last_event_id': 'products:999,customers:999'})
+        self.assertEqual(event, 'resync')
+        self.assertEqual(data['collection'], 'products')
+        self.assertEqual(event_id, f"products:{data['version']},customers:999")
+    
+    def test_event_streams_are_capped(self):
+        """Test a stream past EVENT_STREAMS is turned away instead of taking a thread"""
+        taken = 0
+        while event_streams.acquire(blocking=False):
+            taken += 1
+        try:
+            response = self.client.get('/api/events')
+        finally:
+            for _ in range(taken):
+                event_streams.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+        self.assertEqual(self.read_events(1)[0][0], 'ready')
+    
+    def test_delta_sync(self):
+        """Test the changes endpoint returns net inserts, updates and deletes since a version"""
+        for name in ('Kept', 'Edited', 'Removed'):
+            self.client.post('/api/products', data=json.dumps({'name': name, 'price': 1.0, 'stock': 1}),
+                             content_type='application/json')
+        # Asking from too far back gives the version to resume from after a full reload
+        response = self.client.get('/api/products/changes?since=-5')
+        self.assertEqual(response.status_code, 410)
+        version = json.loads(response.data)['version']
+        
+        self.client.put('/api/products/2', data=json.dumps({'stock': 4}), content_type='application/json')
+        self.client.delete('/api/products/3')
+        self.client.post('/api/products', data=json.dumps({'name': 'Added', 'price': 2.0, 'stock': 2}),
+                         content_type='application/json')
+        self.client.post('/api/products', data=json.dumps({'name': 'Fleeting', 'price': 2.0, 'stock': 2}),
+                         content_type='application/json')
+        self.client.delete('/api/products/5')
+        
+        response = self.client.get(f'/api/products/changes?since={version}')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['inserted'], [{'id': 4, 'name': 'Added', 'price': 2.0, 'stock': 2}])
+        self.assertEqual(data['updated'], [{'id': 2, 'name': 'Edited', 'price': 1.0, 'stock': 4}])
+        self.assertEqual(data['deleted'], [3])
+        self.assertEqual((data['since'], data['version'], data['resync']), (version, version + 5, False))
+        
+        caught_up = self.client.get(f"/api/products/changes?since={data['version']}")
+        self.assertEqual(json.loads(caught_up.data)['inserted'], [])
+        self.assertEqual(self.client.get(f"/api/products/changes?since={data['version']}",
+                                         headers={'If-None-Match': caught_up.headers['ETag']}).status_code, 304)
+        self.assertEqual(self.client.get('/api/customers/changes').status_code, 400)
+        self.assertEqual(self.client.get('/api/customers/changes?since=x').status_code, 400)
 
 if __name__ == '__main__':
     unittest.main()
-  
+
@@ -0,0 +1,182 @@
+import unittest
+import asyncio
+import json
+import os
+import tempfile
+import shutil
+import threading
+import time
+from app import EVENT_KEEPALIVE_SECONDS, data_manager, event_streams, response_cache
+from asgi import RequestBody, application
+
+def call(method, path, body_chunks=(), headers=(), query=b''):
+    """Run one request through the ASGI app; returns (status, headers, body messages)"""
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': i < len(body_chunks) - 1}
+                for i, chunk in enumerate(body_chunks)] or [{'type': 'http.request', 'body': b''}]
+    sent = []
+    
+    async def run():
+        done = asyncio.Event()
+        
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            # Like a server, report the disconnect only once the response is over
+            await done.wait()
+            return {'type': 'http.disconnect'}
+        
+        async def send(message):
+            sent.append(message)
+            if not message.get('more_body', message['type'] == 'http.response.start'):
+                done.set()
+        
+        await application(scope, receive, send)
+    
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query, 'http_version': '1.1',
+             'headers': [(name.encode(), value.encode()) for name, value in headers]}
+    asyncio.run(run())
+    start, bodies = sent[0], sent[1:]
+    return start['status'], dict(start['headers']), bodies
+
+class TestASGI(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test environment"""
+        self.test_dir = tempfile.mkdtemp()
+        self.original_dir = os.getcwd()
+        os.chdir(self.test_dir)
+        response_cache.clear()
+    
+    def tearDown(self):
+        """Clean up test environment"""
+        os.chdir(self.original_dir)
+        shutil.rmtree(self.test_dir)
+    
+    def test_create_and_list_products(self):
+        """Test a body sent in several messages reaches the route intact"""
+        body = json.dumps({'name': 'Test Product', 'price': 99.99, 'stock': 10}).encode()
+        status, headers, _ = call('POST', '/api/products', [body[:10], body[10:]],
+                                  [('content-type', 'application/json')])
+        self.assertEqual(status, 201)
+        
+        status, headers, bodies = call('GET', '/api/products')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'content-type'], b'application/json')
+        self.assertFalse(bodies[-1]['more_body'])
+        products = json.loads(b''.join(message['body'] for message in bodies))
+        self.assertEqual([p['name'] for p in products], ['Test Product'])
+    
+    def test_validation_errors_pass_through(self):
+        """Test the Flask routes' 400 responses are returned unchanged"""
+        status, _, bodies = call('POST', '/api/products', [b'{"name": "X", "price": -1, "stock": 1}'],
+                                 [('content-type', 'application/json')])
+        self.assertEqual(status, 400)
+        self.assertEqual(json.loads(bodies[0]['body']), {'error': 'Price cannot be negative'})
+    
+    def test_query_string_and_streamed_import(self):
+        """Test query parameters and a chunked upload without a content length"""
+        status, _, bodies = call('POST', '/api/products/import', [b'name,price,st', b'ock\nCable,4.5,40\n'],
+                                 query=b'format=csv')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(b''.join(message['body'] for message in bodies))['imported'], 1)
+    
+    def test_body_is_fetched_as_it_is_read(self):
+        """Test the body is pulled from the server a chunk at a time, and the disconnect watch starts after it"""
+        pulled, completed = [], threading.Event()
+        
+        async def run():
+            chunks = [{'type': 'http.request', 'body': bytes([i]) * 4, 'more_body': i < 99} for i in range(100)]
+            
+            async def receive():
+                pulled.append(len(chunks))
+                return chunks.pop(0)
+            
+            loop = asyncio.get_running_loop()
+            body = RequestBody(receive, loop, await receive(), threading.Event(), completed.set)
+            self.assertEqual(await loop.run_in_executor(None, body.read, 6), b'\x00' * 4)
+            self.assertEqual(await loop.run_in_executor(None, body.read, 6), b'\x01' * 4)
+            self.assertEqual(len(pulled), 2)
+            self.assertFalse(completed.is_set())
+            self.assertEqual(len(await loop.run_in_executor(None, body.readall)), 98 * 4)
+            await asyncio.sleep(0)
+        
+        asyncio.run(run())
+        self.assertEqual(len(pulled), 100)
+        self.assertTrue(completed.is_set())
+    
+    def test_disconnected_event_stream_frees_its_thread(self):
+        """Test a client hanging up ends its event stream well before the next keep-alive"""
+        sent = []
+        
+        async def run():
+            messages = [{'type': 'http.request', 'body': b''}]
+            
+            async def receive():
+                if messages:
+                    return messages.pop(0)
+                while len(sent) < 2:
+                    await asyncio.sleep(0.01)
+                return {'type': 'http.disconnect'}
+            
+            async def send(message):
+                sent.append(message)
+            
+            scope = {'type': 'http', 'method': 'GET', 'path': '/api/events', 'query_string': b'',
+                     'http_version': '1.1', 'headers': []}
+            await asyncio.wait_for(application(scope, receive, send), EVENT_KEEPALIVE_SECONDS - 5)
+        
+        started = time.monotonic()
+        asyncio.run(run())
+        self.assertLess(time.monotonic() - started, EVENT_KEEPALIVE_SECONDS - 5)
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertTrue(sent[1]['body'].startswith(b'event: ready'))
+        # Nothing more is sent, and the stream's slot is given back
+        self.assertEqual(len(sent), 2)
+        self.assertTrue(event_streams.acquire(blocking=False))
+        event_streams.release()
+    
+    def test_event_streams_are_served_on_the_loop(self):
+        """Test more streams than EVENT_STREAMS stay open on the loop and each is sent a write"""
+        streams = [[] for _ in range(20)]
+        
+        async def until(condition):
+            while not condition():
+                await asyncio.sleep(0.01)
+        
+        async def run():
+            loop = asyncio.get_running_loop()
+            hangup = asyncio.Event()
+            
+            async def open_stream(sent):
+                messages = [{'type': 'http.request', 'body': b''}]
+                
+                async def receive():
+                    if messages:
+                        return messages.pop(0)
+                    await hangup.wait()
+                    return {'type': 'http.disconnect'}
+                
+                async def send(message):
+                    sent.append(message)
+                
+                scope = {'type': 'http', 'method': 'GET', 'path': '/api/events', 'query_string': b'',
+                         'http_version': '1.1', 'headers': []}
+                await application(scope, receive, send)
+            
+            tasks = [loop.create_task(open_stream(sent)) for sent in streams]
+            await asyncio.wait_for(until(lambda: all(len(sent) >= 2 for sent in streams)), 5)
+            await loop.run_in_executor(None, data_manager.create_product, 'Radio', 25.0, 3)
+            await asyncio.wait_for(until(lambda: all(
+                any(b'event: change' in message.get('body', b'') for message in sent) for sent in streams)), 5)
+            hangup.set()
+            await asyncio.wait_for(asyncio.gather(*tasks), 5)
+        
+        asyncio.run(run())
+        for sent in streams:
+            self.assertEqual(sent[0]['status'], 200)
+            self.assertIn((b'cache-control', b'no-cache'), sent[0]['headers'])
+            self.assertTrue(sent[1]['body'].startswith(b'event: ready'))
+            self.assertTrue(all(message.get('more_body', True) for message in sent))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import os
+import tempfile
+import shutil
+import threading
+import multiprocessing
+from data_manager import DataManager
+
+def create_and_update(directory, worker, count, journal):
+    """Process worker: create products, then update each one it created"""
+    os.chdir(directory)
+    manager = DataManager(cache=True, journal=journal)
+    created = [manager.create_product(f"Worker {worker} item {i}", 1.0, 0)['id'] for i in range(count)]
+    for product_id in created:
+        manager.update_product(product_id, {'stock': worker})
+
+class TestConcurrency(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test environment with temporary directory"""
+        self.test_dir = tempfile.mkdtemp()
+        self.original_dir = os.getcwd()
+        os.chdir(self.test_dir)
+    
+    def tearDown(self):
+        """Clean up test environment"""
+        os.chdir(self.original_dir)
+        shutil.rmtree(self.test_dir)
+    
+    def run_threads(self, manager, threads, per_thread):
+        """Create products from many threads at once and return their ids"""
+        ids = []
+        ids_lock = threading.Lock()
+        barrier = threading.Barrier(threads)
+        
+        def worker():
+            barrier.wait()
+            created = [manager.create_product("Item", 1.0, 1)['id'] for _ in range(per_thread)]
+            with ids_lock:
+                ids.extend(created)
+        
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return ids
+    
+    def test_parallel_thread_creates_journal(self):
+        """Test thousands of threaded creates get unique ids and all persist"""
+        manager = DataManager(journal=True, compact_threshold=500)
+        ids = self.run_threads(manager, 16, 125)
+        
+        self.assertEqual(sorted(ids), list(range(1, 2001)))
+        self.assertEqual(len(DataManager(journal=True).get_all_products()), 2000)
+    
+    def test_parallel_thread_creates_rewrite(self):
+        """Test threaded creates against the full-file rewrite path"""
+        manager = DataManager(cache=True)
+        ids = self.run_threads(manager, 8, 50)
+        
+        self.assertEqual(sorted(ids), list(range(1, 401)))
+        self.assertEqual(len(DataManager().get_all_products()), 400)
+    
+    def test_readers_run_alongside_writers(self):
+        """Test that reads during heavy writing always see a consistent collection"""
+        manager = DataManager(cache=True)
+        errors = []
+        done = threading.Event()
+        
+        def reader():
+            while not done.is_set():
+                try:
+                    products = manager.get_all_products()
+                    if len({p['id'] for p in products}) != len(products):
+                        errors.append('duplicate ids')
+                except Exception as e:
+                    errors.append(e)
+        
+        readers = [threading.Thread(target=reader) for _ in range(4)]
+        for thread in readers:
+            thread.start()
+        self.run_threads(manager, 4, 50)
+        done.set()
+        for thread in readers:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+    
+    def check_processes(self, journal):
+        """Run several writer processes against the same files"""
+        workers, per_worker = 4, 100
+        processes = [
+            multiprocessing.Process(target=create_and_update,
+                                    args=(self.test_dir, worker, per_worker, journal))
+            for worker in range(1, workers + 1)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+        
+        products = DataManager(journal=journal).get_all_products()
+        self.assertEqual(sorted(p['id'] for p in products), list(range(1, workers * per_worker + 1)))
+        # Every worker's update landed on every product it created
+        for product in products:
+            worker = int(product['name'].split()[1])
+            self.assertEqual(product['stock'], worker)
+    
+    def test_parallel_process_writes_rewrite(self):
+        """Test that processes sharing the JSON files lose no writes"""
+        self.check_processes(journal=False)
+    
+    def test_parallel_process_writes_journal(self):
+        """Test that processes sharing a journal lose no writes"""
+        self.check_processes(journal=True)
+
+if __name__ == '__main__':
+    unittest.main()
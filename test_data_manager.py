@@ -1,9 +1,31 @@
 import unittest
+import errno
 import os
 import json
 import tempfile
 import shutil
-from data_manager import DataManager
+import threading
+from changes import ChangeLog, net_changes
+from data_manager import BatchRejected, DataManager, PendingMutation
+from indexes import ProductSearch
+from records import Customer, IncompleteRecord, Product
+from scans import ScanExecutor
+from snapshots import Snapshot
+from reports import inventory_report
+
+def brute_force_summary(products, customers):
+    """Compute the summary statistics the slow way, for comparison"""
+    return {
+        'total_products': len(products),
+        'total_customers': len(customers),
+        'low_stock_items': len([p for p in products if p['stock'] <= 5]),
+        'total_inventory_value': round(sum(p['price'] * p['stock'] for p in products), 2),
+        'most_expensive_product': max(products, key=lambda x: x['price']) if products else None,
+        'cheapest_product': min(products, key=lambda x: x['price']) if products else None,
+        'average_price': round(sum(p['price'] for p in products) / len(products), 2) if products else 0,
+        'recent_products': products[-5:],
+        'recent_customers': customers[-5:]
+    }
 
 class TestDataManager(unittest.TestCase):
     
@@ -122,7 +144,7 @@ class TestDataManager(unittest.TestCase):
         """Test getting a specific customer"""
         # Create a customer
         created_customer = self.data_manager.create_customer("John Doe", "john@example.com", "123-456-7890")
-     
+      
       # Get the customer
         customer = self.data_manager.get_customer(created_customer['id'])
         self.assertIsNotNone(customer)
@@ -167,6 +189,193 @@ class TestDataManager(unittest.TestCase):
         result = self.data_manager.delete_customer(999)
         self.assertFalse(result)
     
+    def test_page_products(self):
+        """Test keyset pages follow (sort key, id) order"""
+        for name, price in [("b", 5.0), ("A", 5.0), ("c", 1.0), ("D", 9.0)]:
+            self.data_manager.create_product(name, price, 1)
+        
+        page = self.data_manager.page_products('', 'price', 2)
+        self.assertEqual([p['name'] for p in page['items']], ["c", "b"])
+        self.assertEqual(page['total'], 4)
+        page = self.data_manager.page_products('', 'price', 2, page['next'])
+        self.assertEqual([p['name'] for p in page['items']], ["A", "D"])
+        self.assertIsNone(page['next'])
+        
+        page = self.data_manager.page_customers('nobody', 'name', 10)
+        self.assertEqual((page['items'], page['total'], page['next']), ([], 0, None))
+    
+    def test_range_products(self):
+        """Test range filters and top-k queries follow updates"""
+        for name, price, stock in [("Radio", 25.0, 3), ("Kettle", 30.0, 8), ("Toaster", 20.0, 1),
+                                   ("Lamp", 15.0, 9), ("Fan", 25.0, 40)]:
+            self.data_manager.create_product(name, price, stock)
+        
+        def names(*args, **kwargs):
+            return [p['name'] for p in self.data_manager.range_products(*args, **kwargs)]
+        
+        self.assertEqual(names('stock', high=5), ["Toaster", "Radio"])
+        self.assertEqual(names('stock', 6, 20), ["Kettle", "Lamp"])
+        self.assertEqual(names('price', 20.0, 25.0), ["Toaster", "Radio", "Fan"])
+        self.assertEqual(names('price', limit=2, descending=True), ["Kettle", "Fan"])
+        self.assertEqual(names('price', limit=2), ["Lamp", "Toaster"])
+        self.assertEqual(names('name', 'k', 'lz'), ["Kettle", "Lamp"])
+        
+        self.data_manager.update_product(4, {'price': 50.0, 'stock': 2})
+        self.data_manager.delete_product(2)
+        self.assertEqual(names('price', limit=2, descending=True), ["Lamp", "Fan"])
+        self.assertEqual(names('stock', high=5), ["Toaster", "Lamp", "Radio"])
+        self.assertEqual([p['name'] for p in self.data_manager.search_products('', 'price')],
+                         ["Toaster", "Radio", "Fan", "Lamp"])
+    
+    def test_inventory_report(self):
+        """Test report bands, row values and totals come from the store's range queries"""
+        for name, price, stock in [("Radio", 25.0, 3), ("Kettle", 30.0, 8), ("Toaster", 20.0, 1),
+                                   ("Lamp", 15.0, 20), ("Fan", 25.5, 40)]:
+            self.data_manager.create_product(name, price, stock)
+        
+        report = inventory_report(self.data_manager, 'low', 'price')
+        self.assertEqual([(p['name'], p['value'], p['status']) for p in report['items']],
+                         [("Toaster", 20.0, 'low'), ("Radio", 75.0, 'low')])
+        self.assertEqual(report['summary'], {'total_items': 2, 'total_value': 95.0})
+        
+        report = inventory_report(self.data_manager, 'medium', 'name')
+        self.assertEqual([p['name'] for p in report['items']], ["Kettle", "Lamp"])
+        
+        report = inventory_report(self.data_manager, 'all', 'stock', limit=2, offset=3)
+        self.assertEqual([p['name'] for p in report['items']], ["Lamp", "Fan"])
+        self.assertEqual(report['items'][1]['status'], 'high')
+        self.assertEqual(report['summary'], {'total_items': 5, 'total_value': 1655.0})
+    
+    def test_version_changes_on_write(self):
+        """Test collection versions change with every write and only then"""
+        products, customers = self.data_manager.get_version('products'), self.data_manager.get_version('customers')
+        self.data_manager.get_all_products()
+        self.assertEqual(self.data_manager.get_version('products'), products)
+        
+        self.data_manager.create_product("Product 1", 10.00, 5)
+        updated = self.data_manager.get_version('products')
+        self.assertNotEqual(updated, products)
+        self.assertEqual(self.data_manager.get_version('customers'), customers)
+        
+        self.data_manager.update_product(1, {'stock': 4})
+        self.assertNotEqual(self.data_manager.get_version('products'), updated)
+    
+    def test_product_batch(self):
+        """Test a batch applies creates, updates and deletes together"""
+        self.data_manager.create_product("Product 1", 10.00, 5)
+        self.data_manager.create_product("Product 2", 20.00, 10)
+        
+        results = self.data_manager.apply_product_batch([
+            {'op': 'create', 'name': " Product 3 ", 'price': 30.00, 'stock': 15},
+            {'op': 'update', 'id': 1, 'stock': 2},
+            {'op': 'delete', 'id': 2},
+        ])
+        self.assertEqual(results[0], {'id': 3, 'name': "Product 3", 'price': 30.00, 'stock': 15})
+        self.assertEqual(results[1], {'id': 1, 'name': "Product 1", 'price': 10.00, 'stock': 2})
+        self.assertIs(results[2], True)
+        self.assertEqual([p['id'] for p in self.data_manager.get_all_products()], [1, 3])
+        self.assertEqual(self.data_manager.get_product(1)['stock'], 2)
+    
+    def test_rejected_batch_changes_nothing(self):
+        """Test a batch naming a missing record is rolled back entirely"""
+        self.data_manager.create_customer("John Doe", "john@example.com", "123-456-7890")
+        version = self.data_manager.get_version('customers')
+        
+        with self.assertRaises(BatchRejected) as caught:
+            self.data_manager.apply_customer_batch([
+                {'op': 'create', 'name': "Jane Smith", 'email': "jane@example.com", 'phone': "555-0100"},
+                {'op': 'delete', 'id': 1},
+                {'op': 'update', 'id': 1, 'name': "Johnny"},
+                {'op': 'delete', 'id': 99},
+            ])
+        self.assertEqual(caught.exception.missing, [2, 3])
+        self.assertEqual(self.data_manager.get_all_customers(),
+                         [{'id': 1, 'name': "John Doe", 'email': "john@example.com", 'phone': "123-456-7890"}])
+        self.assertEqual(self.data_manager.get_version('customers'), version)
+        
+        # The id of the rolled-back create is not burnt
+        self.assertEqual(self.data_manager.create_customer("Jane Smith", "jane@example.com", "555-0100")['id'], 2)
+    
+    def test_search_customers(self):
+        """Test substring search stays correct through updates and deletes"""
+        self.data_manager.create_customer("John Doe", "john@example.com", "123-456-7890")
+        self.data_manager.create_customer("Jane Smith", "jane.smith@example.org", "098-765-4321")
+        self.data_manager.create_customer("Bob Johnson", "bob@work.com", "555-0100")
+        
+        def ids(query):
+            return [c['id'] for c in self.data_manager.search_customers(query, 'email')]
+        
+        self.assertEqual(ids("JOHN"), [3, 1])
+        self.assertEqual(ids("example.org"), [2])
+        self.assertEqual(ids("jo"), [3, 1])
+        self.assertEqual(ids("doejohn"), [])
+        
+        self.data_manager.update_customer(1, {'name': 'Jon Doe', 'email': 'jon@example.com'})
+        self.data_manager.delete_customer(3)
+        self.assertEqual(ids("john"), [])
+        self.assertEqual(ids("jon doe"), [1])
+        self.assertEqual(ids("example"), [2, 1])
+    
+    def test_stock_band_totals(self):
+        """Test band counts and sums stay correct through updates and deletes"""
+        for i, stock in enumerate([0, 5, 6, 20, 21, 40], 1):
+            self.data_manager.create_product(f"Product {i}", i * 2.5, stock)
+        bands = {'low': (None, 5), 'medium': (6, 20), 'high': (21, None), 'all': (None, None)}
+        self.data_manager.stock_band_totals(bands)
+        
+        self.data_manager.update_product(1, {'stock': 30})
+        self.data_manager.delete_product(4)
+        totals = self.data_manager.stock_band_totals(bands)
+        self.assertEqual({name: total[0] for name, total in totals.items()},
+                         {'low': 1, 'medium': 1, 'high': 3, 'all': 5})
+        self.assertAlmostEqual(totals['low'][1], 5.0)
+        self.assertAlmostEqual(totals['medium'][2], 7.5 * 6)
+        self.assertAlmostEqual(totals['high'][2], 2.5 * 30 + 12.5 * 21 + 15.0 * 40)
+        self.assertAlmostEqual(totals['all'][1], 2.5 + 5.0 + 7.5 + 12.5 + 15.0)
+    
+    def test_summary_stats(self):
+        """Test that maintained aggregates match a full recomputation"""
+        def check():
+            expected = brute_force_summary(self.data_manager.get_all_products(),
+                                           self.data_manager.get_all_customers())
+            self.assertEqual(self.data_manager.get_summary_stats(), expected)
+        
+        check()
+        for i in range(8):
+            self.data_manager.create_product(f"Product {i}", 0.1 * (i + 1), i)
+        self.data_manager.create_customer("John Doe", "john@example.com", "123-456-7890")
+        check()
+        
+        # Reprice the cheapest above the dearest, then delete the new dearest
+        self.data_manager.update_product(1, {'price': 99.99, 'stock': 50})
+        check()
+        self.data_manager.delete_product(1)
+        check()
+        self.data_manager.update_product(2, {'stock': 3})
+        self.data_manager.delete_product(8)
+        check()
+        
+        for product in self.data_manager.get_all_products():
+            self.data_manager.delete_product(product['id'])
+        check()
+    
+    def test_parallel_scans(self):
+        """Test that searches and stats split across scan workers match the inline results"""
+        for i in range(6):
+            self.data_manager.create_product(f"Product {i}", 2.5 * (i % 4), i)
+            self.data_manager.create_customer(f"Customer {i}", f"c{i}@example.com", "555-0100")
+        self.data_manager.delete_customer(2)
+        expected_summary = self.data_manager.get_summary_stats()
+        expected_search = self.data_manager.search_customers('c', 'email')
+        
+        self.data_manager.scanner = ScanExecutor(workers=2, threshold=1)
+        try:
+            self.assertEqual(self.data_manager.get_summary_stats(), expected_summary)
+            self.assertEqual(self.data_manager.search_customers('c', 'email'), expected_search)
+            self.assertEqual([c['id'] for c in expected_search], [1, 3, 4, 5, 6])
+        finally:
+            self.data_manager.scanner.shutdown()
+    
     def test_id_generation(self):
         """Test that IDs are generated correctly"""
         # Create products
@@ -182,6 +391,749 @@ class TestDataManager(unittest.TestCase):
         # Create another product - should get ID 3, not reuse 1
         product3 = self.data_manager.create_product("Product 3", 30.00, 7)
         self.assertEqual(product3['id'], 3)
+    
+    def test_changes_since(self):
+        """Test the change log lists this manager's writes after a version"""
+        version, changes = self.data_manager.changes_since('products', 0)
+        product = self.data_manager.create_product("Product 1", 10.00, 5)
+        self.data_manager.update_product(product['id'], {'stock': 2})
+        self.data_manager.create_product("Product 2", 20.00, 3)
+        self.data_manager.delete_product(2)
+        
+        current, changes = self.data_manager.changes_since('products', version)
+        self.assertEqual(current, version + 4)
+        self.assertEqual([(c['op'], c['id'], c['version']) for c in changes],
+                         [('insert', 1, version + 1), ('update', 1, version + 2),
+                          ('insert', 2, version + 3), ('delete', 2, version + 4)])
+        self.assertEqual(changes[0]['record'], {'id': 1, 'name': "Product 1", 'price': 10.00, 'stock': 2})
+        self.assertNotIn('record', changes[2])
+        self.assertEqual(self.data_manager.changes_since('products', current), (current, []))
+        self.assertEqual(self.data_manager.changes_since('products', current + 1), (current, None))
+        self.assertTrue(self.data_manager.wait_for_change({'products': version, 'customers': 0}, 0))
+        self.assertFalse(self.data_manager.wait_for_change(
+            {'products': current, 'customers': self.data_manager.changes_since('customers', 0)[0]}, 0.05))
+
+class TestCachedDataManager(TestDataManager):
+    """Run the CRUD tests again against the in-memory cached store"""
+    
+    def setUp(self):
+        """Set up test environment with a cached data manager"""
+        super().setUp()
+        self.data_manager = DataManager(cache=True)
+    
+    def test_reads_served_from_cache(self):
+        """Test that unchanged files are not parsed again"""
+        self.data_manager.create_product("Product 1", 10.00, 5)
+        
+        calls = []
+        original_load = self.data_manager._read_json_file
+        def counting_load(filename):
+            calls.append(filename)
+            return original_load(filename)
+        self.data_manager._read_json_file = counting_load
+        
+        self.data_manager.get_all_products()
+        self.data_manager.get_product(1)
+        self.data_manager.create_product("Product 2", 20.00, 3)
+        self.assertEqual(calls, [])
+    
+    def test_external_edit_invalidates_cache(self):
+        """Test that an edit made outside the manager is picked up"""
+        self.data_manager.create_product("Product 1", 10.00, 5)
+        self.assertEqual(len(self.data_manager.get_all_products()), 1)
+        
+        with open('products.json', 'w') as f:
+            json.dump([{'id': 7, 'name': 'External', 'price': 1.5, 'stock': 2},
+                       {'id': 8, 'name': 'Another', 'price': 2.5, 'stock': 4}], f)
+        
+        products = self.data_manager.get_all_products()
+        self.assertEqual([p['id'] for p in products], [7, 8])
+        self.assertEqual(self.data_manager.create_product("Product 9", 9.00, 1)['id'], 9)
+    
+    def test_returned_list_does_not_alias_cache(self):
+        """Test that callers sorting the result do not reorder the cache"""
+        self.data_manager.create_product("B", 10.00, 5)
+        self.data_manager.create_product("A", 20.00, 3)
+        
+        products = self.data_manager.get_all_products()
+        products.sort(key=lambda p: p['name'])
+        
+        self.assertEqual([p['id'] for p in self.data_manager.get_all_products()], [1, 2])
+    
+    def test_cache_holds_compact_records(self):
+        """Test the cache keeps slotted records and hands out independent dicts"""
+        self.data_manager.create_product("Product 1", 10.00, 5)
+        self.data_manager.create_customer("John Doe", "john@example.com", "123-456-7890")
+        
+        product = self.data_manager.get_product(1)
+        self.assertEqual(product, {'id': 1, 'name': "Product 1", 'price': 10.00, 'stock': 5})
+        product['stock'] = 0
+        self.assertEqual(self.data_manager.search_products("product")[0]['stock'], 5)
+        
+        self.assertIsInstance(self.data_manager._cache['products.json'].by_id[1], Product)
+        self.assertIsInstance(self.data_manager._cache['customers.json'].by_id[1], Customer)
+        with open('products.json') as f:
+            self.assertEqual(f.read(), json.dumps(self.data_manager.get_all_products(), indent=2))
+    
+    def test_extra_fields_survive_writes(self):
+        """Test fields the record type does not know are kept through later writes"""
+        with open('products.json', 'w') as f:
+            json.dump([{'id': 1, 'name': 'Radio', 'price': 25.0, 'stock': 3, 'sku': 'R-1'},
+                       {'id': 2, 'name': 'Kettle', 'price': 30.0, 'stock': 8}], f)
+        
+        self.data_manager.update_product(2, {'stock': 7})
+        self.data_manager.update_product(1, {'price': 20.0})
+        with open('products.json') as f:
+            self.assertEqual(json.load(f)[0], {'id': 1, 'name': 'Radio', 'price': 20.0, 'stock': 3, 'sku': 'R-1'})
+        self.assertEqual(self.data_manager.get_product(1)['sku'], 'R-1')
+        self.assertNotIn('sku', self.data_manager.get_product(2))
+    
+    def test_incomplete_record_is_rejected(self):
+        """Test a stored record missing a field fails clearly and the file is left alone"""
+        with open('products.json', 'w') as f:
+            f.write('[{"id": 1, "name": "Radio", "price": 25.0}]')
+        
+        with self.assertRaisesRegex(IncompleteRecord, "Product 1 has no 'stock' field"):
+            self.data_manager.get_all_products()
+        with self.assertRaises(IncompleteRecord):
+            self.data_manager.create_product("Product 2", 20.00, 3)
+        with open('products.json') as f:
+            self.assertEqual(f.read(), '[{"id": 1, "name": "Radio", "price": 25.0}]')
+    
+    def test_warm_loads_collections_and_indexes(self):
+        """Test warm() fills the cache and builds the lazy indexes up front"""
+        self.data_manager.create_product("Product 1", 10.00, 5)
+        self.data_manager._cache.clear()
+        
+        self.data_manager.warm()
+        products = self.data_manager._cache['products.json']
+        self.assertIn('customers.json', self.data_manager._cache)
+        self.assertIsNotNone(products.indexes[ProductSearch].postings)
+        self.assertEqual(self.data_manager.search_products("product 1")[0]['id'], 1)
+    
+    def test_deleted_highest_id_not_reused(self):
+        """Test that the stored id counter does not hand out a deleted id again"""
+        self.data_manager.create_product("Product 1", 10.00, 5)
+        product2 = self.data_manager.create_product("Product 2", 20.00, 3)
+        self.data_manager.delete_product(product2['id'])
+        
+        product3 = self.data_manager.create_product("Product 3", 30.00, 7)
+        self.assertEqual(product3['id'], 3)
+        self.assertEqual([p['id'] for p in self.data_manager.get_all_products()], [1, 3])
+    
+    def test_summary_stats_after_external_edit(self):
+        """Test that aggregates are rebuilt when the file changes outside the manager"""
+        self.data_manager.create_product("Product 1", 10.00, 5)
+        self.assertEqual(self.data_manager.get_summary_stats()['total_products'], 1)
+        
+        with open('products.json', 'w') as f:
+            json.dump([{'id': 7, 'name': 'External', 'price': 1.5, 'stock': 20},
+                       {'id': 8, 'name': 'Another', 'price': 2.5, 'stock': 4}], f)
+        
+        stats = self.data_manager.get_summary_stats()
+        self.assertEqual(stats['total_products'], 2)
+        self.assertEqual(stats['low_stock_items'], 1)
+        self.assertEqual(stats['total_inventory_value'], 40.0)
+        self.assertEqual(stats['cheapest_product']['id'], 7)
+        self.assertEqual(stats['most_expensive_product']['id'], 8)
+    
+    def test_external_edit_changes_version(self):
+        """Test that an edit made outside the manager changes the version"""
+        self.data_manager.create_product("Product 1", 10.00, 5)
+        version = self.data_manager.get_version('products')
+        
+        with open('products.json', 'w') as f:
+            json.dump([{'id': 7, 'name': 'External', 'price': 1.5, 'stock': 2}], f)
+        
+        self.assertNotEqual(self.data_manager.get_version('products'), version)
+    
+    def test_index_rebuilt_after_external_delete(self):
+        """Test that records removed outside the manager disappear from the index"""
+        self.data_manager.create_customer("John Doe", "john@example.com", "123-456-7890")
+        self.data_manager.create_customer("Jane Smith", "jane@example.com", "098-765-4321")
+        self.assertIsNotNone(self.data_manager.get_customer(1))
+        
+        with open('customers.json', 'w') as f:
+            json.dump([{'id': 2, 'name': 'Jane Smith', 'email': 'jane@example.com',
+                        'phone': '098-765-4321'}], f)
+        
+        self.assertIsNone(self.data_manager.get_customer(1))
+        self.assertIsNone(self.data_manager.update_customer(1, {'name': 'Ghost'}))
+        self.assertFalse(self.data_manager.delete_customer(1))
+        self.assertEqual(self.data_manager.get_customer(2)['name'], 'Jane Smith')
+    
+    def test_change_log_is_shared_between_managers(self):
+        """Test writes through another manager, or before a restart, still come back as deltas"""
+        self.data_manager.create_product("Product 1", 10.00, 5)
+        version = self.data_manager.changes_since('products', 0)[0]
+        other = DataManager()
+        other.create_product("Product 2", 20.00, 3)
+        other.update_product(1, {'stock': 4})
+        
+        current, changes = self.data_manager.changes_since('products', version)
+        self.assertEqual(current, version + 2)
+        self.assertEqual([(c['op'], c['id']) for c in changes], [('insert', 2), ('update', 1)])
+        self.assertEqual(changes[1]['record']['stock'], 4)
+        self.data_manager.delete_product(2)
+        self.assertEqual([(c['op'], c['id']) for c in other.changes_since('products', version)[1]],
+                         [('insert', 2), ('update', 1), ('delete', 2)])
+        self.assertEqual(len(DataManager(cache=True).changes_since('products', version - 1)[1]), 4)
+    
+    def test_unlogged_writes_ask_for_resync(self):
+        """Test changes the change log never saw make clients reload in full"""
+        self.data_manager.create_product("Product 1", 10.00, 5)
+        version = self.data_manager.changes_since('products', 0)[0]
+        DataManager().create_product("Product 2", 20.00, 3)
+        os.remove('products.json.changes')
+        
+        self.assertEqual(self.data_manager.changes_since('products', version), (version + 1, None))
+        self.data_manager.create_product("Product 3", 30.00, 7)
+        self.assertEqual([c['id'] for c in self.data_manager.changes_since('products', version + 1)[1]], [3])
+
+class TestJournaledDataManager(TestDataManager):
+    """Run the CRUD tests again against the append-only journal mode"""
+    
+    def setUp(self):
+        """Set up test environment with a journaled data manager"""
+        super().setUp()
+        self.data_manager = DataManager(journal=True, compact_threshold=100)
+    
+    def read_log(self, filename='products.json.log'):
+        """Return the decoded entries of a journal file"""
+        with open(filename) as f:
+            return [json.loads(line) for line in f]
+    
+    def test_mutations_append_to_log(self):
+        """Test that writes go to the log and leave the snapshot untouched"""
+        product = self.data_manager.create_product("Product 1", 10.00, 5)
+        self.data_manager.update_product(product['id'], {'stock': 4})
+        self.data_manager.delete_product(product['id'])
+        
+        with open('products.json') as f:
+            self.assertEqual(json.load(f), [])
+        entries = self.read_log()
+        self.assertEqual([e['op'] for e in entries], ['put', 'put', 'delete'])
+        self.assertEqual(entries[1]['record']['stock'], 4)
+        self.assertEqual(entries[2]['id'], product['id'])
+    
+    def test_startup_replays_snapshot_and_log(self):
+        """Test that a new manager sees snapshot plus logged mutations"""
+        self.data_manager.create_product("Product 1", 10.00, 5)
+        self.data_manager.create_product("Product 2", 20.00, 3)
+        self.data_manager.update_product(1, {'name': 'Renamed'})
+        self.data_manager.delete_product(2)
+        
+        reopened = DataManager(journal=True)
+        products = reopened.get_all_products()
+        self.assertEqual([(p['id'], p['name']) for p in products], [(1, 'Renamed')])
+        self.assertEqual(reopened.create_product("Product 3", 30.00, 7)['id'], 3)
+    
+    def test_compaction_folds_log_into_snapshot(self):
+        """Test that reaching the threshold rewrites the snapshot and empties the log"""
+        manager = DataManager(journal=True, compact_threshold=3)
+        for i in range(3):
+            manager.create_product(f"Product {i}", 10.00, i)
+        
+        with open('products.json') as f:
+            self.assertEqual(len(json.load(f)), 3)
+        self.assertEqual(os.path.getsize('products.json.log'), 0)
+        
+        manager.create_product("Product 3", 10.00, 3)
+        self.assertEqual(len(self.read_log()), 1)
+        self.assertEqual(len(DataManager(journal=True).get_all_products()), 4)
+    
+    def test_torn_log_tail_is_ignored(self):
+        """Test that a partially written final entry is skipped and overwritten"""
+        self.data_manager.create_product("Product 1", 10.00, 5)
+        with open('products.json.log', 'a') as f:
+            f.write('{"op":"put","record":{"id":2,"na')
+        
+        reopened = DataManager(journal=True)
+        self.assertEqual(len(reopened.get_all_products()), 1)
+        reopened.create_product("Product 2", 20.00, 3)
+        self.assertEqual([e['record']['id'] for e in self.read_log()], [1, 2])
+    
+    def test_short_writes_are_completed(self):
+        """Test that an append os.write cuts short is finished rather than padded"""
+        original_write = os.write
+        os.write = lambda fd, data: original_write(fd, bytes(data[:7]))
+        try:
+            self.data_manager.create_product("Product 1", 10.00, 5)
+        finally:
+            os.write = original_write
+        
+        self.assertEqual([e['record']['name'] for e in self.read_log()], ["Product 1"])
+        self.assertEqual(len(DataManager(journal=True).get_all_products()), 1)
+    
+    def test_failed_append_is_cut_off(self):
+        """Test that an append failing part-way raises and leaves no partial entry"""
+        self.data_manager.create_product("Product 1", 10.00, 5)
+        size = os.path.getsize('products.json.log')
+        original_write = os.write
+        def failing_write(fd, data):
+            if len(data) > 7:
+                return original_write(fd, bytes(data[:7]))
+            raise OSError(errno.ENOSPC, "No space left on device")
+        os.write = failing_write
+        try:
+            with self.assertRaises(OSError):
+                self.data_manager.create_product("Product 2", 20.00, 3)
+        finally:
+            os.write = original_write
+        
+        self.assertEqual(os.path.getsize('products.json.log'), size)
+        self.assertEqual(self.data_manager.create_product("Product 3", 30.00, 7)['id'], 2)
+        self.assertEqual([e['record']['name'] for e in self.read_log()], ["Product 1", "Product 3"])
+    
+    def test_picks_up_entries_appended_by_another_manager(self):
+        """Test that a cached manager replays entries appended elsewhere"""
+        self.data_manager.create_customer("John Doe", "john@example.com", "123-456-7890")
+        other = DataManager(journal=True)
+        other.create_customer("Jane Smith", "jane@example.com", "098-765-4321")
+        
+        customers = self.data_manager.get_all_customers()
+        self.assertEqual([c['name'] for c in customers], ['John Doe', 'Jane Smith'])
+    
+    def test_change_log_replays_another_managers_entries(self):
+        """Test entries appended by another manager reach the change log one by one"""
+        self.data_manager.create_customer("John Doe", "john@example.com", "123-456-7890")
+        version = self.data_manager.changes_since('customers', 0)[0]
+        other = DataManager(journal=True)
+        other.create_customer("Jane Smith", "jane@example.com", "098-765-4321")
+        other.update_customer(1, {'phone': '555'})
+        
+        current, changes = self.data_manager.changes_since('customers', version)
+        self.assertEqual(current, version + 2)
+        self.assertEqual([(c['op'], c['id']) for c in changes], [('insert', 2), ('update', 1)])
+        self.assertEqual(changes[1]['record']['phone'], '555')
+    
+    def test_plain_manager_folds_leftover_log(self):
+        """Test that switching back to the rewrite mode keeps logged data"""
+        self.data_manager.create_product("Product 1", 10.00, 5)
+        
+        manager = DataManager()
+        self.assertFalse(os.path.exists('products.json.log'))
+        self.assertEqual(len(manager.get_all_products()), 1)
+
+class TestChangeLog(unittest.TestCase):
+    """The bounded log behind changes_since"""
+    
+    def test_trims_whole_versions(self):
+        """Test trimming keeps the newest entries and moves the floor past whole versions"""
+        log = ChangeLog(capacity=3)
+        log.record(5, [('insert', 1)])
+        log.record(6, [('insert', 2), ('insert', 3)])
+        self.assertEqual(log.since(4), [(5, 'insert', 1), (6, 'insert', 2), (6, 'insert', 3)])
+        self.assertIsNone(log.since(3))
+        
+        log.record(7, [('update', 2), ('delete', 3)])
+        self.assertEqual(log.floor, 6)
+        self.assertIsNone(log.since(5))
+        self.assertEqual(log.since(6), [(7, 'update', 2), (7, 'delete', 3)])
+    
+    def test_gap_restarts_history(self):
+        """Test an unexplained version jump drops what came before it"""
+        log = ChangeLog()
+        log.record(1, [('insert', 1)])
+        log.record(4, [('insert', 2)])
+        self.assertIsNone(log.since(1))
+        self.assertEqual(log.since(3), [(4, 'insert', 2)])
+        log.record(5, [('update', 2)])
+        self.assertEqual(log.since(3), [(4, 'insert', 2), (5, 'update', 2)])
+    
+    def test_shared_file(self):
+        """Test logs on one file see each other's writes, and trimming rewrites the file"""
+        test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, test_dir)
+        path = os.path.join(test_dir, 'products.json.changes')
+        first, second = ChangeLog(capacity=2, path=path), ChangeLog(capacity=2, path=path)
+        first.record(1, [('insert', 1)])
+        second.record(2, [])
+        first.record(3, [('update', 1)])
+        second.refresh()
+        self.assertEqual(second.since(0), [(1, 'insert', 1), (3, 'update', 1)])
+        
+        # Each log rewrites the file once it holds twice its capacity in lines
+        first.record(4, [('delete', 1)])
+        second.record(5, [('insert', 2)])
+        with open(path) as f:
+            self.assertEqual(f.read().splitlines(), ['[4, [["delete", 1]]]', '[5, [["insert", 2]]]'])
+        first.refresh()
+        self.assertEqual((first.floor, first.since(3)), (3, [(4, 'delete', 1), (5, 'insert', 2)]))
+        restarted = ChangeLog(path=path)
+        restarted.refresh()
+        self.assertEqual(restarted.since(3), first.since(3))
+        
+        # A line torn by a crash is skipped, and the gap it leaves restarts the history
+        with open(path, 'a') as f:
+            f.write('[6, [["upd')
+        first.record(7, [('insert', 3)])
+        restarted = ChangeLog(path=path)
+        restarted.refresh()
+        self.assertEqual((restarted.since(6), restarted.since(5)), ([(7, 'insert', 3)], None))
+    
+    def test_net_changes(self):
+        """Test folding events keeps one net outcome per id"""
+        record = {'id': 2, 'name': 'Back'}
+        changes = [{'op': 'update', 'id': 1, 'record': {'id': 1}}, {'op': 'delete', 'id': 1},
+                   {'op': 'delete', 'id': 2}, {'op': 'insert', 'id': 2, 'record': record},
+                   {'op': 'insert', 'id': 3, 'record': {'id': 3}}, {'op': 'delete', 'id': 3}]
+        self.assertEqual(net_changes(changes), {'inserted': [], 'updated': [record], 'deleted': [1]})
+
+class TestJsonStreaming(unittest.TestCase):
+    """Incremental decoding of the JSON snapshot files"""
+    
+    def setUp(self):
+        """Set up test environment with temporary directory"""
+        self.test_dir = tempfile.mkdtemp()
+        self.original_dir = os.getcwd()
+        os.chdir(self.test_dir)
+        
+        self.data_manager = DataManager()
+    
+    def tearDown(self):
+        """Clean up test environment"""
+        os.chdir(self.original_dir)
+        shutil.rmtree(self.test_dir)
+    
+    def write_raw(self, text):
+        """Write raw text to products.json"""
+        with open('products.json', 'w') as f:
+            f.write(text)
+    
+    def test_iter_matches_json_load_across_chunk_boundaries(self):
+        """Test records split at every possible chunk boundary decode correctly"""
+        products = [
+            {'id': 1, 'name': 'Cable [3m], "braided"', 'price': 9.5, 'stock': 12},
+            {'id': 2, 'name': 'Café \\ Kettle {}', 'price': 1e3, 'stock': 0},
+            {'id': 3, 'name': '', 'price': 0, 'stock': 100000},
+        ]
+        with open('products.json', 'w') as f:
+            json.dump(products, f, indent=2)
+        
+        for chunk_size in (1, 2, 7, 64, 65536):
+            records = list(self.data_manager._iter_json_file('products.json', chunk_size))
+            self.assertEqual(records, products)
+        self.assertEqual(list(self.data_manager.iter_products()), products)
+    
+    def test_iter_empty_files(self):
+        """Test empty arrays, blank and missing files yield nothing"""
+        for text in ('[]', ' [ ] ', ''):
+            self.write_raw(text)
+            self.assertEqual(list(self.data_manager.iter_products()), [])
+        os.remove('products.json')
+        self.assertEqual(list(self.data_manager.iter_products()), [])
+    
+    def test_iter_truncated_file_raises(self):
+        """Test a truncated array raises rather than ending quietly"""
+        self.write_raw('[{"id": 1, "name": "A", "price": 1, "stock": 1}, {"id": 2, "na')
+        with self.assertRaises(json.JSONDecodeError):
+            list(self.data_manager._iter_json_file('products.json', 8))
+
+class TestDurability(unittest.TestCase):
+    """Crash-safety of the JSON snapshot writes"""
+    
+    def setUp(self):
+        """Set up test environment with temporary directory"""
+        self.test_dir = tempfile.mkdtemp()
+        self.original_dir = os.getcwd()
+        os.chdir(self.test_dir)
+        
+        self.data_manager = DataManager(cache=True)
+    
+    def tearDown(self):
+        """Clean up test environment"""
+        os.chdir(self.original_dir)
+        shutil.rmtree(self.test_dir)
+    
+    def test_failed_write_keeps_previous_file(self):
+        """Test that an error mid-dump leaves the old file and no temp files"""
+        self.data_manager.create_product("Product 1", 10.00, 5)
+        
+        with self.assertRaises(TypeError):
+            self.data_manager.create_product("Broken", object(), 1)
+        
+        with open('products.json') as f:
+            self.assertEqual([p['name'] for p in json.load(f)], ["Product 1"])
+        self.assertEqual([p['name'] for p in self.data_manager.get_all_products()], ["Product 1"])
+        self.assertEqual([name for name in os.listdir('.') if name.endswith('.tmp')], [])
+    
+    def test_corrupt_file_is_not_treated_as_empty(self):
+        """Test that a corrupt snapshot raises instead of reading as []"""
+        with open('products.json', 'w') as f:
+            f.write('[{"id": 1, "name": "Trunc')
+        
+        with self.assertRaises(json.JSONDecodeError):
+            self.data_manager.get_all_products()
+        with self.assertRaises(json.JSONDecodeError):
+            self.data_manager.create_product("Product 2", 20.00, 3)
+        
+        with open('products.json') as f:
+            self.assertEqual(f.read(), '[{"id": 1, "name": "Trunc')
+
+class TestGroupCommitDataManager(TestDataManager):
+    """Run the CRUD tests again with group commit enabled"""
+    
+    def setUp(self):
+        """Set up test environment with group commit"""
+        super().setUp()
+        self.data_manager = DataManager(cache=True, group_commit_ms=2)
+    
+    def test_concurrent_writes_share_one_flush(self):
+        """Test that writers arriving together are persisted with fewer writes"""
+        writes = []
+        original_write = self.data_manager._write_json_file
+        def counting_write(filename, data):
+            writes.append(filename)
+            original_write(filename, data)
+        self.data_manager._write_json_file = counting_write
+        
+        barrier = threading.Barrier(20)
+        def worker():
+            barrier.wait()
+            self.data_manager.create_product("Item", 1.0, 1)
+        threads = [threading.Thread(target=worker) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertLess(len(writes), 20)
+        with open('products.json') as f:
+            self.assertEqual(sorted(p['id'] for p in json.load(f)), list(range(1, 21)))
+    
+    def test_failed_mutation_does_not_fail_the_group(self):
+        """Test that a mutation failing part-way fails only its caller and is not persisted"""
+        self.data_manager.create_product("Product 1", 10.00, 5)
+        def create(name):
+            def apply(products):
+                product = products.insert(self.data_manager._new_product(name, 1.0, 1))
+                return product, [('insert', product)]
+            return apply
+        def create_then_fail(products):
+            products.insert(self.data_manager._new_product("Half", 1.0, 1))
+            raise OverflowError("failed after inserting")
+        batch = [PendingMutation(create("Ok")), PendingMutation(create_then_fail), PendingMutation(create("Also ok"))]
+        self.data_manager._commit_batch('products.json', batch)
+        
+        self.assertEqual([pending.result['id'] for pending in (batch[0], batch[2])], [2, 3])
+        self.assertIsInstance(batch[1].error, OverflowError)
+        self.assertIsNone(batch[0].error)
+        with open('products.json') as f:
+            self.assertEqual([p['name'] for p in json.load(f)], ["Product 1", "Ok", "Also ok"])
+        self.assertEqual([p['name'] for p in self.data_manager.get_all_products()], ["Product 1", "Ok", "Also ok"])
+        self.assertEqual(self.data_manager.create_product("Product 4", 1.0, 1)['id'], 4)
+
+class TestShardedDataManager(TestDataManager):
+    """Run the CRUD tests again with each collection split into shard files"""
+    
+    def setUp(self):
+        """Set up test environment with two ids per shard"""
+        super().setUp()
+        self.data_manager = DataManager(shard_size=2)
+    
+    def shard_files(self, directory='products.shards'):
+        """Return the shard file names present"""
+        return sorted(name for name in os.listdir(directory) if name != 'manifest.json')
+    
+    def test_files_creation(self):
+        """Test that shard directories and manifests are created"""
+        self.assertFalse(os.path.exists('products.json'))
+        with open('products.shards/manifest.json') as f:
+            self.assertEqual(json.load(f), {'shard_size': 2, 'next_id': 1})
+        self.assertTrue(os.path.exists('customers.shards/manifest.json'))
+    
+    def test_writes_rewrite_only_their_shard(self):
+        """Test that an update replaces one shard file and a delete can remove one"""
+        for i in range(5):
+            self.data_manager.create_product(f"Product {i}", 10.00, i)
+        self.assertEqual(self.shard_files(), ['000000.json', '000001.json', '000002.json'])
+        
+        writes = []
+        original_write = self.data_manager._write_json_file
+        def counting_write(filename, data):
+            writes.append(filename)
+            original_write(filename, data)
+        self.data_manager._write_json_file = counting_write
+        
+        self.data_manager.update_product(3, {'stock': 9})
+        self.assertEqual(writes, [os.path.join('products.shards', '000001.json')])
+        self.data_manager.delete_product(1)
+        self.assertEqual(self.shard_files(), ['000001.json', '000002.json'])
+        self.assertEqual(self.data_manager.create_product("Product 5", 10.00, 5)['id'], 6)
+    
+    def test_point_operations_read_one_shard(self):
+        """Test that single-record reads and writes never open other shards"""
+        for i in range(4):
+            self.data_manager.create_product(f"Product {i}", 10.00, i)
+        with open(os.path.join('products.shards', '000000.json'), 'w') as f:
+            f.write('not json')
+        
+        self.assertEqual(self.data_manager.get_product(3)['name'], "Product 2")
+        self.assertEqual(self.data_manager.update_product(2, {'stock': 7})['stock'], 7)
+        self.assertEqual(self.data_manager.create_product("Product 4", 10.00, 4)['id'], 5)
+        with self.assertRaises(json.JSONDecodeError):
+            self.data_manager.get_all_products()
+    
+    def test_split_and_join_existing_files(self):
+        """Test that switching sharding on and off keeps the data"""
+        manager = DataManager()
+        for i in range(3):
+            manager.create_product(f"Product {i}", 10.00, i)
+        expected = DataManager().get_all_products()
+        
+        sharded = DataManager(shard_size=2)
+        self.assertFalse(os.path.exists('products.json'))
+        self.assertEqual(sharded.get_all_products(), expected)
+        self.assertEqual(list(sharded.iter_products()), expected)
+        
+        joined = DataManager()
+        self.assertFalse(os.path.exists('products.shards'))
+        self.assertEqual(joined.get_all_products(), expected)
+    
+    def test_parallel_scans_match_loaded_collection(self):
+        """Test that stats and search scanned in worker processes match a full load"""
+        for i in range(7):
+            self.data_manager.create_product(f"Product {i % 3}", 1.5 * (7 - i), i)
+            self.data_manager.create_customer(f"Customer {i}", f"c{i}@example.com", "555-0100")
+        self.data_manager.delete_product(4)
+        expected = brute_force_summary(self.data_manager.get_all_products(),
+                                       self.data_manager.get_all_customers())
+        
+        self.data_manager.scanner = ScanExecutor(workers=2)
+        try:
+            self.assertEqual(self.data_manager.get_summary_stats(), expected)
+            self.assertEqual([p['id'] for p in self.data_manager.search_products('product 1', 'price')], [5, 2])
+            self.assertEqual([c['id'] for c in self.data_manager.search_customers('example', 'name')],
+                             list(range(1, 8)))
+        finally:
+            self.data_manager.scanner.shutdown()
+    
+    def test_cached_reload_reads_only_changed_shards(self):
+        """Test that a cached manager re-reads just the shards another manager rewrote"""
+        cached = DataManager(cache=True, shard_size=2)
+        for i in range(4):
+            cached.create_product(f"Product {i}", 10.00, i)
+        
+        collection = cached._cache['products.json']
+        unchanged = collection.shards[0]
+        
+        self.data_manager.update_product(4, {'stock': 9})
+        self.data_manager.delete_product(3)
+        self.data_manager.create_product("Product 4", 10.00, 4)
+        
+        self.assertEqual([(p['id'], p['stock']) for p in cached.get_all_products()],
+                         [(1, 0), (2, 1), (4, 9), (5, 4)])
+        self.assertEqual(cached.search_products('product 3', 'name')[0]['stock'], 9)
+        self.assertEqual(cached.create_product("Product 5", 10.00, 5)['id'], 6)
+        self.assertIs(cached._cache['products.json'], collection)
+        self.assertEqual(collection.shards[0], unchanged)
+
+class TestSnapshotDataManager(TestDataManager):
+    """Run the CRUD tests again with each collection stored as a binary snapshot"""
+    
+    def setUp(self):
+        """Set up test environment with snapshot files"""
+        super().setUp()
+        self.data_manager = DataManager(snapshot=True)
+    
+    def test_files_creation(self):
+        """Test that snapshots replace the JSON files"""
+        self.assertTrue(os.path.exists('products.snap'))
+        self.assertTrue(os.path.exists('customers.snap'))
+        self.assertFalse(os.path.exists('products.json'))
+    
+    def test_convert_existing_files(self):
+        """Test that switching snapshots on and off keeps the data"""
+        manager = DataManager()
+        manager.create_product("Zoë's Cable", 10, 5)
+        manager.create_product("Product 2", 2.5, 0)
+        manager.delete_product(1)
+        self.assertFalse(os.path.exists('products.snap'))
+        expected = manager.get_all_products()
+        
+        snapshotted = DataManager(snapshot=True)
+        self.assertFalse(os.path.exists('products.json'))
+        self.assertEqual(snapshotted.get_all_products(), expected)
+        self.assertEqual(list(snapshotted.iter_products()), expected)
+        self.assertEqual(snapshotted.create_product("Product 3", 1.0, 1)['id'], 3)
+        
+        joined = DataManager()
+        self.assertFalse(os.path.exists('products.snap'))
+        self.assertEqual([p['id'] for p in joined.get_all_products()], [2, 3])
+        self.assertIsInstance(joined.get_product(2)['price'], float)
+    
+    def test_extra_fields_survive_conversion_and_writes(self):
+        """Test fields beyond the record type's go into the snapshot and come back out"""
+        with open('customers.json', 'w') as f:
+            json.dump([{'id': 1, 'name': 'John Doe', 'email': 'john@example.com', 'phone': '1'},
+                       {'id': 2, 'name': 'Jane Smith', 'email': 'jane@example.com', 'phone': '2',
+                        'notes': {'vip': True}}], f)
+        os.remove('customers.snap')
+        
+        manager = DataManager(cache=True, snapshot=True)
+        manager.update_customer(1, {'phone': '555'})
+        self.assertEqual(manager.get_customer(2)['notes'], {'vip': True})
+        self.assertEqual(DataManager(snapshot=True).get_customer(2)['notes'], {'vip': True})
+        customers = DataManager().get_all_customers()
+        self.assertEqual([c.get('notes') for c in customers], [None, {'vip': True}])
+    
+    def test_records_decoded_on_demand(self):
+        """Test that a cached load decodes only the records that are read"""
+        for i in range(5):
+            self.data_manager.create_product(f"Product {i}", 1.0 + i, i)
+        cached = DataManager(cache=True, snapshot=True)
+        decoded = []
+        records = cached._snapshot_records('products.json')
+        original_decode = records.decode
+        def counting_decode(values):
+            decoded.append(values[0])
+            return original_decode(values)
+        records.decode = counting_decode
+        open_records = cached._snapshot_records
+        cached._snapshot_records = lambda filename: records if filename == 'products.json' else open_records(filename)
+        
+        self.assertEqual(cached.get_product(4)['name'], "Product 3")
+        self.assertEqual(decoded, [4])
+        self.assertEqual(cached.get_summary_stats()['total_inventory_value'], 40.0)
+        self.assertEqual(sorted(set(decoded)), [1, 2, 3, 4, 5])
+    
+    def test_cached_export_decodes_as_it_streams(self):
+        """Test that a cached export decodes records as they are reached and ignores later writes"""
+        for i in range(5):
+            self.data_manager.create_product(f"Product {i}", 1.0 + i, i)
+        cached = DataManager(journal=True, snapshot=True)
+        cached.update_product(2, {'name': 'Renamed'})
+        records = cached._cache['products.json'].by_id
+        decoded = []
+        original_decode = records.decode
+        def counting_decode(values):
+            decoded.append(values[0])
+            return original_decode(values)
+        records.decode = counting_decode
+        
+        exported = cached.iter_products()
+        self.assertEqual(decoded, [])
+        cached.delete_product(3)
+        decoded.clear()
+        self.assertEqual(next(exported)['id'], 1)
+        self.assertEqual(decoded, [1])
+        self.assertEqual([(p['id'], p['name']) for p in exported][:2], [(2, 'Renamed'), (3, 'Product 2')])
+    
+    def test_journal_compacts_into_snapshot(self):
+        """Test that journaled writes reach the snapshot on compaction, and reads in between see them"""
+        manager = DataManager(journal=True, compact_threshold=3, snapshot=True)
+        for i in range(2):
+            manager.create_product(f"Product {i}", 10.00, i)
+        self.assertEqual(len(Snapshot('products.snap')), 0)
+        self.assertEqual(len(DataManager(journal=True, snapshot=True).get_all_products()), 2)
+        
+        manager.update_product(1, {'stock': 9})
+        self.assertEqual(os.path.getsize('products.json.log'), 0)
+        self.assertEqual(DataManager(snapshot=True).get_product(1)['stock'], 9)
+        self.assertFalse(manager._cache['products.json'].by_id.changed)
+        manager.delete_product(2)
+        self.assertEqual([p['id'] for p in manager.get_all_products()], [1])
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import io
+import os
+import tempfile
+import shutil
+from data_manager import DataManager
+from import_data import open_store
+from importer import import_records, read_rows
+
+class TestReadRows(unittest.TestCase):
+    
+    def test_csv_rows_and_line_numbers(self):
+        """Test CSV rows are numbered by the line they start on"""
+        data = '﻿name,price,stock\r\nCable,4.5,40\r\n"Two\nlines",1,1\r\nPlug,2,2\r\n'.encode()
+        rows = list(read_rows(io.BytesIO(data), 'csv'))
+        self.assertEqual([line for line, _, _ in rows], [2, 3, 5])
+        self.assertEqual(rows[0][1], {'name': 'Cable', 'price': '4.5', 'stock': '40'})
+        self.assertEqual(rows[1][1]['name'], 'Two\nlines')
+    
+    def test_undecodable_lines_are_reported(self):
+        """Test a line that is not UTF-8 is an error for that row only"""
+        data = b'name,price,stock\nCable,1,1\n\xff\xfe,1,1\nPlug,2,2\n'
+        rows = list(read_rows(io.BytesIO(data), 'csv'))
+        self.assertEqual([(line, error) for line, _, error in rows],
+                         [(2, None), (3, 'Invalid UTF-8'), (4, None)])
+    
+    def test_ndjson_rows(self):
+        """Test NDJSON skips blank lines and reports unparseable ones"""
+        data = b'{"name": "Cable"}\n\n{oops\n[1]\n'
+        self.assertEqual(list(read_rows(io.BytesIO(data), 'ndjson')), [
+            (1, {'name': 'Cable'}, None),
+            (3, None, 'Invalid JSON'),
+            (4, [1], None),
+        ])
+
+class TestImportRecords(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test environment with temporary directory"""
+        self.test_dir = tempfile.mkdtemp()
+        self.original_dir = os.getcwd()
+        os.chdir(self.test_dir)
+        
+        self.data_manager = DataManager(cache=True)
+    
+    def tearDown(self):
+        """Clean up test environment"""
+        os.chdir(self.original_dir)
+        shutil.rmtree(self.test_dir)
+    
+    def test_bad_rows_do_not_stop_the_import(self):
+        """Test valid rows are created in chunks and bad rows reported by line"""
+        lines = ['name,price,stock'] + [f'Item {i},{i}.5,{i}' for i in range(1, 8)]
+        lines[3] = 'Broken,free,1'
+        lines[6] = ',1,1'
+        data = ('\n'.join(lines) + '\n').encode()
+        
+        summary = import_records(self.data_manager, 'products', io.BytesIO(data), 'csv', chunk_size=3)
+        self.assertEqual(summary, {
+            'imported': 5, 'rejected': 2, 'batches': 3,
+            'errors': [
+                {'line': 4, 'error': 'Invalid data types: price must be a number, stock must be an integer'},
+                {'line': 7, 'error': 'Product name cannot be empty'},
+            ],
+        })
+        products = self.data_manager.get_all_products()
+        self.assertEqual([p['id'] for p in products], [1, 2, 3, 4, 5])
+        self.assertEqual(products[0], {'id': 1, 'name': 'Item 1', 'price': 1.5, 'stock': 1})
+        self.assertEqual([p['name'] for p in products][2:], ['Item 4', 'Item 5', 'Item 7'])
+    
+    def test_import_customers_ndjson(self):
+        """Test customers import from NDJSON with the create_customer rules"""
+        data = (b'{"name": "John Doe", "email": "john@example.com", "phone": "555-0100"}\n'
+                b'{"name": "Jane Smith", "email": "jane.example.com", "phone": "555-0101"}\n')
+        summary = import_records(self.data_manager, 'customers', io.BytesIO(data), 'ndjson')
+        self.assertEqual(summary['imported'], 1)
+        self.assertEqual(summary['errors'], [{'line': 2, 'error': 'Invalid email format'}])
+        self.assertEqual(self.data_manager.get_customer(1)['email'], 'john@example.com')
+    
+    def test_server_write_during_cli_import(self):
+        """Test that a server write between import chunks keeps its record and id"""
+        self.data_manager.create_product("Existing", 1.0, 1)
+        store = open_store()
+        web_ids = []
+        apply_batch = store.apply_product_batch
+        def apply_then_serve(operations):
+            results = apply_batch(operations)
+            if not web_ids:
+                web_ids.append(self.data_manager.create_product("Web", 2.0, 2)['id'])
+            return results
+        store.apply_product_batch = apply_then_serve
+        
+        data = ''.join(f'{{"name": "Imp{i}", "price": 1, "stock": 1}}\n' for i in range(4)).encode()
+        import_records(store, 'products', io.BytesIO(data), 'ndjson', chunk_size=2)
+        store.compact()
+        
+        expected = [(1, 'Existing'), (2, 'Imp0'), (3, 'Imp1'), (4, 'Web'), (5, 'Imp2'), (6, 'Imp3')]
+        self.assertEqual(web_ids, [4])
+        self.assertEqual([(p['id'], p['name']) for p in DataManager().get_all_products()], expected)
+        self.assertEqual([(p['id'], p['name']) for p in self.data_manager.get_all_products()], expected)
+
+if __name__ == '__main__':
+    unittest.main()
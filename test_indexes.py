@@ -0,0 +1,201 @@
+import unittest
+import math
+import random
+from fractions import Fraction
+import indexes
+from data_manager import Collection
+from columns import COLUMNS_AVAILABLE, ProductColumns, band_totals_python
+from indexes import CustomerSearch, ProductOrder, ProductSearch, ProductStats
+
+class TestTrigramIndex(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up a customer collection with a search index"""
+        self.customers = Collection([
+            {'id': 1, 'name': 'John Doe', 'email': 'john@example.com', 'phone': '1'},
+            {'id': 2, 'name': 'Jane Smith', 'email': 'jane@example.org', 'phone': '2'},
+        ], index_types=(CustomerSearch,))
+        self.index = self.customers.indexes[CustomerSearch]
+    
+    def search_ids(self, query):
+        return sorted(c['id'] for c in self.index.search(query))
+    
+    def test_search_fields(self):
+        """Test queries match names and emails case-insensitively"""
+        self.assertEqual(self.search_ids("DOE"), [1])
+        self.assertEqual(self.search_ids("example"), [1, 2])
+        self.assertEqual(self.search_ids("sm"), [2])
+        self.assertEqual(self.search_ids("xyz"), [])
+        self.assertEqual(self.search_ids("doejohn"), [])
+    
+    def test_scans(self):
+        """Test which queries fall back to checking every record"""
+        self.customers.insert({'id': None, 'name': 'Bob Stone', 'email': 'bob@work.com', 'phone': '3'})
+        for i in range(8):
+            self.customers.insert({'id': None, 'name': f'Ann {i}', 'email': f'ann{i}@work.com', 'phone': '4'})
+        self.assertTrue(self.index.scans("jo"))
+        self.assertTrue(self.index.scans("work"))
+        self.assertFalse(self.index.scans("example"))
+        self.assertFalse(self.index.scans("xyz"))
+    
+    def test_postings_rebuilt_after_churn(self):
+        """Test stale entries are dropped once they outnumber live records"""
+        self.assertIsNone(self.index.postings)
+        self.assertEqual(self.search_ids("john"), [1])
+        for i in range(1100):
+            self.customers.put({'id': 1, 'name': f'John {i}', 'email': 'john@example.com', 'phone': '1'})
+        self.assertLess(self.index.stale, 1100)
+        self.assertLess(len(self.index.postings['joh']), 1100)
+        self.assertEqual(self.search_ids("john 1099"), [1])
+        self.assertEqual(self.search_ids("john 1098"), [])
+    
+    def test_matches_brute_force(self):
+        """Test random churn against a plain substring scan"""
+        rng = random.Random(7)
+        words = ['alpha', 'beta', 'gamma', 'delta', 'omega', 'sigma']
+        products = Collection([], index_types=(ProductSearch,))
+        for _ in range(500):
+            action = rng.random()
+            if action < 0.5 or not products.by_id:
+                products.insert({'id': None, 'name': ' '.join(rng.sample(words, 2)), 'price': 1.0, 'stock': 1})
+            elif action < 0.8:
+                product_id = rng.choice(list(products.by_id))
+                products.put({'id': product_id, 'name': rng.choice(words), 'price': 1.0, 'stock': 1})
+            else:
+                products.remove(rng.choice(list(products.by_id)))
+        
+        index = products.indexes[ProductSearch]
+        for query in ['ALPHA', 'a b', 'ma', 'ga', 'gamma delta', 'zeta']:
+            expected = sorted(p['id'] for p in products.records() if query.lower() in p['name'].lower())
+            self.assertEqual(sorted(p['id'] for p in index.search(query)), expected)
+
+class TestSortedIndex(unittest.TestCase):
+    
+    def test_matches_sorted_after_churn(self):
+        """Test every maintained order against sorting from scratch"""
+        rng = random.Random(11)
+        products = Collection([], index_types=(ProductOrder,))
+        index = products.indexes[ProductOrder]
+        for sort_by in index.sort_keys:
+            index.entries(sort_by)
+        for _ in range(500):
+            action = rng.random()
+            record = {'id': None, 'name': rng.choice('abcXYZ') * 3, 'price': rng.randint(1, 20) / 2,
+                      'stock': rng.randint(0, 30)}
+            if action < 0.5 or not products.by_id:
+                products.insert(record)
+            elif action < 0.8:
+                record['id'] = rng.choice(list(products.by_id))
+                products.put(record)
+            else:
+                products.remove(rng.choice(list(products.by_id)))
+        
+        for sort_by, key in index.sort_keys.items():
+            expected = sorted((key(p), p['id']) for p in products.records())
+            self.assertEqual(index.entries(sort_by), expected)
+        in_range = [entry for entry in index.entries('stock') if 5 <= entry[0] <= 10]
+        self.assertEqual(index.range('stock', 5, 10), in_range)
+    
+    def test_nan_key_does_not_delete_other_entries(self):
+        """Test removing a NaN-priced record leaves the other records in the price order"""
+        products = Collection([{'id': i, 'name': 'p', 'price': float(i), 'stock': 1} for i in range(1, 6)],
+                              index_types=(ProductOrder,))
+        index = products.indexes[ProductOrder]
+        index.entries('price')
+        products.put({'id': 3, 'name': 'p', 'price': float('nan'), 'stock': 1})
+        products.remove(3)
+        self.assertEqual([product_id for _, product_id in index.entries('price')], [1, 2, 4, 5])
+
+class TestProductStats(unittest.TestCase):
+    
+    def test_cheapest_and_dearest_follow_changes(self):
+        """Test min and max survive deleting and repricing the extremes"""
+        products = Collection([
+            {'id': 1, 'name': 'A', 'price': 5.0, 'stock': 1},
+            {'id': 2, 'name': 'B', 'price': 1.0, 'stock': 10},
+            {'id': 3, 'name': 'C', 'price': 9.0, 'stock': 3},
+        ], index_types=(ProductStats,))
+        stats = products.indexes[ProductStats]
+        self.assertEqual((stats.cheapest()['id'], stats.most_expensive()['id']), (2, 3))
+        
+        products.remove(3)
+        products.put({'id': 2, 'name': 'B', 'price': 7.0, 'stock': 10})
+        self.assertEqual((stats.cheapest()['id'], stats.most_expensive()['id']), (1, 2))
+        self.assertEqual(stats.low_stock, 1)
+        self.assertEqual(float(stats.value_sum), 75.0)
+    
+    def test_build_publishes_finished_heaps(self):
+        """Test a build running alongside readers never shows them an unsorted heap"""
+        products = Collection([
+            {'id': 1, 'name': 'A', 'price': 5.0, 'stock': 1},
+            {'id': 2, 'name': 'B', 'price': 1.0, 'stock': 10},
+            {'id': 3, 'name': 'C', 'price': 9.0, 'stock': 3},
+        ], index_types=(ProductStats,))
+        stats = products.indexes[ProductStats]
+        seen = []
+        
+        def heapify(heap):
+            seen.append((stats.cheapest()['id'], stats.most_expensive()['id']))
+            original(heap)
+        
+        stats.warm()
+        original, indexes.heapq.heapify = indexes.heapq.heapify, heapify
+        try:
+            stats._build()
+        finally:
+            indexes.heapq.heapify = original
+        self.assertEqual(seen, [(2, 3), (2, 3)])
+    
+    def test_non_finite_values(self):
+        """Test inf and nan prices, and an overflowing stock value, count in the sums and come back out"""
+        products = Collection([
+            {'id': 1, 'name': 'A', 'price': 5.0, 'stock': 1},
+            {'id': 2, 'name': 'B', 'price': 1.0, 'stock': 10},
+        ], index_types=(ProductStats,))
+        stats = products.indexes[ProductStats]
+        self.assertEqual(float(stats.value_sum), 15.0)
+        
+        products.insert({'id': None, 'name': 'Huge', 'price': 1e308, 'stock': 10})
+        products.insert({'id': None, 'name': 'Nan', 'price': float('nan'), 'stock': 1})
+        self.assertTrue(math.isnan(stats.price_sum))
+        self.assertEqual(stats.most_expensive()['id'], 3)
+        self.assertEqual(stats.cheapest()['id'], 2)
+        
+        products.remove(4)
+        self.assertEqual(stats.value_sum, math.inf)
+        products.put({'id': 3, 'name': 'Huge', 'price': 2.0, 'stock': 10})
+        self.assertEqual((stats.price_sum, stats.value_sum), (Fraction(8), Fraction(35)))
+        self.assertEqual(stats.most_expensive()['id'], 1)
+
+@unittest.skipUnless(COLUMNS_AVAILABLE, "NumPy is not installed")
+class TestProductColumns(unittest.TestCase):
+    
+    def test_band_totals_follow_churn(self):
+        """Test vectorized band totals against the pure-Python pass through churn"""
+        rng = random.Random(5)
+        products = Collection([{'id': i, 'name': 'p', 'price': i / 4, 'stock': i % 30} for i in range(1, 40)],
+                              index_types=(ProductColumns,))
+        columns = products.indexes[ProductColumns]
+        bands = {'low': (None, 5), 'medium': (6, 20), 'high': (21, None), 'all': (None, None)}
+        columns.band_totals(bands)
+        for _ in range(3000):
+            action = rng.random()
+            record = {'id': None, 'name': 'p', 'price': rng.randint(1, 400) / 4, 'stock': rng.randint(0, 40)}
+            if action < 0.5 or not products.by_id:
+                products.insert(record)
+            elif action < 0.8:
+                record['id'] = rng.choice(list(products.by_id))
+                products.put(record)
+            else:
+                products.remove(rng.choice(list(products.by_id)))
+        
+        expected = band_totals_python(products.records(), bands)
+        actual = columns.band_totals(bands)
+        self.assertEqual(columns.size, len(products))
+        for name in bands:
+            self.assertEqual(actual[name][0], expected[name][0])
+            self.assertAlmostEqual(actual[name][1], expected[name][1], places=6)
+            self.assertAlmostEqual(actual[name][2], expected[name][2], places=6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from response_cache import ResponseCache
+
+class TestResponseCache(unittest.TestCase):
+    
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted first"""
+        cache = ResponseCache(max_entries=2)
+        cache.put('a', 1, b'A')
+        cache.put('b', 1, b'B')
+        self.assertEqual(cache.get('a', 1), b'A')
+        cache.put('c', 1, b'C')
+        
+        self.assertIsNone(cache.get('b', 1))
+        self.assertEqual(cache.get('a', 1), b'A')
+        self.assertEqual(cache.get('c', 1), b'C')
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['hits'], stats['misses'], stats['evictions']), (2, 3, 1, 1))
+    
+    def test_version_change_invalidates(self):
+        """Test an entry built from other versions is dropped, not served"""
+        cache = ResponseCache()
+        cache.put('search', [1, 5], b'old')
+        self.assertIsNone(cache.get('search', [2, 5]))
+        self.assertIsNone(cache.get('search', [1, 5]))
+        self.assertEqual(cache.stats()['invalidations'], 1)
+    
+    def test_limits(self):
+        """Test oversized bodies and a zero-size cache store nothing"""
+        cache = ResponseCache(max_body=3)
+        cache.put('big', 1, b'1234')
+        self.assertIsNone(cache.get('big', 1))
+        
+        disabled = ResponseCache(max_entries=0)
+        disabled.put('a', 1, b'A')
+        self.assertEqual(disabled.stats()['entries'], 0)
+        
+        cache.put('a', 1, b'A')
+        cache.clear()
+        self.assertEqual(cache.stats(), {'entries': 0, 'max_entries': 256, 'bytes': 0, 'hits': 0,
+                                         'misses': 0, 'evictions': 0, 'invalidations': 0})
+
+if __name__ == '__main__':
+    unittest.main()
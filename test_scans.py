@@ -0,0 +1,89 @@
+import unittest
+import math
+import os
+import shutil
+import sys
+import tempfile
+import types
+from fractions import Fraction
+from data_manager import Collection
+from indexes import ProductStats
+from scans import (PRODUCT_TOTAL_FIELDS, ProductTotals, ScanExecutor, match_columns, pack_column,
+                   summarize_products, unpack_column)
+
+class TestScanExecutor(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up a small catalogue with tied prices"""
+        self.products = Collection([
+            {'id': i, 'name': f'Product {i}', 'price': [4.5, 0.1, 9.99, 0.1, 9.99][i % 5], 'stock': i % 8}
+            for i in range(1, 41)
+        ], index_types=(ProductStats,))
+    
+    def test_threshold(self):
+        """Test that only large collections with several workers go to the pool"""
+        self.assertFalse(ScanExecutor(workers=1, threshold=10).parallel(100))
+        self.assertFalse(ScanExecutor(workers=4, threshold=1000).parallel(100))
+        self.assertTrue(ScanExecutor(workers=4, threshold=100).parallel(100))
+    
+    def test_chunked_totals_match_product_stats(self):
+        """Test that merged partial aggregates equal the maintained ones, ties included"""
+        stats = self.products.indexes[ProductStats]
+        executor = ScanExecutor(workers=3, threshold=1)
+        try:
+            partials = executor.scan(summarize_products, self.products, PRODUCT_TOTAL_FIELDS)
+            matches = executor.scan(match_columns, self.products, ('id', 'name'), '1')
+        finally:
+            executor.shutdown()
+        self.assertEqual(len(partials), 6)
+        totals = ProductTotals(partials, self.products.by_id)
+        self.assertEqual(totals.count, 40)
+        self.assertEqual((totals.low_stock, totals.price_sum, totals.value_sum),
+                         (stats.low_stock, stats.price_sum, stats.value_sum))
+        self.assertIs(totals.cheapest(), stats.cheapest())
+        self.assertIs(totals.most_expensive(), stats.most_expensive())
+        self.assertEqual([i for ids in matches for i in ids], [1] + list(range(10, 20)) + [21, 31])
+    
+    def test_workers_do_not_run_the_entry_point(self):
+        """Test spawned workers run this module as their main one, not the script that started the app"""
+        test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, test_dir)
+        marker = os.path.join(test_dir, 'imported')
+        script = os.path.join(test_dir, 'entry.py')
+        with open(script, 'w') as f:
+            f.write(f'open({marker!r}, "w").close()\n')
+        entry = types.ModuleType('__main__')
+        entry.__file__, entry.__spec__ = script, None
+        main, sys.modules['__main__'] = sys.modules['__main__'], entry
+        executor = ScanExecutor(workers=2)
+        try:
+            names = executor.map(eval, ["__import__('sys').modules['__main__'].__spec__.name"] * 2)
+        finally:
+            sys.modules['__main__'] = main
+            executor.shutdown()
+        self.assertEqual(names, ['scans', 'scans'])
+        self.assertFalse(os.path.exists(marker))
+    
+    def test_pack_column(self):
+        """Test that packed columns unpack to the same values"""
+        for values in (['Zoë', '', 'a b'], [1, 2, 3], [1, 2.5], ['a\0b', 'c'], [], [10 ** 30]):
+            self.assertEqual(list(unpack_column(pack_column(values))), values)
+        self.assertIsInstance(pack_column(['a', 'b']), bytes)
+    
+    def test_empty_partials(self):
+        """Test that merging nothing gives zero totals and no extremes"""
+        totals = ProductTotals([summarize_products([[], [], []])], {})
+        self.assertEqual((totals.count, totals.low_stock, totals.price_sum), (0, 0, Fraction(0)))
+        self.assertIsNone(totals.cheapest())
+        self.assertIsNone(totals.most_expensive())
+    
+    def test_non_finite_prices(self):
+        """Test that NaN prices never rank and non-finite sums stay floats"""
+        partial = summarize_products([[1, 2, 3], [float('nan'), 2.0, float('inf')], [1, 1, 1]])
+        self.assertEqual((partial['cheapest'], partial['dearest']), ((2.0, 2), (-float('inf'), 3)))
+        self.assertTrue(math.isnan(partial['price_sum']))
+        totals = ProductTotals([partial, summarize_products([[4], [float('nan')], [1]])], {2: 'B', 3: 'C'})
+        self.assertEqual((totals.count, totals.cheapest(), totals.most_expensive()), (4, 'B', 'C'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+from snapshots import Snapshot, SnapshotRecords, json_to_snapshot, snapshot_to_json, write_snapshot
+
+class TestSnapshot(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test environment with temporary directory"""
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, 'products.snap')
+    
+    def tearDown(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.test_dir)
+    
+    def write(self, records, fields=('id', 'name', 'price', 'stock')):
+        """Write records as a snapshot and open it"""
+        with open(self.path, 'wb') as f:
+            write_snapshot(f, records, fields)
+        return Snapshot(self.path)
+    
+    def test_round_trip(self):
+        """Test that every kind of column decodes to the values written"""
+        records = [
+            {'id': 7, 'name': 'Zoë', 'price': 10, 'stock': 2, 'tags': ['a']},
+            {'id': 2, 'name': '', 'price': 0.1, 'stock': -1, 'tags': None},
+            {'id': 5, 'name': 'a\x00b', 'price': 1e300, 'stock': 2 ** 62, 'tags': {'x': 1}},
+        ]
+        snapshot = self.write(records, ('id', 'name', 'price', 'stock', 'tags'))
+        self.assertEqual(list(snapshot.dicts()), records)
+        self.assertIsInstance(snapshot.values(0)[2], int)
+        self.assertEqual(snapshot.next_id, 8)
+        self.assertEqual([snapshot.position(i) for i in (2, 5, 7, 3)], [1, 2, 0, None])
+        
+        big = self.write([{'id': 1, 'name': 'x', 'price': 2 ** 70, 'stock': 2 ** 64}])
+        self.assertEqual(big.values(0), (1, 'x', 2 ** 70, 2 ** 64))
+    
+    def test_empty(self):
+        """Test that an empty collection makes a valid snapshot"""
+        snapshot = self.write([])
+        self.assertEqual((len(snapshot), list(snapshot.dicts()), snapshot.next_id), (0, [], 1))
+        self.assertIsNone(snapshot.position(1))
+    
+    def test_records_mapping(self):
+        """Test that changes layer over the snapshot in dict order"""
+        snapshot = self.write([{'id': i, 'name': f'P{i}', 'price': 1.0, 'stock': i} for i in (1, 2, 3)])
+        records = SnapshotRecords(snapshot, lambda values: dict(zip(snapshot.fields, values)))
+        self.assertEqual((list(records), len(records), 2 in records, 4 in records), ([1, 2, 3], 3, True, False))
+        
+        records[2] = {'id': 2, 'name': 'changed'}
+        del records[1]
+        records[4] = {'id': 4}
+        records[1] = {'id': 1}
+        self.assertEqual(list(records), [2, 3, 4, 1])
+        self.assertEqual(list(reversed(records)), [1, 4, 3, 2])
+        self.assertEqual([r['id'] for r in records.values()], [2, 3, 4, 1])
+        self.assertEqual((records[2]['name'], records[3]['name'], len(records)), ('changed', 'P3', 4))
+        del records[1]
+        del records[3]
+        with self.assertRaises(KeyError):
+            del records[3]
+        self.assertEqual((list(records), records.get(3)), ([2, 4], None))
+    
+    def test_converters(self):
+        """Test converting JSON to a snapshot and back"""
+        json_path = os.path.join(self.test_dir, 'products.json')
+        records = [{'id': 1, 'name': 'Cable', 'price': 4.5, 'stock': 40}]
+        with open(json_path, 'w') as f:
+            json.dump(records, f, indent=2)
+        with open(json_path) as f:
+            original = f.read()
+        
+        json_to_snapshot(json_path, self.path)
+        os.remove(json_path)
+        snapshot_to_json(self.path, json_path)
+        with open(json_path) as f:
+            self.assertEqual(f.read(), original)
+        
+        with open(json_path, 'w') as f:
+            f.write('[]')
+        with self.assertRaises(ValueError):
+            Snapshot(json_path)
+    
+    def test_extra_fields(self):
+        """Test fields only some records have round-trip through the extra column"""
+        json_path = os.path.join(self.test_dir, 'products.json')
+        records = [{'id': 1, 'name': 'Cable', 'price': 4.5, 'stock': 40},
+                   {'id': 2, 'name': 'Plug', 'price': 2.0, 'stock': 9, 'sku': 'P-2', 'tags': ['mains']}]
+        with open(json_path, 'w') as f:
+            json.dump(records, f)
+        
+        json_to_snapshot(json_path, self.path)
+        snapshot = Snapshot(self.path)
+        self.assertEqual(snapshot.fields, ('id', 'name', 'price', 'stock'))
+        self.assertEqual(list(snapshot.dicts()), records)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import os
+import json
+import test_data_manager
+from sqlite_data_manager import SQLiteDataManager
+
+class TestSQLiteDataManager(test_data_manager.TestDataManager):
+    """Run the CRUD tests again against the SQLite backend"""
+    
+    def setUp(self):
+        """Set up test environment with a SQLite data manager"""
+        super().setUp()
+        self.data_manager = SQLiteDataManager('test.db')
+    
+    def test_files_creation(self):
+        """Test that the database file is created in WAL mode"""
+        self.assertTrue(os.path.exists('test.db'))
+        mode = self.data_manager._connection().execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(mode, 'wal')
+    
+    def test_search_products(self):
+        """Test product search and sort run in SQL"""
+        self.data_manager.create_product("iPhone 15", 999.99, 5)
+        self.data_manager.create_product("Phone Case", 19.99, 50)
+        self.data_manager.create_product("Laptop", 1299.00, 2)
+        
+        results = self.data_manager.search_products('PHONE', 'price')
+        self.assertEqual([p['name'] for p in results], ["Phone Case", "iPhone 15"])
+        
+        results = self.data_manager.search_products('', 'stock')
+        self.assertEqual([p['stock'] for p in results], [2, 5, 50])
+        
+        results = self.data_manager.search_products()
+        self.assertEqual([p['name'] for p in results], ["iPhone 15", "Laptop", "Phone Case"])
+    
+    def test_search_treats_wildcards_literally(self):
+        """Test that % and _ in a query are not LIKE wildcards"""
+        self.data_manager.create_product("100% Cotton Cloth", 4.99, 10)
+        self.data_manager.create_product("1000 Ohm Resistor", 0.10, 500)
+        
+        results = self.data_manager.search_products('100%')
+        self.assertEqual([p['name'] for p in results], ["100% Cotton Cloth"])
+        self.assertEqual(self.data_manager.search_products('_'), [])
+    
+    def test_search_customers(self):
+        """Test customer search matches name or email"""
+        self.data_manager.create_customer("John Doe", "john@example.com", "222")
+        self.data_manager.create_customer("Jane Smith", "jane@shop.ie", "111")
+        self.data_manager.create_customer("Bob Stone", "bob@example.com", "333")
+        
+        results = self.data_manager.search_customers('example', 'phone')
+        self.assertEqual([c['name'] for c in results], ["John Doe", "Bob Stone"])
+        
+        results = self.data_manager.search_customers('smith')
+        self.assertEqual([c['name'] for c in results], ["Jane Smith"])
+    
+    def test_page_products(self):
+        """Test keyset pages follow (sort key, id) order in SQL"""
+        for name, price in [("b", 5.0), ("A", 5.0), ("c", 1.0), ("D", 9.0)]:
+            self.data_manager.create_product(name, price, 1)
+        
+        seen, after = [], None
+        while True:
+            page = self.data_manager.page_products('', 'name', 3, after)
+            self.assertEqual(page['total'], 4)
+            seen.extend(p['name'] for p in page['items'])
+            after = page['next']
+            if after is None:
+                break
+        self.assertEqual(seen, ["A", "b", "c", "D"])
+        
+        page = self.data_manager.page_products('', 'price', 2)
+        self.assertEqual([p['name'] for p in page['items']], ["c", "b"])
+        page = self.data_manager.page_products('', 'price', 2, page['next'])
+        self.assertEqual([p['name'] for p in page['items']], ["A", "D"])
+        self.assertIsNone(page['next'])
+    
+    def test_update_is_one_change(self):
+        """Test that updating several fields counts as a single version and change"""
+        self.data_manager.create_product("Radio", 25.0, 3)
+        version = self.data_manager.get_version('products')
+        self.data_manager.update_product(1, {'name': 'Clock Radio', 'price': 30.0, 'stock': 2})
+        
+        current, changes = self.data_manager.changes_since('products', version)
+        self.assertEqual(current, version + 1)
+        self.assertEqual([(c['op'], c['id']) for c in changes], [('update', 1)])
+        self.assertEqual(changes[0]['record'], {'id': 1, 'name': 'Clock Radio', 'price': 30.0, 'stock': 2})
+    
+    def test_migrate_from_json(self):
+        """Test the one-shot migration keeps ids and only runs once"""
+        with open('products.json', 'w') as f:
+            json.dump([{'id': 4, 'name': 'Radio', 'price': 25.0, 'stock': 3},
+                       {'id': 9, 'name': 'Kettle', 'price': 30.0, 'stock': 8}], f)
+        with open('customers.json', 'w') as f:
+            json.dump([{'id': 2, 'name': 'John Doe', 'email': 'john@example.com',
+                        'phone': '123'}], f)
+        
+        self.assertEqual(self.data_manager.migrate_from_json(), (2, 1))
+        self.assertEqual(self.data_manager.migrate_from_json(), (0, 0))
+        
+        self.assertEqual(self.data_manager.get_product(9)['name'], 'Kettle')
+        self.assertEqual(len(self.data_manager.get_all_products()), 2)
+        self.assertEqual(self.data_manager.create_product("Toaster", 20.0, 1)['id'], 10)
+
+if __name__ == '__main__':
+    unittest.main()
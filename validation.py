@@ -0,0 +1,136 @@
+from typing import Callable, Dict, List, Tuple
+
+# Largest number of operations accepted in one batch request
+MAX_BATCH_SIZE = 10000
+
+# Bounds that keep every price, and price * stock, a finite float
+MAX_PRICE = 1e12
+MAX_STOCK = 10 ** 12
+
+
+class ValidationError(ValueError):
+    """Invalid input; the message is sent back to the client with a 400"""
+
+
+def _text(data: Dict, field: str, message: str) -> str:
+    """Return a non-blank string field, or raise with message"""
+    value = data[field]
+    if not isinstance(value, str) or not value.strip():
+        raise ValidationError(message)
+    return value
+
+
+def validate_new_product(data: Dict) -> Dict:
+    """Check and convert the fields of a product to create"""
+    if not isinstance(data, dict) or not all(field in data for field in ('name', 'price', 'stock')):
+        raise ValidationError('Missing required fields: name, price, stock')
+    
+    try:
+        price = float(data['price'])
+        stock = int(data['stock'])
+    except (TypeError, ValueError):
+        raise ValidationError('Invalid data types: price must be a number, stock must be an integer')
+    
+    if price < 0:
+        raise ValidationError('Price cannot be negative')
+    if not price <= MAX_PRICE:
+        raise ValidationError(f'Price must be a finite number no greater than {MAX_PRICE:.0f}')
+    if stock < 0:
+        raise ValidationError('Stock cannot be negative')
+    if stock > MAX_STOCK:
+        raise ValidationError(f'Stock cannot be greater than {MAX_STOCK}')
+    name = _text(data, 'name', 'Product name cannot be empty')
+    return {'name': name, 'price': price, 'stock': stock}
+
+
+def validate_product_updates(data: Dict) -> Dict:
+    """Check and convert the fields of a product update; other keys are dropped"""
+    if not isinstance(data, dict):
+        raise ValidationError('Request body must be a JSON object')
+    
+    updates = {}
+    if 'price' in data:
+        try:
+            updates['price'] = float(data['price'])
+        except (TypeError, ValueError):
+            raise ValidationError('Invalid price format')
+        if updates['price'] < 0:
+            raise ValidationError('Price cannot be negative')
+        if not updates['price'] <= MAX_PRICE:
+            raise ValidationError(f'Price must be a finite number no greater than {MAX_PRICE:.0f}')
+    
+    if 'stock' in data:
+        try:
+            updates['stock'] = int(data['stock'])
+        except (TypeError, ValueError):
+            raise ValidationError('Invalid stock format')
+        if updates['stock'] < 0:
+            raise ValidationError('Stock cannot be negative')
+        if updates['stock'] > MAX_STOCK:
+            raise ValidationError(f'Stock cannot be greater than {MAX_STOCK}')
+    
+    if 'name' in data:
+        updates['name'] = _text(data, 'name', 'Product name cannot be empty')
+    return updates
+
+
+def validate_new_customer(data: Dict) -> Dict:
+    """Check the fields of a customer to create"""
+    if not isinstance(data, dict) or not all(field in data for field in ('name', 'email', 'phone')):
+        raise ValidationError('Missing required fields: name, email, phone')
+    
+    name = _text(data, 'name', 'Customer name cannot be empty')
+    email = _text(data, 'email', 'Invalid email format')
+    if '@' not in email:
+        raise ValidationError('Invalid email format')
+    phone = _text(data, 'phone', 'Phone number cannot be empty')
+    return {'name': name, 'email': email, 'phone': phone}
+
+
+def validate_customer_updates(data: Dict) -> Dict:
+    """Check the fields of a customer update; other keys are dropped"""
+    if not isinstance(data, dict):
+        raise ValidationError('Request body must be a JSON object')
+    
+    updates = {}
+    if 'name' in data:
+        updates['name'] = _text(data, 'name', 'Customer name cannot be empty')
+    if 'email' in data:
+        updates['email'] = _text(data, 'email', 'Invalid email format')
+        if '@' not in updates['email']:
+            raise ValidationError('Invalid email format')
+    if 'phone' in data:
+        updates['phone'] = _text(data, 'phone', 'Phone number cannot be empty')
+    return updates
+
+
+def validate_batch(data: Dict, validate_new: Callable[[Dict], Dict],
+                   validate_updates: Callable[[Dict], Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """Check a batch request body of create/update/delete operations
+    
+    Returns the converted operations and a list of ``{'index', 'error'}``
+    for the operations that failed validation. Raises ValidationError when
+    the body itself is malformed.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('operations'), list):
+        raise ValidationError('Request body must be an object with an operations list')
+    if not 1 <= len(data['operations']) <= MAX_BATCH_SIZE:
+        raise ValidationError(f'A batch must hold 1-{MAX_BATCH_SIZE} operations')
+    
+    operations, errors = [], []
+    for index, item in enumerate(data['operations']):
+        try:
+            op = item.get('op') if isinstance(item, dict) else None
+            if op == 'create':
+                operations.append(dict(validate_new(item), op='create'))
+            elif op in ('update', 'delete'):
+                record_id = item.get('id')
+                if not isinstance(record_id, int) or isinstance(record_id, bool):
+                    raise ValidationError(f'{op.capitalize()} operations need an integer id')
+                fields = validate_updates(item) if op == 'update' else {}
+                operations.append(dict(fields, op=op, id=record_id))
+            else:
+                raise ValidationError("Each operation needs an op of 'create', 'update' or 'delete'")
+        except ValidationError as e:
+            errors.append({'index': index, 'error': str(e)})
+    return operations, errors